@@ -0,0 +1,255 @@
+import asyncio
+import base64
+import hashlib
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Generic, TypeVar
+
+V = TypeVar("V")
+
+DEFAULT_NAMESPACE = "shared"
+
+
+@dataclass(frozen=True, slots=True)
+class MediaAsset:
+    """Raw media bytes plus the metadata needed to serve them by content hash."""
+
+    data: bytes | memoryview  # memoryview when memory-mapped from the disk store
+    mime_type: str
+    sha256: str
+
+    @classmethod
+    def from_bytes(cls, data: bytes, mime_type: str) -> "MediaAsset":
+        return cls(data=data, mime_type=mime_type, sha256=hashlib.sha256(data).hexdigest())
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    @property
+    def heap_size(self) -> int:
+        """Bytes held on the heap: none when memory-mapped, as the OS can drop and re-read those pages."""
+        return 0 if isinstance(self.data, memoryview) else len(self.data)
+
+    def b64(self) -> str:
+        """Base64 text for edges that need it (REST JSON, inline WebSocket delivery)."""
+        return base64.b64encode(self.data).decode()
+
+
+@dataclass
+class _Entry(Generic[V]):
+    value: V
+    size: int
+    expires_at: float | None
+    namespace: str
+    pinned: bool = False
+
+
+class AssetCache(Generic[V]):
+    """In-memory LRU cache bounded by total bytes rather than entry count.
+
+    Each value is costed with `sizeof` on insert. When the running total exceeds
+    `max_bytes`, least-recently-used entries are evicted until it fits again.
+    Entries older than `ttl_seconds` are treated as misses and dropped on access.
+    Every entry belongs to a namespace so one owner's entries can be invalidated
+    without disturbing anyone else's. Pinned entries still count towards the
+    budget but are never evicted or expired.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int,
+        sizeof: Callable[[V], int],
+        ttl_seconds: float | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_remove: Callable[[str, V], None] | None = None,
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds if ttl_seconds and ttl_seconds > 0 else None
+        self._sizeof = sizeof
+        self._clock = clock
+        self._on_remove = on_remove
+        self._entries: OrderedDict[str, _Entry[V]] = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.rejected = 0
+        self.invalidations = 0
+        self._pinned_bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: str) -> bool:
+        entry = self._entries.get(key)
+        return entry is not None and not self._expired(entry)
+
+    @property
+    def bytes_used(self) -> int:
+        return self._bytes
+
+    def get(self, key: str) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        if self._expired(entry):
+            self._drop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry.value
+
+    def peek(self, key: str) -> V | None:
+        """Like get() but without touching recency or hit/miss counters."""
+        entry = self._entries.get(key)
+        if entry is None or self._expired(entry):
+            return None
+        return entry.value
+
+    def set(self, key: str, value: V, namespace: str = DEFAULT_NAMESPACE) -> None:
+        size = self._sizeof(value)
+        if key in self._entries:
+            self._drop(key)
+        if size > self.max_bytes:
+            # A single asset larger than the whole budget would evict everything else
+            self.rejected += 1
+            return
+        expires_at = self._clock() + self.ttl_seconds if self.ttl_seconds else None
+        self._entries[key] = _Entry(
+            value=value, size=size, expires_at=expires_at, namespace=namespace
+        )
+        self._bytes += size
+        self._evict()
+
+    def pin(self, key: str) -> bool:
+        """Exempt `key` from LRU eviction and TTL expiry. Returns False if it is not cached."""
+        entry = self._entries.get(key)
+        if entry is None or self._expired(entry):
+            return False
+        if not entry.pinned:
+            entry.pinned = True
+            self._pinned_bytes += entry.size
+        return True
+
+    def pop(self, key: str) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._drop(key)
+        return entry.value
+
+    def invalidate_namespace(self, namespace: str) -> int:
+        """Drop every entry owned by `namespace`. Returns the number of entries removed."""
+        keys = [key for key, entry in self._entries.items() if entry.namespace == namespace]
+        for key in keys:
+            self._drop(key)
+        self.invalidations += len(keys)
+        return len(keys)
+
+    def clear(self) -> None:
+        for key in list(self._entries):
+            self._drop(key)
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "pinned_bytes": self._pinned_bytes,
+            "max_bytes": self.max_bytes,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "rejected": self.rejected,
+            "invalidations": self.invalidations,
+        }
+
+    def _expired(self, entry: _Entry[V]) -> bool:
+        return (
+            not entry.pinned
+            and entry.expires_at is not None
+            and self._clock() >= entry.expires_at
+        )
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        if entry.pinned:
+            self._pinned_bytes -= entry.size
+        if self._on_remove is not None:
+            self._on_remove(key, entry.value)
+
+    def _evict(self) -> None:
+        if self._bytes <= self.max_bytes:
+            return
+        for key in [key for key, entry in self._entries.items() if not entry.pinned]:
+            if self._bytes <= self.max_bytes:
+                break
+            self._drop(key)
+            self.evictions += 1
+
+
+@dataclass
+class _Call(Generic[V]):
+    task: "asyncio.Task[V]"
+    waiters: int = 0
+
+
+class SingleFlight(Generic[V]):
+    """Coalesce concurrent requests for the same key onto one in-flight task.
+
+    The first caller for a key starts `factory()`; later callers await the same
+    task. A waiter that is cancelled (e.g. its viewer disconnected) only detaches
+    itself — the shared task is cancelled once no waiters remain.
+    """
+
+    def __init__(self) -> None:
+        self._calls: dict[str, _Call[V]] = {}
+        self.started = 0
+        self.coalesced = 0
+        self.abandoned = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[V]]) -> V:
+        call = self._calls.get(key)
+        if call is None:
+            call = _Call(task=asyncio.ensure_future(factory()))
+            self._calls[key] = call
+            call.task.add_done_callback(lambda _t, key=key, call=call: self._forget(key, call))
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        call.waiters += 1
+        try:
+            # shield: cancelling this waiter must not cancel the task other waiters share
+            return await asyncio.shield(call.task)
+        finally:
+            call.waiters -= 1
+            if call.waiters == 0 and not call.task.done():
+                self._forget(key, call)
+                call.task.cancel()
+                self.abandoned += 1
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "started": self.started,
+            "coalesced": self.coalesced,
+            "abandoned": self.abandoned,
+        }
+
+    def _forget(self, key: str, call: _Call[V]) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
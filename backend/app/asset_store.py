@@ -0,0 +1,221 @@
+import hashlib
+import json
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.asset_cache import MediaAsset
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Record:
+    sha256: str
+    mime_type: str
+    size: int
+
+
+class DiskAssetStore:
+    """Persistent, content-addressed tier under the in-memory AssetCache.
+
+    Layout under `root`:
+      blobs/<sha[:2]>/<sha256>   media bytes, named by content hash (deduplicated)
+      keys/<sha256(key)>.json    cache key → {sha256, mime_type, size}
+
+    Every file is written to a temp file in the same directory and moved into
+    place with os.replace, so a crash never leaves a half-written asset behind.
+    Total blob bytes are capped at `max_bytes`; least-recently-used keys are
+    evicted (and their blobs deleted once unreferenced). Blobs of at least
+    `mmap_min_bytes` are read through a read-only memory map instead of being
+    copied onto the heap. Call scan() once at startup to index existing files.
+    """
+
+    def __init__(self, root: str | os.PathLike, max_bytes: int, mmap_min_bytes: int = 1024 * 1024) -> None:
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.mmap_min_bytes = mmap_min_bytes
+        self._blob_dir = self.root / "blobs"
+        self._key_dir = self.root / "keys"
+        self._lock = threading.Lock()
+        self._records: OrderedDict[str, _Record] = OrderedDict()
+        self._blob_refs: dict[str, int] = {}
+        self._mime_by_sha: dict[str, str] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        self.mmap_reads = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._records
+
+    @property
+    def bytes_used(self) -> int:
+        return self._bytes
+
+    def scan(self) -> int:
+        """Index the assets already on disk. Returns the number of keys found.
+
+        Key files whose blob is missing are deleted; keys are ordered oldest
+        first by blob mtime so eviction resumes where the last process left off.
+        """
+        self._blob_dir.mkdir(parents=True, exist_ok=True)
+        self._key_dir.mkdir(parents=True, exist_ok=True)
+        found: list[tuple[float, str, _Record]] = []
+        for key_path in self._key_dir.glob("*.json"):
+            try:
+                meta = json.loads(key_path.read_text())
+                record = _Record(meta["sha256"], meta["mime_type"], int(meta["size"]))
+                mtime = self._blob_path(record.sha256).stat().st_mtime
+                found.append((mtime, meta["key"], record))
+            except Exception as e:
+                logger.warning(f"Dropping unreadable asset store entry {key_path.name}: {e}")
+                key_path.unlink(missing_ok=True)
+
+        with self._lock:
+            self._records.clear()
+            self._blob_refs.clear()
+            self._mime_by_sha.clear()
+            self._bytes = 0
+            for _mtime, key, record in sorted(found, key=lambda item: item[0]):
+                self._index(key, record)
+            self._evict()
+        logger.info(f"Asset store at {self.root}: {len(self._records)} assets, {self._bytes} bytes")
+        return len(self._records)
+
+    def get(self, key: str) -> MediaAsset | None:
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                self.misses += 1
+                return None
+            self._records.move_to_end(key)
+        asset = self._read(record.sha256, record.mime_type, record.size)
+        with self._lock:
+            if asset is None:
+                self.misses += 1
+                # The read ran unlocked: the key may have been evicted or re-put meanwhile
+                if self._records.get(key) is record:
+                    self._forget(key)
+            else:
+                self.hits += 1
+        return asset
+
+    def get_by_sha(self, sha256: str) -> MediaAsset | None:
+        """Read a stored blob by content hash (for HTTP delivery)."""
+        with self._lock:
+            mime_type = self._mime_by_sha.get(sha256)
+        if mime_type is None:
+            return None
+        return self._read(sha256, mime_type, None)
+
+    def put(self, key: str, asset: MediaAsset) -> None:
+        if asset.size > self.max_bytes:
+            return
+        blob_path = self._blob_path(asset.sha256)
+        try:
+            # The bulk write stays outside the lock so reads are not held up by it
+            if not blob_path.exists():
+                self._atomic_write(blob_path, asset.data)
+            with self._lock:
+                # Until indexed below the blob is unreferenced, so an eviction may have deleted it
+                if not blob_path.exists():
+                    self._atomic_write(blob_path, asset.data)
+                previous = self._records.get(key)
+                if previous is not None and previous.sha256 == asset.sha256:
+                    self._records.move_to_end(key)
+                    return
+                meta = {"key": key, "sha256": asset.sha256, "mime_type": asset.mime_type, "size": asset.size}
+                self._atomic_write(self._key_path(key), json.dumps(meta).encode())
+                if previous is not None:
+                    self._forget(key, delete_key_file=False)
+                self._index(key, _Record(asset.sha256, asset.mime_type, asset.size))
+                self.writes += 1
+                self._evict()
+        except OSError as e:
+            logger.error(f"Asset store write failed for '{key}': {e}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "root": str(self.root),
+            "entries": len(self._records),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "mmap_reads": self.mmap_reads,
+        }
+
+    def _blob_path(self, sha256: str) -> Path:
+        return self._blob_dir / sha256[:2] / sha256
+
+    def _key_path(self, key: str) -> Path:
+        return self._key_dir / f"{hashlib.sha256(key.encode()).hexdigest()}.json"
+
+    def _read(self, sha256: str, mime_type: str, size: int | None) -> MediaAsset | None:
+        try:
+            with open(self._blob_path(sha256), "rb") as f:
+                actual = os.fstat(f.fileno()).st_size
+                if size is not None and actual != size:
+                    raise ValueError(f"expected {size} bytes, found {actual}")
+                if actual >= self.mmap_min_bytes:
+                    # The mapping outlives the file handle (and even an unlink on eviction)
+                    data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+                    self.mmap_reads += 1
+                else:
+                    data = f.read()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Asset store read failed for blob {sha256}: {e}")
+            return None
+        return MediaAsset(data=data, mime_type=mime_type, sha256=sha256)
+
+    def _atomic_write(self, path: Path, data: bytes) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            Path(tmp).unlink(missing_ok=True)
+            raise
+
+    def _index(self, key: str, record: _Record) -> None:
+        self._records[key] = record
+        refs = self._blob_refs.get(record.sha256, 0)
+        if refs == 0:
+            self._bytes += record.size
+            self._mime_by_sha[record.sha256] = record.mime_type
+        self._blob_refs[record.sha256] = refs + 1
+
+    def _forget(self, key: str, delete_key_file: bool = True) -> None:
+        record = self._records.pop(key)
+        refs = self._blob_refs[record.sha256] - 1
+        if delete_key_file:
+            self._key_path(key).unlink(missing_ok=True)
+        if refs == 0:
+            del self._blob_refs[record.sha256]
+            del self._mime_by_sha[record.sha256]
+            self._bytes -= record.size
+            self._blob_path(record.sha256).unlink(missing_ok=True)
+        else:
+            self._blob_refs[record.sha256] = refs
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._records:
+            self._forget(next(iter(self._records)))
+            self.evictions += 1
@@ -1,20 +1,68 @@
 import asyncio
 import base64
+import hashlib
 import io
 import logging
 import os
 import wave
+from dataclasses import dataclass
+from typing import Awaitable, Callable
 
-from google import genai
 from google.genai import types
 
+from app import gemini_scheduler
+from app.asset_cache import DEFAULT_NAMESPACE, AssetCache, MediaAsset, SingleFlight
+from app.asset_store import DiskAssetStore
+from app.gemini_client import client
 from app.models import SceneAssets, SceneData, SceneDecision
+from app.veo_jobs import VeoJobManager
 
 logger = logging.getLogger(__name__)
 
-client = genai.Client()
+# Memory budget for generated assets. Media bytes dominate RSS, so the cache is
+# bounded by bytes, not entry count.
+_CACHE_MAX_BYTES = int(os.getenv("ASSET_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+_CACHE_TTL_SECONDS = float(os.getenv("ASSET_CACHE_TTL_SECONDS", "3600"))
 
-_cache: dict[str, SceneAssets] = {}
+# SHA-256 → cache key, so any cached asset can be served by content hash
+_sha_index: dict[str, str] = {}
+
+# Memory-mapped disk-store blobs take no heap, but each pins an open file handle
+# and mapping; charging them a nominal 1 MiB (the store's mmap threshold) keeps
+# them evictable and caps them at ASSET_CACHE_MAX_BYTES / 1 MiB live mappings.
+_MAPPED_ASSET_COST = 1024 * 1024
+
+
+def _cache_cost(asset: MediaAsset) -> int:
+    return _MAPPED_ASSET_COST if isinstance(asset.data, memoryview) else asset.heap_size
+
+
+def _unindex(key: str, asset: MediaAsset) -> None:
+    if _sha_index.get(asset.sha256) == key:
+        del _sha_index[asset.sha256]
+
+
+# One entry per asset (image, video or audio), keyed only by the inputs that shape it,
+# so a narration rewrite never throws away a reusable image or Veo clip.
+_cache: AssetCache[MediaAsset] = AssetCache(
+    max_bytes=_CACHE_MAX_BYTES,
+    sizeof=_cache_cost,
+    ttl_seconds=_CACHE_TTL_SECONDS,
+    on_remove=_unindex,
+)
+# Identical concurrent asset requests (e.g. every viewer's opening) share one generation
+_inflight: SingleFlight[MediaAsset | None] = SingleFlight()
+# Priority scope of each in-flight generation: it runs as urgently as its most
+# urgent waiting caller, so a critical caller joining a prefetch is not stuck behind it
+_inflight_scopes: dict[str, gemini_scheduler.PriorityScope] = {}
+
+# Persistent tier under _cache so shared assets survive restarts and redeploys.
+# Unset ASSET_STORE_DIR (the default) keeps everything in memory only.
+_STORE_DIR = os.getenv("ASSET_STORE_DIR", "")
+_STORE_MAX_BYTES = int(os.getenv("ASSET_STORE_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+_store: DiskAssetStore | None = (
+    DiskAssetStore(_STORE_DIR, max_bytes=_STORE_MAX_BYTES) if _STORE_DIR else None
+)
 
 # Set VEO_ENABLED=true in .env to use real Veo video generation.
 # Default is false so dev/test runs never burn video credits.
@@ -22,8 +70,29 @@ _VEO_ENABLED: bool = os.getenv("VEO_ENABLED", "false").lower() == "true"
 
 _VEO_MODEL = "veo-3.0-generate-001"
 _VEO_DURATION_SECONDS = 6       # cheapest supported duration (4, 6, or 8)
-_VEO_POLL_INTERVAL = 8          # seconds between polling attempts
-_VEO_TIMEOUT_SECONDS = 90       # give up and fall back to image after this
+# Operation polling backs off from the first interval to the max, so short
+# renders are picked up promptly without hammering the API on long ones
+_VEO_POLL_INITIAL_SECONDS = 2.0
+_VEO_POLL_MAX_SECONDS = 8.0
+_VEO_POLL_BACKOFF = 1.5
+_VEO_TIMEOUT_SECONDS = 90       # give up and fall back to image after this, queueing included
+# Veo operations rendering at once across the process; further jobs queue (see _veo_jobs)
+_VEO_MAX_CONCURRENT_JOBS = int(os.getenv("VEO_MAX_CONCURRENT_JOBS", "2"))
+# Hedged Veo: the still image is generated alongside the clip and shown first; the
+# clip replaces it only if it lands within this many seconds of the image.
+# 0 disables hedging: the image is generated only after Veo has failed.
+_VEO_HEDGE_WINDOW_SECONDS = float(os.getenv("VEO_HEDGE_WINDOW_SECONDS", "30"))
+_veo_stats = {
+    "hedged": 0,       # scenes whose image raced the clip
+    "upgraded": 0,     # ...and got the clip within the window
+    "kept_image": 0,   # ...and stayed on the image
+}
+
+_IMAGE_MODEL = "gemini-2.5-flash-image"
+_TTS_MODEL = "gemini-2.5-pro-preview-tts"
+_TTS_VOICE = "Charon"
+# Gemini TTS output format: raw little-endian 16-bit mono PCM at this rate
+TTS_SAMPLE_RATE = 24000
 
 _GENRE_VISUAL_STYLE: dict[str, str] = {
     "mystery":  "",  # original prompts already target mystery
@@ -31,9 +100,41 @@ _GENRE_VISUAL_STYLE: dict[str, str] = {
     "horror":   "deep shadows, off-kilter dutch angle, pale sickly moonlight, unsettling negative space, cold blue-grey horror palette",
     "sci-fi":   "retrofuturism, cool neon-and-silver accents, holographic surface details, technological decay woven into Victorian architecture, blue-white lighting",
 }
+GENRES: tuple[str, ...] = tuple(_GENRE_VISUAL_STYLE)
+
+
+@dataclass(frozen=True, slots=True)
+class SceneMedia:
+    """A generated scene with its media kept as raw bytes.
+
+    Converted to the base64 SceneAssets wire model only at the edges that need it.
+    """
 
+    scene_id: str
+    narration_text: str
+    mood: str
+    chapter: str
+    duration_seconds: int
+    image: MediaAsset | None = None
+    video: MediaAsset | None = None
+    audio: MediaAsset | None = None
+    # Asset kinds ("image", "video", "audio") left out because the deadline passed
+    timed_out: tuple[str, ...] = ()
 
-def _pcm_to_wav(pcm_data: bytes, sample_rate: int = 24000) -> bytes:
+    def to_assets(self) -> SceneAssets:
+        return SceneAssets(
+            scene_id=self.scene_id,
+            image_base64=self.image.b64() if self.image else None,
+            video_base64=self.video.b64() if self.video else None,
+            audio_base64=self.audio.b64() if self.audio else None,
+            narration_text=self.narration_text,
+            mood=self.mood,
+            chapter=self.chapter,
+            duration_seconds=self.duration_seconds,
+        )
+
+
+def _pcm_to_wav(pcm_data: bytes, sample_rate: int = TTS_SAMPLE_RATE) -> bytes:
     """Wrap raw L16 PCM bytes in a WAV container the browser can decode."""
     buf = io.BytesIO()
     with wave.open(buf, "wb") as wf:
@@ -44,11 +145,57 @@ def _pcm_to_wav(pcm_data: bytes, sample_rate: int = 24000) -> bytes:
     return buf.getvalue()
 
 
+# Viewer-independent assets (no narrator rewrite) live here and survive session resets.
+SHARED_NAMESPACE = DEFAULT_NAMESPACE
+
+
 def clear_cache() -> None:
-    """Clear the scene cache. Call on story reset so replays regenerate assets."""
+    """Clear the whole scene cache, shared entries included. Prefer invalidate_namespace()."""
     _cache.clear()
 
 
+def session_namespace(session_id: str) -> str:
+    """Cache namespace owning one viewer session's personalised assets."""
+    return f"session:{session_id}"
+
+
+def invalidate_namespace(namespace: str) -> int:
+    """Drop one owner's cached assets so its replay regenerates, leaving other viewers warm."""
+    return _cache.invalidate_namespace(namespace)
+
+
+def cache_stats() -> dict:
+    """Hit/miss/eviction/byte counters for the scene asset cache, plus in-flight coalescing."""
+    return {
+        **_cache.stats(),
+        "single_flight": _inflight.stats(),
+        "disk": _store.stats() if _store is not None else None,
+    }
+
+
+def use_asset_store(root: str, max_bytes: int = _STORE_MAX_BYTES) -> None:
+    """Point the persistent tier at `root`, overriding ASSET_STORE_DIR (used by the pre-render CLI)."""
+    global _store
+    _store = DiskAssetStore(root, max_bytes=max_bytes)
+
+
+async def load_asset_store() -> int:
+    """Index the persistent asset store (call once at startup). Returns assets found."""
+    if _store is None:
+        return 0
+    return await asyncio.to_thread(_store.scan)
+
+
+async def get_asset(sha256: str) -> MediaAsset | None:
+    """Look up a cached or persisted asset by content hash (for HTTP delivery)."""
+    key = _sha_index.get(sha256)
+    asset = _cache.peek(key) if key is not None else None
+    if asset is None and _store is not None:
+        # Disk read (or mmap): keep it off the event loop
+        asset = await asyncio.to_thread(_store.get_by_sha, sha256)
+    return asset
+
+
 def _build_visual_prompt(scene: SceneData, genre: str, decision: SceneDecision) -> str:
     """Compose the final visual prompt from scene data, genre style, and mood."""
     prompt = scene.image_prompt.replace("mystery genre", f"{genre} genre").replace(
@@ -62,118 +209,545 @@ def _build_visual_prompt(scene: SceneData, genre: str, decision: SceneDecision)
     return prompt
 
 
-async def generate_scene(
-    decision: SceneDecision,
-    scene: SceneData,
-    genre: str = "mystery",
-) -> SceneAssets:
-    # Composite key: genre + mood_shift + override_narration ensure no cross-genre cache collisions
-    cache_key = f"{scene.id}__{genre}__{decision.mood_shift or ''}__{decision.override_narration or ''}"
-    if cache_key in _cache:
-        return _cache[cache_key]
+def is_persisted(decision: SceneDecision, scene: SceneData, genre: str = "mystery") -> bool:
+    """True if the disk store already holds this scene's visual and seed-narration audio."""
+    if _store is None:
+        return False
+    visual_prompt = _build_visual_prompt(scene, genre, decision)
+    visual_key = _video_key(visual_prompt) if _VEO_ENABLED else _image_key(visual_prompt)
+    narration_text = decision.override_narration or scene.narration
+    return visual_key in _store and _audio_key(narration_text) in _store
 
-    async def gen_video() -> str | None:
-        """Generate a short MP4 clip via Veo. Returns base64-encoded bytes or None."""
-        if not _VEO_ENABLED:
-            return None
-        try:
-            prompt = _build_visual_prompt(scene, genre, decision)
-            # client.aio.models.generate_videos is natively async — no asyncio.to_thread needed.
-            operation = await client.aio.models.generate_videos(
-                model=_VEO_MODEL,
-                prompt=prompt,
-                config=types.GenerateVideosConfig(
-                    aspect_ratio="16:9",
-                    duration_seconds=_VEO_DURATION_SECONDS,
-                    resolution="720p",
-                ),
-            )
-            # Poll until operation completes or timeout expires
-            loop = asyncio.get_event_loop()
-            deadline = loop.time() + _VEO_TIMEOUT_SECONDS
-            while not operation.done:
-                if loop.time() > deadline:
-                    raise TimeoutError(
-                        f"Veo timed out after {_VEO_TIMEOUT_SECONDS}s for scene '{scene.id}'"
-                    )
-                await asyncio.sleep(_VEO_POLL_INTERVAL)
-                operation = await client.aio.operations.get(operation)
-
-            # operation.result (not .response) holds the GenerateVideosResponse.
-            # Video.video_bytes is a direct attribute — no .fetch() method exists.
-            video_bytes: bytes = operation.result.generated_videos[0].video.video_bytes
-            if not video_bytes:
-                raise ValueError("Veo returned video with empty bytes")
-            return base64.b64encode(video_bytes).decode()
-        except Exception as e:
-            logger.error(f"Veo generation failed for scene '{scene.id}', will fall back to image: {e}")
-            return None
-
-    async def gen_image() -> str | None:
-        """Generate a static PNG via Gemini Flash Image. Used as Veo fallback."""
+
+def _digest(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()[:32]
+
+
+def _image_key(visual_prompt: str) -> str:
+    return f"image:{_IMAGE_MODEL}:{_digest(visual_prompt)}"
+
+
+def _video_key(visual_prompt: str) -> str:
+    return f"video:{_VEO_MODEL}:{_VEO_DURATION_SECONDS}s:{_digest(visual_prompt)}"
+
+
+def _audio_key(narration_text: str) -> str:
+    return f"audio:{_TTS_MODEL}:{_TTS_VOICE}:{_digest(narration_text)}"
+
+
+def _remember(key: str, asset: MediaAsset, namespace: str, pin: bool = False) -> None:
+    _cache.set(key, asset, namespace=namespace)
+    if key in _cache:
+        _sha_index[asset.sha256] = key
+        if pin:
+            _cache.pin(key)
+
+
+async def _cached_asset(
+    key: str,
+    namespace: str,
+    generate: Callable[[], Awaitable[MediaAsset | None]],
+    pin: bool = False,
+    persisted: bool = False,
+) -> MediaAsset | None:
+    """Return the cached asset for `key`, generating it at most once across callers.
+
+    Lookup order is memory, then the disk store, then `generate()`. Shared assets
+    are written through to disk; per-session ones stay in memory only. Failed
+    generations (None) are not cached so the next request retries. `pin` keeps
+    the entry out of LRU eviction and TTL expiry. `persisted` means `generate()`
+    caches and persists its own result (Veo clips, see _store_video).
+    """
+    cached = _cache.get(key)
+    if cached is not None:
+        if pin:
+            _cache.pin(key)
+        return cached
+
+    def remember(asset: MediaAsset) -> None:
+        _remember(key, asset, namespace, pin)
+
+    scope = _inflight_scopes.get(key)
+    if scope is None:
+        scope = _inflight_scopes[key] = gemini_scheduler.PriorityScope(gemini_scheduler.Priority.PREFETCH)
+
+    async def generate_and_store() -> MediaAsset | None:
         try:
-            prompt = _build_visual_prompt(scene, genre, decision)
-            response = await client.aio.models.generate_content(
-                model="gemini-2.5-flash-image",
-                contents=prompt,
+            persist = _store is not None and namespace == SHARED_NAMESPACE
+            if persist:
+                stored = await asyncio.to_thread(_store.get, key)
+                if stored is not None:
+                    remember(stored)
+                    return stored
+            with gemini_scheduler.use_scope(scope):
+                asset = await generate()
+            if asset is None:
+                return None
+            if not persisted:
+                remember(asset)
+                if persist:
+                    await asyncio.to_thread(_store.put, key, asset)
+            elif pin and key in _cache:
+                _cache.pin(key)
+            return asset
+        finally:
+            if _inflight_scopes.get(key) is scope:
+                del _inflight_scopes[key]
+
+    with gemini_scheduler.follow(scope):
+        return await _inflight.run(key, generate_and_store)
+
+
+def _inline_bytes(part: types.Part) -> bytes:
+    """Raw bytes of an inline_data part (older SDKs hand back base64 text)."""
+    raw = part.inline_data.data
+    return base64.b64decode(raw) if isinstance(raw, str) else raw
+
+
+async def _gen_video(visual_prompt: str, scene_id: str) -> MediaAsset | None:
+    """Generate a short MP4 clip via Veo. Returns None on failure or timeout.
+
+    The clip comes back already cached and persisted by _store_video.
+    """
+    video = await _veo_jobs.result(_video_key(visual_prompt), visual_prompt)
+    if video is None:
+        logger.error(f"Veo generation failed for scene '{scene_id}', will fall back to image")
+    return video
+
+
+async def _submit_veo(visual_prompt: str) -> types.GenerateVideosOperation:
+    # client.aio.models.generate_videos is natively async — no asyncio.to_thread needed.
+    # Not preemptible: a retried submission could start a second paid render.
+    return await gemini_scheduler.run(
+        _VEO_MODEL,
+        lambda: client.aio.models.generate_videos(
+            model=_VEO_MODEL,
+            prompt=visual_prompt,
+            config=types.GenerateVideosConfig(
+                aspect_ratio="16:9",
+                duration_seconds=_VEO_DURATION_SECONDS,
+                resolution="720p",
+            ),
+        ),
+        preemptible=False,
+    )
+
+
+async def _poll_veo(operation: types.GenerateVideosOperation) -> types.GenerateVideosOperation:
+    return await gemini_scheduler.run(_VEO_MODEL, lambda: client.aio.operations.get(operation))
+
+
+async def _store_video(key: str, video_bytes: bytes) -> MediaAsset:
+    """Cache every finished clip, including those whose viewers have since left.
+
+    The only place a clip is cached and persisted; _gen_video returns its result.
+    """
+    asset = MediaAsset.from_bytes(video_bytes, "video/mp4")
+    _remember(key, asset, SHARED_NAMESPACE)
+    if _store is not None:
+        await asyncio.to_thread(_store.put, key, asset)
+    return asset
+
+
+def _new_veo_jobs() -> VeoJobManager[MediaAsset]:
+    return VeoJobManager(
+        submit=_submit_veo,
+        poll=_poll_veo,
+        store=_store_video,
+        max_concurrent=_VEO_MAX_CONCURRENT_JOBS,
+        poll_initial=_VEO_POLL_INITIAL_SECONDS,
+        poll_max=_VEO_POLL_MAX_SECONDS,
+        backoff=_VEO_POLL_BACKOFF,
+        timeout=_VEO_TIMEOUT_SECONDS,
+    )
+
+
+# Veo renders run here rather than inside a viewer's request: requests for the same
+# clip share one operation, and renders outlive the sessions that started them.
+# Bound to the server's event loop once used.
+_veo_jobs = _new_veo_jobs()
+
+
+async def _gen_image(visual_prompt: str, scene_id: str) -> MediaAsset | None:
+    """Generate a static PNG via Gemini Flash Image. Used as Veo fallback."""
+    try:
+        response = await gemini_scheduler.run(
+            _IMAGE_MODEL,
+            lambda: client.aio.models.generate_content(
+                model=_IMAGE_MODEL,
+                contents=visual_prompt,
                 config=types.GenerateContentConfig(
                     response_modalities=["image"],
                 ),
+            ),
+        )
+        part = response.candidates[0].content.parts[0]
+        mime_type = part.inline_data.mime_type
+        return MediaAsset.from_bytes(
+            _inline_bytes(part), mime_type if isinstance(mime_type, str) else "image/png"
+        )
+    except Exception as e:
+        logger.error(f"Image generation failed for scene '{scene_id}': {e}")
+        return None
+
+
+def _tts_config() -> types.GenerateContentConfig:
+    return types.GenerateContentConfig(
+        response_modalities=["audio"],
+        speech_config=types.SpeechConfig(
+            voice_config=types.VoiceConfig(
+                prebuilt_voice_config=types.PrebuiltVoiceConfig(voice_name=_TTS_VOICE)
             )
-            raw = response.candidates[0].content.parts[0].inline_data.data
-            if isinstance(raw, bytes):
-                return base64.b64encode(raw).decode()
-            return raw
-        except Exception as e:
-            logger.error(f"Image generation failed for scene '{scene.id}': {e}")
-            return None
-
-    async def gen_audio() -> str | None:
+        ),
+    )
+
+
+async def _gen_audio(narration_text: str, scene_id: str) -> MediaAsset | None:
+    try:
+        response = await gemini_scheduler.run(
+            _TTS_MODEL,
+            lambda: client.aio.models.generate_content(
+                model=_TTS_MODEL, contents=narration_text, config=_tts_config()
+            ),
+        )
+        pcm = _inline_bytes(response.candidates[0].content.parts[0])
+        # Gemini TTS returns raw L16 PCM — wrap in WAV so the browser can decode it
+        return MediaAsset.from_bytes(_pcm_to_wav(pcm), "audio/wav")
+    except Exception as e:
+        logger.error(f"TTS generation failed for scene '{scene_id}': {e}")
+        return None
+
+
+class _PcmFanout:
+    """Streamed TTS PCM for one narration, fanned out to every request waiting on it.
+
+    Each subscriber is sent every chunk, a late one first catching up on those
+    it missed, then None at the end. Sends run in a task per subscriber, so a
+    slow or failing subscriber never holds up the others or the TTS stream.
+    """
+
+    def __init__(self) -> None:
+        self.chunks: list[bytes] = []
+        self.ended = False
+        self._queues: set[asyncio.Queue[bytes | None]] = set()
+
+    def subscribe(self, on_chunk: Callable[[bytes | None], Awaitable[None]]) -> "asyncio.Task[None]":
+        """Start delivering to `on_chunk`; the returned task finishes after None is sent."""
+        queue: asyncio.Queue[bytes | None] = asyncio.Queue()
+        for chunk in self.chunks:
+            queue.put_nowait(chunk)
+        if self.ended:
+            queue.put_nowait(None)
+        else:
+            self._queues.add(queue)
+        task = asyncio.ensure_future(self._deliver(queue, on_chunk))
+        task.add_done_callback(lambda _: self._queues.discard(queue))
+        return task
+
+    def publish(self, chunk: bytes) -> None:
+        self.chunks.append(chunk)
+        for queue in self._queues:
+            queue.put_nowait(chunk)
+
+    def end(self) -> None:
+        if self.ended:
+            return
+        self.ended = True
+        for queue in self._queues:
+            queue.put_nowait(None)
+        self._queues.clear()
+
+    @staticmethod
+    async def _deliver(
+        queue: "asyncio.Queue[bytes | None]", on_chunk: Callable[[bytes | None], Awaitable[None]]
+    ) -> None:
+        while True:
+            chunk = await queue.get()
+            try:
+                await on_chunk(chunk)
+            except Exception as e:
+                logger.debug(f"Streamed audio subscriber dropped: {e}")
+                return
+            if chunk is None:
+                return
+
+
+# Narrations being streamed right now, by audio cache key, so joining requests hear them too
+_audio_streams: dict[str, _PcmFanout] = {}
+
+
+async def _stream_audio(narration_text: str, scene_id: str, stream: _PcmFanout) -> MediaAsset | None:
+    """_gen_audio, but publishing the raw PCM to `stream` as the TTS stream arrives.
+
+    Chunks always hold whole 16-bit samples. The stream is ended whether the
+    synthesis completed or failed. The assembled clip is returned as WAV like
+    _gen_audio, so it is cached for replays.
+    """
+    carry = b""
+
+    async def synthesise() -> None:
+        nonlocal carry
+        responses = await client.aio.models.generate_content_stream(
+            model=_TTS_MODEL, contents=narration_text, config=_tts_config()
+        )
+        async for response in responses:
+            parts = response.candidates[0].content.parts if response.candidates else None
+            for part in parts or []:
+                if part.inline_data is None:
+                    continue
+                data = carry + _inline_bytes(part)
+                whole = len(data) - len(data) % 2
+                chunk, carry = data[:whole], data[whole:]
+                if chunk:
+                    stream.publish(chunk)
+
+    try:
+        # Not preemptible: a restarted stream would replay audio the viewer already heard
+        await gemini_scheduler.run(_TTS_MODEL, synthesise, preemptible=False)
+        pcm = b"".join(stream.chunks)
+        if not pcm:
+            raise ValueError("TTS stream returned no audio")
+        return MediaAsset.from_bytes(_pcm_to_wav(pcm), "audio/wav")
+    except Exception as e:
+        logger.error(f"Streaming TTS failed for scene '{scene_id}': {e}")
+        return None
+    finally:
+        stream.end()
+
+
+# Late-asset reporters (see _report_late); referenced here so they are not garbage-collected
+_late_reports: set[asyncio.Task] = set()
+
+
+def _report_late(
+    kind: str,
+    generation: "asyncio.Future[MediaAsset | None]",
+    on_asset: Callable[[str, MediaAsset], Awaitable[None]],
+    until: float | None = None,
+) -> None:
+    """Hand an asset that missed generate_media()'s deadline to `on_asset` once it lands.
+
+    With `until` (event-loop time), an asset landing after it is not reported.
+    """
+
+    async def report() -> None:
+        if until is None:
+            asset = await generation
+        else:
+            loop = asyncio.get_running_loop()
+            try:
+                asset = await asyncio.wait_for(
+                    asyncio.shield(generation), max(0.0, until - loop.time())
+                )
+            except TimeoutError:
+                return
+        if asset is not None:
+            await on_asset(kind, asset)
+
+    task = asyncio.ensure_future(report())
+    _late_reports.add(task)
+    task.add_done_callback(_late_reports.discard)
+
+
+async def generate_media(
+    decision: SceneDecision,
+    scene: SceneData,
+    genre: str = "mystery",
+    namespace: str = SHARED_NAMESPACE,
+    pin: bool = False,
+    timeout: float | None = None,
+    narration: Awaitable[str] | None = None,
+    on_asset: Callable[[str, MediaAsset], Awaitable[None]] | None = None,
+    on_audio_chunk: Callable[[bytes | None], Awaitable[None]] | None = None,
+) -> SceneMedia:
+    """Generate (or fetch cached) image/video + narration audio for a scene, as raw bytes.
+
+    Image and video are keyed by the visual prompt (scene, genre, mood) and are
+    always shared across viewers. Audio is keyed by narration text and voice;
+    narrator-adapted audio is stored under `namespace`, seed narration is shared.
+    Only the assets whose inputs are not already cached get generated. `pin`
+    keeps the results resident in memory (used for the pre-warmed openings).
+
+    `narration` may be a still-running narrator call: the visuals never depend
+    on the narration, so they start immediately and only TTS waits for it.
+    Without it, the narration is `decision.override_narration` or the seed.
+
+    With `timeout`, assets not ready within that many seconds are returned as
+    None and listed in `timed_out`; their generation carries on in the
+    background and lands in the cache for the next request.
+
+    `on_asset(kind, asset)` is awaited as each asset lands, so callers can
+    deliver a scene progressively. It is also called for assets that finish
+    after the deadline.
+
+    With Veo enabled the image is hedged against the clip (see
+    _VEO_HEDGE_WINDOW_SECONDS): both start together, the image is reported as
+    soon as it is ready, and the clip only if it follows within the window.
+    When the clip makes it, `image` is left out of the result. Without
+    `on_asset` the window counts from the start and is cut short by the
+    deadline; a clip missing it just leaves the image (not a timeout).
+
+    With `on_audio_chunk`, narration that has to be synthesised is streamed:
+    PCM chunks (24 kHz mono s16le) are forwarded as they arrive, then None.
+    A request joining a narration already streaming is first sent the chunks
+    it missed. Audio served from the cache is not streamed.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout if timeout is not None else None
+    timed_out: list[str] = []
+
+    async def within_deadline(
+        kind: str,
+        fetch: Callable[[], Awaitable[MediaAsset | None]],
+        window_end: float | None = None,
+    ) -> MediaAsset | None:
+        """Await `fetch()` until the deadline, or until loop time `window_end` if sooner."""
+        if deadline is None and window_end is None:
+            asset = await fetch()
+        else:
+            limit = min(t for t in (deadline, window_end) if t is not None)
+            task = asyncio.ensure_future(fetch())
+            try:
+                asset = await asyncio.wait_for(asyncio.shield(task), max(0.0, limit - loop.time()))
+            except TimeoutError:
+                if limit == window_end:
+                    # Not late, just too late to be worth switching to; still lands in the cache
+                    logger.info(f"{kind} for scene '{scene.id}' missed the hedge window")
+                    return None
+                timed_out.append(kind)
+                logger.warning(f"{kind} for scene '{scene.id}' missed the {timeout:.1f}s deadline")
+                if on_asset is not None:
+                    _report_late(kind, task, on_asset, until=window_end)
+                return None
+            except asyncio.CancelledError:
+                task.cancel()
+                raise
+        if asset is not None and on_asset is not None:
+            await on_asset(kind, asset)
+        return asset
+
+    visual_prompt = _build_visual_prompt(scene, genre, decision)
+    narration_text = decision.override_narration or scene.narration
+
+    def get_video() -> Awaitable[MediaAsset | None]:
+        return _cached_asset(
+            _video_key(visual_prompt),
+            SHARED_NAMESPACE,
+            lambda: _gen_video(visual_prompt, scene.id),
+            pin=pin,
+            persisted=True,
+        )
+
+    def get_image() -> Awaitable[MediaAsset | None]:
+        return _cached_asset(
+            _image_key(visual_prompt),
+            SHARED_NAMESPACE,
+            lambda: _gen_image(visual_prompt, scene.id),
+            pin=pin,
+        )
+
+    async def get_visuals() -> tuple[MediaAsset | None, MediaAsset | None]:
+        """(video, image). Veo when enabled, hedged with or falling back to a still image."""
+        if not _VEO_ENABLED:
+            return None, await within_deadline("image", get_image)
+        hedge = _VEO_HEDGE_WINDOW_SECONDS > 0 and _cache.peek(_video_key(visual_prompt)) is None
+        if not hedge:
+            video = await within_deadline("video", get_video)
+            if video is not None:
+                return video, None
+            return None, await within_deadline("image", get_image)
+
+        _veo_stats["hedged"] += 1
+        hedge_started = loop.time()
+        video_task = asyncio.ensure_future(get_video())
         try:
-            narration_text = decision.override_narration or scene.narration
-            response = await client.aio.models.generate_content(
-                model="gemini-2.5-pro-preview-tts",
-                contents=narration_text,
-                config=types.GenerateContentConfig(
-                    response_modalities=["audio"],
-                    speech_config=types.SpeechConfig(
-                        voice_config=types.VoiceConfig(
-                            prebuilt_voice_config=types.PrebuiltVoiceConfig(
-                                voice_name="Charon"
-                            )
-                        )
-                    ),
-                ),
-            )
-            raw = response.candidates[0].content.parts[0].inline_data.data
-            if isinstance(raw, bytes):
-                # Gemini TTS returns raw L16 PCM — wrap in WAV so the browser can decode it
-                return base64.b64encode(_pcm_to_wav(raw)).decode()
-            return raw
-        except Exception as e:
-            logger.error(f"TTS generation failed for scene '{scene.id}': {e}")
-            return None
-
-    # When Veo is enabled: run Veo + audio in parallel, then image fallback if Veo fails.
-    # When Veo is disabled (default): run image + audio in parallel — never sequential.
-    image_b64: str | None = None
-    if _VEO_ENABLED:
-        video_b64, audio_b64 = await asyncio.gather(gen_video(), gen_audio())
-        if video_b64 is None:
-            image_b64 = await gen_image()
-    else:
-        video_b64 = None
-        image_b64, audio_b64 = await asyncio.gather(gen_image(), gen_audio())
-
-    assets = SceneAssets(
+            image = await within_deadline("image", get_image)
+        except BaseException:
+            video_task.cancel()
+            raise
+        if image is None:
+            # Without an image the clip is all there is, so it gets the whole deadline
+            window_end = None
+        elif on_asset is None:
+            # Nothing can be upgraded after returning: the clip gets what is left of the
+            # window since both started, and missing it (or the deadline) keeps the image
+            window_end = hedge_started + _VEO_HEDGE_WINDOW_SECONDS
+            if deadline is not None:
+                window_end = min(window_end, deadline)
+        else:
+            window_end = loop.time() + _VEO_HEDGE_WINDOW_SECONDS
+        video = await within_deadline("video", lambda: video_task, window_end=window_end)
+        if video is not None:
+            _veo_stats["upgraded"] += 1
+        elif image is not None:
+            _veo_stats["kept_image"] += 1
+        return video, None if video is not None else image
+
+    async def get_audio() -> MediaAsset | None:
+        nonlocal narration_text
+        if narration is not None:
+            narration_text = await narration
+        text = narration_text
+        key = _audio_key(text)
+        audio_namespace = namespace if text != scene.narration else SHARED_NAMESPACE
+        stream = None
+        if on_audio_chunk is not None and _cache.peek(key) is None:
+            stream = _audio_streams.get(key)
+            if stream is None or stream.ended:
+                stream = _audio_streams[key] = _PcmFanout()
+
+        async def fetch() -> MediaAsset | None:
+            if stream is None:
+                return await _cached_asset(key, audio_namespace, lambda: _gen_audio(text, scene.id), pin=pin)
+            delivery = stream.subscribe(on_audio_chunk)
+            try:
+                asset = await _cached_asset(
+                    key, audio_namespace, lambda: _stream_audio(text, scene.id, stream), pin=pin
+                )
+            except BaseException:
+                delivery.cancel()
+                raise
+            # Generation is over, streamed or not (e.g. it was found on disk)
+            stream.end()
+            if _audio_streams.get(key) is stream:
+                del _audio_streams[key]
+            await delivery
+            return asset
+
+        return await within_deadline("audio", fetch)
+
+    # Visuals depend only on the decision; audio additionally on the narration.
+    # Both branches run concurrently — never sequential.
+    audio, (video, image) = await asyncio.gather(get_audio(), get_visuals())
+
+    return SceneMedia(
         scene_id=scene.id,
-        video_base64=video_b64,
-        image_base64=image_b64,
-        audio_base64=audio_b64,
-        narration_text=decision.override_narration or scene.narration,
+        narration_text=narration_text,
         mood=decision.mood_shift or "neutral",
         chapter=scene.chapter,
         duration_seconds=scene.duration_seconds,
+        image=image,
+        video=video,
+        audio=audio,
+        timed_out=tuple(timed_out),
     )
-    _cache[cache_key] = assets
-    return assets
+
+
+def veo_stats() -> dict:
+    return {
+        **_veo_stats,
+        "enabled": _VEO_ENABLED,
+        "hedge_window_seconds": _VEO_HEDGE_WINDOW_SECONDS,
+        "jobs": _veo_jobs.stats(),
+    }
+
+
+async def generate_scene(
+    decision: SceneDecision,
+    scene: SceneData,
+    genre: str = "mystery",
+    namespace: str = SHARED_NAMESPACE,
+) -> SceneAssets:
+    """generate_media() rendered as the base64 SceneAssets model (REST edge)."""
+    media = await generate_media(decision, scene, genre=genre, namespace=namespace)
+    return media.to_assets()
@@ -2,15 +2,15 @@ import json
 import logging
 import os
 
-from google import genai
 from google.genai import types
 
-from app import story_engine
-from app.models import EmotionSummary, Pacing, SceneDecision, StoryState
+from app import gemini_scheduler, story_engine
+from app.gemini_client import client
+from app.models import EmotionSummary, Pacing, SceneData, SceneDecision, StoryState
 
 logger = logging.getLogger(__name__)
 
-client = genai.Client()
+_MODEL = "gemini-2.5-flash"
 
 _SYSTEM_PROMPT = (
     "You are the Director of an adaptive film called \"The Inheritance\".\n"
@@ -45,6 +45,22 @@ def _setup_phoenix() -> None:
 _setup_phoenix()
 
 
+def rank_branches(decision_scene: SceneData, emotion_summary: EmotionSummary) -> list[str]:
+    """Order a decision point's branch targets from most to least likely.
+
+    The emotion-mapped default (what decide() falls back to) comes first, then the
+    remaining distinct targets in adaptation_rules order.
+    """
+    branches = story_engine.get_branches(decision_scene)
+    emotion_str = emotion_summary.dominant_emotion.value
+    pre_selected = branches.get(emotion_str, branches.get("default", list(branches.values())[0]))
+    ranked = [pre_selected]
+    for target in branches.values():
+        if target not in ranked:
+            ranked.append(target)
+    return ranked
+
+
 async def decide(
     emotion_summary: EmotionSummary,
     story_state: StoryState,
@@ -65,8 +81,7 @@ async def decide(
     # Pre-compute fallback from emotion mapping
     valid_scenes = set(story_data.get("scenes", {}).keys())
     branches = story_engine.get_branches(next_scene)
-    emotion_str = emotion_summary.dominant_emotion.value
-    pre_selected = branches.get(emotion_str, branches.get("default", list(branches.values())[0]))
+    pre_selected = rank_branches(next_scene, emotion_summary)[0]
 
     try:
         genre = story_state.genre or "mystery"
@@ -82,14 +97,18 @@ async def decide(
             f"Choose the branch that creates the most compelling {genre} experience for this viewer."
         )
 
-        response = await client.aio.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                system_instruction=_SYSTEM_PROMPT,
-                temperature=0.8,
-                thinking_config=types.ThinkingConfig(thinking_budget=0),
+        response = await gemini_scheduler.run(
+            _MODEL,
+            lambda: client.aio.models.generate_content(
+                model=_MODEL,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    system_instruction=_SYSTEM_PROMPT,
+                    temperature=0.8,
+                    thinking_config=types.ThinkingConfig(thinking_budget=0),
+                ),
             ),
+            priority=gemini_scheduler.Priority.DIRECTOR,
         )
 
         raw = (response.text or "").strip()
@@ -1,27 +1,70 @@
+import asyncio
 import base64
+import io
 import json
 import logging
+import os
 import statistics
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, TypeVar
 
-from google import genai
 from google.genai import types
+from PIL import Image
 
+from app import gemini_scheduler
+from app.gemini_client import client
 from app.models import AttentionType, EmotionReading, EmotionSummary, EmotionType
 
 logger = logging.getLogger(__name__)
 
-client = genai.Client()
+T = TypeVar("T")
 
-_EMOTION_PROMPT = """Analyze this webcam image of a person watching a film.
-Return ONLY a JSON object with these exact fields:
-{
+_MODEL = "gemini-2.5-flash"
+
+_READING_FIELDS = """{
   "primary_emotion": one of "engaged","bored","confused","amused","tense","surprised","neutral",
   "intensity": integer 1-10,
   "attention": one of "screen","away","uncertain",
   "confidence": float 0.0-1.0
-}
+}"""
+
+_EMOTION_PROMPT = f"""Analyze this webcam image of a person watching a film.
+Return ONLY a JSON object with these exact fields:
+{_READING_FIELDS}
 No other text. Only the JSON object."""
 
+
+def _batch_prompt(count: int) -> str:
+    return f"""Analyze each of the {count} webcam images below, labelled Frame 0 to Frame {count - 1}.
+Each shows a different person watching a film; judge every frame independently.
+Return ONLY a JSON array of exactly {count} objects, in frame order, each with these exact fields:
+{_READING_FIELDS}
+No other text. Only the JSON array."""
+
+
+_call_stats: dict[str, int] = {"calls": 0, "saved_by_dedupe": 0}
+# A frame whose 64-bit dHash is within this many bits of the last analysed frame reuses
+# that frame's reading instead of calling Gemini (negative disables deduplication)
+_DEDUPE_MAX_DISTANCE = int(os.getenv("EMOTION_DEDUPE_MAX_DISTANCE", "4"))
+# Frames are shrunk to fit this many pixels on the long edge and re-encoded before
+# upload — emotion classification does not need full webcam resolution (0 disables)
+_FRAME_MAX_SIDE = int(os.getenv("EMOTION_FRAME_MAX_SIDE", "512"))
+_FRAME_JPEG_QUALITY = int(os.getenv("EMOTION_FRAME_JPEG_QUALITY", "80"))
+_preprocess_stats: dict[str, float] = {"frames": 0, "seconds": 0.0}
+# Frames actually sent to Gemini (deduplicated ones never are): original vs uploaded
+# bytes, and per-frame analysis latency split by whether the frame was downscaled
+_upload_stats: dict[str, float] = {
+    "frames": 0, "resized": 0, "bytes_in": 0, "bytes_out": 0, "resized_seconds": 0.0, "original_seconds": 0.0,
+}
+# Wall time spent inside Gemini calls
+_call_seconds = 0.0
+# Optional cross-session micro-batching: frames arriving within the window (from any
+# session) share one multi-image request, up to the max size. 0 ms disables batching.
+_BATCH_WINDOW_SECONDS = int(os.getenv("EMOTION_BATCH_WINDOW_MS", "0")) / 1000
+_BATCH_MAX_SIZE = int(os.getenv("EMOTION_BATCH_MAX_SIZE", "8"))
+_batch_stats: dict[str, int] = {"batches": 0, "batched_frames": 0, "fallbacks": 0}
+
 _FALLBACK = {
     "primary_emotion": "neutral",
     "intensity": 5,
@@ -30,26 +73,380 @@ _FALLBACK = {
 }
 
 
-async def analyze_frame(frame_base64: str) -> EmotionReading:
+def stats() -> dict:
+    frames = _preprocess_stats["frames"]
+    bytes_in = _upload_stats["bytes_in"]
+    resized = _upload_stats["resized"]
+    original = _upload_stats["frames"] - resized
+    return {
+        **_call_stats,
+        "call_ms_avg": 1000 * _call_seconds / _call_stats["calls"] if _call_stats["calls"] else 0.0,
+        "preprocess": {
+            **_preprocess_stats,
+            "ms_avg": 1000 * _preprocess_stats["seconds"] / frames if frames else 0.0,
+        },
+        "uploads": {
+            **_upload_stats,
+            "bytes_saved_ratio": 1 - _upload_stats["bytes_out"] / bytes_in if bytes_in else 0.0,
+            "resized_ms_avg": 1000 * _upload_stats["resized_seconds"] / resized if resized else 0.0,
+            "original_ms_avg": 1000 * _upload_stats["original_seconds"] / original if original else 0.0,
+        },
+        "batching": {
+            **_batch_stats,
+            "window_ms": _BATCH_WINDOW_SECONDS * 1000,
+            "max_size": _BATCH_MAX_SIZE,
+        },
+    }
+
+
+def prepare_frame(
+    frame_bytes: bytes,
+    max_side: int = _FRAME_MAX_SIDE,
+    want_hash: bool = True,
+    duplicate_of: int | None = None,
+    max_distance: int = -1,
+) -> tuple[bytes, int | None]:
+    """preprocess_frame() and frame_hash() from one JPEG decode. CPU-bound — run in a thread.
+
+    Returns (frame to upload, 64-bit dHash or None). The hash is None when not
+    wanted or when the frame cannot be decoded. A frame hashing within
+    `max_distance` bits of `duplicate_of` will not be uploaded, so it is
+    returned without re-encoding.
+    """
+    try:
+        with Image.open(io.BytesIO(frame_bytes)) as img:
+            resize = 0 < max_side < max(img.size)
+            if not resize and not want_hash:
+                return frame_bytes, None
+            # JPEG draft mode decodes straight at a reduced DCT scale (>= requested size);
+            # the hash alone needs barely any pixels
+            img.draft("RGB", (max_side, max_side) if resize else (64, 64))
+            decoded = img.convert("RGB")
+    except Exception as e:
+        logger.warning(f"Could not decode webcam frame: {e}")
+        return frame_bytes, None
+    digest = _dhash(decoded) if want_hash else None
+    duplicate = (
+        digest is not None
+        and duplicate_of is not None
+        and (digest ^ duplicate_of).bit_count() <= max_distance
+    )
+    if not resize or duplicate:
+        return frame_bytes, digest
+    decoded.thumbnail((max_side, max_side), Image.Resampling.BILINEAR)
+    buf = io.BytesIO()
+    try:
+        decoded.save(buf, format="JPEG", quality=_FRAME_JPEG_QUALITY)
+    except Exception as e:
+        logger.warning(f"Could not re-encode webcam frame: {e}")
+        return frame_bytes, digest
+    encoded = buf.getvalue()
+    return (encoded if len(encoded) < len(frame_bytes) else frame_bytes), digest
+
+
+def preprocess_frame(frame_bytes: bytes, max_side: int = _FRAME_MAX_SIDE) -> bytes:
+    """Downscale a webcam JPEG to fit `max_side` and re-encode it. CPU-bound — run in a thread.
+
+    Returns the input unchanged when it is already small enough, cannot be decoded,
+    or would not get any smaller.
+    """
+    return prepare_frame(frame_bytes, max_side, want_hash=False)[0]
+
+
+async def _preprocess(
+    frame_bytes: bytes, want_hash: bool = False, duplicate_of: int | None = None, max_distance: int = -1
+) -> tuple[bytes, int | None]:
+    started = time.perf_counter()
+    processed, digest = await asyncio.to_thread(
+        prepare_frame, frame_bytes, _FRAME_MAX_SIDE, want_hash, duplicate_of, max_distance
+    )
+    _preprocess_stats["seconds"] += time.perf_counter() - started
+    _preprocess_stats["frames"] += 1
+    return processed, digest
+
+
+class LatestFrame:
+    """Latest-frame-wins slot for one session's webcam frames.
+
+    put() replaces any frame still waiting, so when analysis falls behind only the
+    freshest frame is analysed next; take() waits for a frame and empties the slot.
+    """
+
+    def __init__(self) -> None:
+        self._frame: str | bytes | None = None
+        self._ready = asyncio.Event()
+
+    def put(self, frame: str | bytes) -> bool:
+        """Store `frame`. Returns True if it superseded a frame that was never analysed."""
+        replaced = self._frame is not None
+        self._frame = frame
+        self._ready.set()
+        return replaced
+
+    def discard(self) -> bool:
+        """Forget the waiting frame, if any. Returns True if one was discarded."""
+        discarded = self._frame is not None
+        self._frame = None
+        self._ready.clear()
+        return discarded
+
+    async def take(self) -> str | bytes:
+        while self._frame is None:
+            self._ready.clear()
+            await self._ready.wait()
+        frame, self._frame = self._frame, None
+        self._ready.clear()
+        return frame
+
+
+def frame_hash(frame_bytes: bytes) -> int | None:
+    """64-bit difference hash (dHash) of a JPEG, or None if it cannot be decoded.
+
+    Near-identical frames (viewer sitting still) differ in only a few bits.
+    """
+    return prepare_frame(frame_bytes, max_side=0)[1]
+
+
+def _dhash(img: Image.Image) -> int:
+    pixels = img.convert("L").resize((9, 8), Image.Resampling.BILINEAR).tobytes()
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+class FrameDeduper:
+    """Per-session change detector in front of analyze_frame().
+
+    Remembers the hash and reading of the last analysed frame; a new frame within
+    `max_distance` bits reuses that reading with a fresh timestamp.
+    """
+
+    def __init__(self, max_distance: int = _DEDUPE_MAX_DISTANCE) -> None:
+        self.max_distance = max_distance
+        self._last_hash: int | None = None
+        self._last_reading: EmotionReading | None = None
+
+    async def analyze(self, frame: str | bytes) -> EmotionReading:
+        if self.max_distance < 0:
+            return await analyze_frame(frame)
+        try:
+            # One decode serves both the hash and the downscaled upload
+            original = _frame_bytes(frame)
+            frame_bytes, digest = await _preprocess(
+                original,
+                want_hash=True,
+                duplicate_of=self._last_hash,
+                max_distance=self.max_distance,
+            )
+        except Exception as e:
+            logger.error(f"FrameDeduper.analyze failed: {e}")
+            return EmotionReading(**_FALLBACK)
+        if (
+            digest is not None
+            and self._last_hash is not None
+            and self._last_reading is not None
+            and (digest ^ self._last_hash).bit_count() <= self.max_distance
+        ):
+            _call_stats["saved_by_dedupe"] += 1
+            return self._last_reading.model_copy(update={"timestamp": datetime.now()})
+
+        reading = await _analyze_preprocessed(original, frame_bytes)
+        # Never pin a fallback reading — the next frame should get a real analysis
+        if digest is not None and reading.confidence > 0.0:
+            self._last_hash, self._last_reading = digest, reading
+        return reading
+
+    def reset(self) -> None:
+        self._last_hash = None
+        self._last_reading = None
+
+
+async def analyze_frame(frame: str | bytes) -> EmotionReading:
+    """Classify a webcam JPEG — base64 text (JSON protocol) or raw bytes (binary protocol).
+
+    The frame is downscaled first (off the event loop), then sent in a Gemini
+    call of its own or, with batching enabled, in a micro-batch of frames.
+    Concurrency is the scheduler's: calls queue at EMOTION priority for the
+    model's lane, holding at most EMOTION_MAX_INFLIGHT of its slots (see gemini_scheduler).
+    """
+    try:
+        original = _frame_bytes(frame)
+        frame_bytes, _ = await _preprocess(original)
+    except Exception as e:
+        logger.error(f"analyze_frame failed: {e}")
+        return EmotionReading(**_FALLBACK)
+    return await _analyze_preprocessed(original, frame_bytes)
+
+
+def _frame_bytes(frame: str | bytes) -> bytes:
+    """Raw JPEG bytes of a frame as received; raises on malformed base64 or other types."""
+    if isinstance(frame, str):
+        return base64.b64decode(frame)
+    if isinstance(frame, bytes):
+        return frame
+    raise TypeError(f"frame data is {type(frame).__name__}, expected base64 text or bytes")
+
+
+async def _analyze_preprocessed(original: bytes, frame_bytes: bytes) -> EmotionReading:
+    """Send `frame_bytes` (the preprocessed `original`) to Gemini, recording upload stats."""
+    resized = frame_bytes is not original
+    _upload_stats["frames"] += 1
+    _upload_stats["resized"] += resized
+    _upload_stats["bytes_in"] += len(original)
+    _upload_stats["bytes_out"] += len(frame_bytes)
+    started = time.perf_counter()
+    try:
+        if _BATCH_WINDOW_SECONDS > 0:
+            return await _get_batcher().submit(frame_bytes)
+        return await _call_timed(lambda: _analyze_frame(frame_bytes))
+    finally:
+        _upload_stats["resized_seconds" if resized else "original_seconds"] += time.perf_counter() - started
+
+
+async def _call_timed(call: Callable[[], Awaitable[T]]) -> T:
+    """Run one Gemini request, counting it and its latency (scheduler queueing included)."""
+    global _call_seconds
+    _call_stats["calls"] += 1
+    started = time.perf_counter()
+    try:
+        return await call()
+    finally:
+        _call_seconds += time.perf_counter() - started
+
+
+class EmotionBatcher:
+    """Collects frames from every session into one multi-image Gemini request.
+
+    A batch is sent `window_seconds` after its first frame arrives, or as soon as it
+    reaches `max_size` frames. Each caller gets back its own reading; if the batched
+    response does not parse into exactly one reading per frame, every frame in the
+    batch is retried with its own request.
+    """
+
+    def __init__(self, window_seconds: float, max_size: int) -> None:
+        self.window_seconds = window_seconds
+        self.max_size = max(1, max_size)
+        self._pending: list[tuple[bytes, asyncio.Future[EmotionReading]]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(self, frame_bytes: bytes) -> EmotionReading:
+        loop = asyncio.get_running_loop()
+        future: asyncio.Future[EmotionReading] = loop.create_future()
+        self._pending.append((frame_bytes, future))
+        if len(self._pending) >= self.max_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window_seconds, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, batch: list[tuple[bytes, "asyncio.Future[EmotionReading]"]]) -> None:
+        # Callers that gave up (session closed) no longer need a reading
+        batch = [(frame, future) for frame, future in batch if not future.done()]
+        try:
+            if not batch:
+                return
+            frames = [frame for frame, _ in batch]
+            readings: list[EmotionReading] | None = None
+            if len(frames) > 1:
+                readings = await _call_timed(lambda: _analyze_batch(frames))
+                if readings is None:
+                    _batch_stats["fallbacks"] += 1
+            if readings is None:
+                readings = await asyncio.gather(
+                    *(_call_timed(lambda frame=frame: _analyze_frame(frame)) for frame in frames)
+                )
+            for (_, future), reading in zip(batch, readings):
+                if not future.done():
+                    future.set_result(reading)
+        finally:
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(EmotionReading(**_FALLBACK))
+
+
+_batcher: EmotionBatcher | None = None
+
+
+def _get_batcher() -> EmotionBatcher:
+    global _batcher
+    if _batcher is None:
+        _batcher = EmotionBatcher(_BATCH_WINDOW_SECONDS, _BATCH_MAX_SIZE)
+    return _batcher
+
+
+def _strip_fences(text: str | None) -> str:
+    """Strip markdown fences if model wraps JSON in ```json ... ```"""
+    return (text or "").strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
+
+
+async def _analyze_batch(frames: list[bytes]) -> list[EmotionReading] | None:
+    """One request for several frames. Returns None unless every frame gets a valid reading."""
+    contents: list = [_batch_prompt(len(frames))]
+    for index, frame_bytes in enumerate(frames):
+        contents.append(f"Frame {index}:")
+        contents.append(types.Part.from_bytes(data=frame_bytes, mime_type="image/jpeg"))
+    try:
+        response = await gemini_scheduler.run(
+            _MODEL,
+            lambda: client.aio.models.generate_content(
+                model=_MODEL,
+                contents=contents,
+                config=types.GenerateContentConfig(
+                    temperature=0.3,
+                    thinking_config=types.ThinkingConfig(thinking_budget=0),
+                ),
+            ),
+            priority=gemini_scheduler.Priority.EMOTION,
+        )
+        data = json.loads(_strip_fences(response.text))
+        if not isinstance(data, list) or len(data) != len(frames):
+            raise ValueError(f"expected {len(frames)} readings, got {data!r:.200}")
+        readings = [EmotionReading(**item) for item in data]
+    except Exception as e:
+        logger.warning(f"Batched emotion analysis of {len(frames)} frames failed, retrying singly: {e}")
+        return None
+    _batch_stats["batches"] += 1
+    _batch_stats["batched_frames"] += len(frames)
+    return readings
+
+
+async def _analyze_frame(frame_bytes: bytes) -> EmotionReading:
     try:
         # Async client — does not block the event loop
-        response = await client.aio.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                types.Part.from_bytes(
-                    data=base64.b64decode(frame_base64),
-                    mime_type="image/jpeg",
+        response = await gemini_scheduler.run(
+            _MODEL,
+            lambda: client.aio.models.generate_content(
+                model=_MODEL,
+                contents=[
+                    types.Part.from_bytes(
+                        data=frame_bytes,
+                        mime_type="image/jpeg",
+                    ),
+                    _EMOTION_PROMPT,
+                ],
+                config=types.GenerateContentConfig(
+                    temperature=0.3,
+                    thinking_config=types.ThinkingConfig(thinking_budget=0),
                 ),
-                _EMOTION_PROMPT,
-            ],
-            config=types.GenerateContentConfig(
-                temperature=0.3,
-                thinking_config=types.ThinkingConfig(thinking_budget=0),
             ),
+            priority=gemini_scheduler.Priority.EMOTION,
         )
-        # Strip markdown fences if model wraps JSON in ```json ... ```
-        raw = (response.text or "").strip().removeprefix("```json").removeprefix("```").removesuffix("```").strip()
-        data = json.loads(raw)
+        data = json.loads(_strip_fences(response.text))
         return EmotionReading(**data)
     except Exception as e:
         logger.error(f"analyze_frame failed: {e}")
@@ -0,0 +1,90 @@
+import importlib.util
+import logging
+import os
+from typing import Any
+
+import httpx
+from google import genai
+
+logger = logging.getLogger(__name__)
+
+# One HTTP connection pool for every Gemini call in the process (google-genai
+# clients and the narrator's LlamaIndex LLM alike), so keep-alive connections
+# are reused across modules instead of each client warming its own.
+_MAX_CONNECTIONS = int(os.getenv("GEMINI_HTTP_MAX_CONNECTIONS", "64"))
+_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("GEMINI_HTTP_MAX_KEEPALIVE", "32"))
+_KEEPALIVE_SECONDS = float(os.getenv("GEMINI_HTTP_KEEPALIVE_SECONDS", "60"))
+# HTTP/2 multiplexes concurrent requests over one connection; needs the `h2` package
+_HTTP2 = os.getenv("GEMINI_HTTP2", "true").lower() == "true"
+
+_client: genai.Client | None = None
+_http_options: dict[str, Any] | None = None
+
+
+def _http2_enabled() -> bool:
+    if not _HTTP2:
+        return False
+    if importlib.util.find_spec("h2") is None:
+        logger.info("HTTP/2 unavailable for Gemini calls (install httpx[http2]); using HTTP/1.1")
+        return False
+    return True
+
+
+def http_options() -> dict[str, Any]:
+    """HttpOptions fields pointing at the shared connection pool (created on first use).
+
+    A plain dict so it can be handed to genai.Client and to LlamaIndex's
+    GoogleGenAI, which both accept one.
+    """
+    global _http_options
+    if _http_options is None:
+        limits = httpx.Limits(
+            max_connections=_MAX_CONNECTIONS,
+            max_keepalive_connections=_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=_KEEPALIVE_SECONDS,
+        )
+        http2 = _http2_enabled()
+        # Request timeouts come from the SDK per call, so the pools set none of their own
+        _http_options = {
+            "httpx_client": httpx.Client(limits=limits, http2=http2, timeout=None),
+            "httpx_async_client": httpx.AsyncClient(limits=limits, http2=http2, timeout=None),
+        }
+    return _http_options
+
+
+def get_client() -> genai.Client:
+    """The process-wide Gemini client. Created lazily, so load_dotenv() can run first."""
+    global _client
+    if _client is None:
+        _client = genai.Client(http_options=http_options())
+    return _client
+
+
+def use_client(stand_in: Any | None) -> None:
+    """Replace the shared client (e.g. with a local fake in tests or benchmarks); None restores it."""
+    global _client
+    _client = stand_in
+
+
+async def aclose() -> None:
+    """Close the shared connection pool. The next call transparently opens a new one."""
+    global _client, _http_options
+    options, _http_options, _client = _http_options, None, None
+    if options is not None:
+        options["httpx_client"].close()
+        await options["httpx_async_client"].aclose()
+
+
+class _SharedClient:
+    """Stands in for a genai.Client, resolving the shared one on each attribute access.
+
+    Modules bind this as their `client`, which keeps the old module-level name
+    (and `patch("app.<module>.client")` in tests) working without creating a
+    client at import time.
+    """
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(get_client(), name)
+
+
+client = _SharedClient()
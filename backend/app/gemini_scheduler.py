@@ -0,0 +1,329 @@
+import asyncio
+import contextvars
+import itertools
+import logging
+import os
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Awaitable, Callable, ContextManager, Iterator, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Priority(IntEnum):
+    """Lower value = more urgent."""
+
+    CRITICAL = 0   # the scene transition a viewer is waiting on
+    DIRECTOR = 1
+    EMOTION = 2
+    PREFETCH = 3   # prefetch, speculation, startup warm-up, offline pre-render
+
+
+@dataclass(eq=False)
+class PriorityScope:
+    """Priority shared by every call made under one `priority()` block.
+
+    A scope is at least as urgent as every scope in `followers`: the callers
+    currently waiting on its work (see follow()). So work started speculatively
+    runs at a viewer's priority only while that viewer is actually waiting for
+    it, and only that work, not everything its starter's scope covers.
+    """
+
+    own_level: Priority
+    followers: list["PriorityScope"] = field(default_factory=list)
+
+    @property
+    def level(self) -> Priority:
+        return min([self.own_level, *(f.level for f in self.followers)])
+
+
+_scope: contextvars.ContextVar[PriorityScope] = contextvars.ContextVar(
+    "gemini_priority", default=PriorityScope(Priority.CRITICAL)
+)
+
+
+@contextmanager
+def priority(level: Priority) -> Iterator[PriorityScope]:
+    """Run Gemini calls in this block (and tasks created in it) at `level`."""
+    with use_scope(PriorityScope(level)) as scope:
+        yield scope
+
+
+@contextmanager
+def use_scope(scope: PriorityScope) -> Iterator[PriorityScope]:
+    """Run Gemini calls in this block (and tasks created in it) under an existing `scope`."""
+    token = _scope.set(scope)
+    try:
+        yield scope
+    finally:
+        _scope.reset(token)
+
+
+def current_scope() -> PriorityScope:
+    return _scope.get()
+
+
+def _parse_limits(spec: str) -> dict[str, int]:
+    limits: dict[str, int] = {}
+    for item in spec.split(","):
+        model, _, limit = item.partition("=")
+        if model.strip() and limit.strip():
+            limits[model.strip()] = int(limit)
+    return limits
+
+
+# Per-model concurrent request limits, "model=n,model=n"; other models get the default.
+_MODEL_LIMITS = _parse_limits(os.getenv(
+    "GEMINI_MODEL_CONCURRENCY",
+    "gemini-2.5-flash=16,gemini-2.5-flash-image=4,gemini-2.5-pro-preview-tts=4,veo-3.0-generate-001=2",
+))
+_DEFAULT_LIMIT = int(os.getenv("GEMINI_DEFAULT_CONCURRENCY", "8"))
+# Share of each model's slots PREFETCH work may hold, keeping headroom for viewers
+_PREFETCH_SHARE = float(os.getenv("GEMINI_PREFETCH_SHARE", "0.5"))
+# Slots of each model EMOTION calls (webcam frames) may hold at once, so a burst of
+# frames cannot take the whole lane from director and narrator calls on the same model
+_EMOTION_LIMIT = int(os.getenv("EMOTION_MAX_INFLIGHT", "8"))
+
+
+@dataclass
+class _Waiter:
+    scope: PriorityScope
+    seq: int
+    # Resolves to the level the granted slot was taken at (see GeminiScheduler._take)
+    future: "asyncio.Future[Priority]"
+
+
+@dataclass
+class _Running:
+    scope: PriorityScope
+    task: "asyncio.Future"
+    preemptible: bool
+    slot: Priority
+    preempted: bool = False
+
+
+@dataclass
+class _Lane:
+    limit: int
+    prefetch_limit: int
+    emotion_limit: int
+    active: int = 0
+    prefetch_active: int = 0
+    emotion_active: int = 0
+    waiters: list[_Waiter] = field(default_factory=list)
+    running: list[_Running] = field(default_factory=list)
+
+
+class GeminiScheduler:
+    """Process-wide gate every Gemini request goes through.
+
+    Each model has its own concurrency limit. Queued calls are granted slots
+    most-urgent first (FIFO within a priority). PREFETCH calls may hold at most
+    `prefetch_share` of a model's slots, and when a more urgent call has to
+    queue, the newest running preemptible PREFETCH call is cancelled and
+    re-queued to make room. EMOTION calls may hold at most `emotion_limit`
+    slots of a model (no cap when None).
+    """
+
+    def __init__(
+        self,
+        limits: dict[str, int],
+        default_limit: int,
+        prefetch_share: float = 0.5,
+        emotion_limit: int | None = None,
+    ) -> None:
+        self._limits = limits
+        self._default_limit = max(1, default_limit)
+        self._prefetch_share = prefetch_share
+        self._emotion_limit = emotion_limit
+        self._lanes: dict[str, _Lane] = {}
+        self._seq = itertools.count()
+        self.preemptions = 0
+        # Per-priority queue wait: calls that had to wait, total and worst wait
+        self._waits = {p: {"queued": 0, "wait_seconds": 0.0, "max_wait_seconds": 0.0} for p in Priority}
+
+    async def run(
+        self,
+        model: str,
+        call: Callable[[], Awaitable[T]],
+        priority: Priority = Priority.CRITICAL,
+        preemptible: bool = True,
+    ) -> T:
+        """Run `call()` once a `model` slot is free.
+
+        The effective priority is the less urgent of `priority` and the caller's
+        scope, so e.g. a director call made while speculating stays PREFETCH.
+        `call` may be invoked again if a PREFETCH attempt is preempted.
+        """
+        scope = _scope.get()
+        if priority > scope.level:
+            scope = PriorityScope(priority)
+        lane = self._lane(model)
+        while True:
+            slot = await self._acquire(lane, scope)
+            running = _Running(scope, asyncio.ensure_future(call()), preemptible, slot)
+            lane.running.append(running)
+            try:
+                return await running.task
+            except asyncio.CancelledError:
+                if not running.preempted or asyncio.current_task().cancelling():
+                    raise
+                logger.info(f"Preempted a prefetch {model} call; re-queued")
+            finally:
+                lane.running.remove(running)
+                self._release(lane, running.slot)
+
+    @contextmanager
+    def follow(self, scope: PriorityScope) -> Iterator[None]:
+        """While in this block, run `scope`'s calls at least at the caller's priority.
+
+        For a caller waiting on shared or background work: the work is raised
+        for as long as someone waits on it, then drops back.
+        """
+        caller = _scope.get()
+        if caller is scope:
+            yield
+            return
+        scope.followers.append(caller)
+        for lane in self._lanes.values():
+            self._dispatch(lane)
+        try:
+            yield
+        finally:
+            scope.followers.remove(caller)
+
+    def stats(self) -> dict:
+        return {
+            "preemptions": self.preemptions,
+            "models": {
+                model: {
+                    "limit": lane.limit,
+                    "prefetch_limit": lane.prefetch_limit,
+                    "emotion_limit": lane.emotion_limit,
+                    "active": lane.active,
+                    "queued": sum(1 for w in lane.waiters if not w.future.done()),
+                }
+                for model, lane in self._lanes.items()
+            },
+            "waits": {
+                p.name.lower(): {
+                    **w,
+                    "avg_wait_seconds": w["wait_seconds"] / w["queued"] if w["queued"] else 0.0,
+                }
+                for p, w in self._waits.items()
+            },
+        }
+
+    def _lane(self, model: str) -> _Lane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            limit = max(1, self._limits.get(model, self._default_limit))
+            lane = _Lane(
+                limit=limit,
+                prefetch_limit=max(1, int(limit * self._prefetch_share)),
+                emotion_limit=limit if self._emotion_limit is None else max(1, min(limit, self._emotion_limit)),
+            )
+            self._lanes[model] = lane
+        return lane
+
+    def _admissible(self, lane: _Lane, scope: PriorityScope) -> bool:
+        if lane.active >= lane.limit:
+            return False
+        if scope.level == Priority.EMOTION:
+            return lane.emotion_active < lane.emotion_limit
+        return scope.level < Priority.PREFETCH or lane.prefetch_active < lane.prefetch_limit
+
+    def _take(self, lane: _Lane, scope: PriorityScope) -> Priority:
+        """Occupy a slot; returns the level it counts against (prefetch share, emotion cap)."""
+        lane.active += 1
+        slot = scope.level
+        if slot >= Priority.PREFETCH:
+            lane.prefetch_active += 1
+        elif slot == Priority.EMOTION:
+            lane.emotion_active += 1
+        return slot
+
+    def _release(self, lane: _Lane, slot: Priority) -> None:
+        lane.active -= 1
+        if slot >= Priority.PREFETCH:
+            lane.prefetch_active -= 1
+        elif slot == Priority.EMOTION:
+            lane.emotion_active -= 1
+        self._dispatch(lane)
+
+    async def _acquire(self, lane: _Lane, scope: PriorityScope) -> Priority:
+        lane.waiters = [w for w in lane.waiters if not w.future.done()]
+        # Waiters held back only by their own class's cap do not block this call
+        ahead = any(
+            w.scope.level <= scope.level and self._admissible(lane, w.scope) for w in lane.waiters
+        )
+        if not ahead and self._admissible(lane, scope):
+            return self._take(lane, scope)
+
+        waiter = _Waiter(scope, next(self._seq), asyncio.get_running_loop().create_future())
+        lane.waiters.append(waiter)
+        level = scope.level
+        self._preempt_for(lane, scope)
+        started = time.monotonic()
+        try:
+            return await waiter.future
+        except asyncio.CancelledError:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # Granted a slot just as we were cancelled — hand it back
+                self._release(lane, waiter.future.result())
+            raise
+        finally:
+            waited = time.monotonic() - started
+            stats = self._waits[level]
+            stats["queued"] += 1
+            stats["wait_seconds"] += waited
+            stats["max_wait_seconds"] = max(stats["max_wait_seconds"], waited)
+
+    def _dispatch(self, lane: _Lane) -> None:
+        """Grant free slots to the most urgent admissible waiters."""
+        while True:
+            lane.waiters = [w for w in lane.waiters if not w.future.done()]
+            candidates = [w for w in lane.waiters if self._admissible(lane, w.scope)]
+            if not candidates:
+                return
+            waiter = min(candidates, key=lambda w: (w.scope.level, w.seq))
+            # Slot is taken at grant time so nothing can jump in before the waiter wakes
+            waiter.future.set_result(self._take(lane, waiter.scope))
+
+    def _preempt_for(self, lane: _Lane, scope: PriorityScope) -> None:
+        if scope.level >= Priority.PREFETCH or lane.active < lane.limit:
+            return
+        victims = [
+            r for r in lane.running
+            if r.preemptible and not r.preempted and r.scope.level >= Priority.PREFETCH
+        ]
+        if victims:
+            victim = victims[-1]  # newest: least work lost
+            victim.preempted = True
+            victim.task.cancel()
+            self.preemptions += 1
+
+
+_scheduler = GeminiScheduler(_MODEL_LIMITS, _DEFAULT_LIMIT, _PREFETCH_SHARE, _EMOTION_LIMIT)
+
+
+async def run(
+    model: str,
+    call: Callable[[], Awaitable[T]],
+    priority: Priority = Priority.CRITICAL,
+    preemptible: bool = True,
+) -> T:
+    """Run one Gemini request through the process-wide scheduler (see GeminiScheduler.run)."""
+    return await _scheduler.run(model, call, priority=priority, preemptible=preemptible)
+
+
+def follow(scope: PriorityScope) -> ContextManager[None]:
+    return _scheduler.follow(scope)
+
+
+def stats() -> dict:
+    return _scheduler.stats()
@@ -1,25 +1,44 @@
 import asyncio
+import base64
+import dataclasses
 import json
 import logging
 import os
+import uuid
+import weakref
+import contextlib
 from contextlib import asynccontextmanager
 from pathlib import Path
+from typing import Awaitable, Coroutine, TypeVar
 
 from dotenv import load_dotenv
 
-# Must run before app modules are imported — genai.Client() reads GOOGLE_API_KEY at instantiation
+# Must run before app modules are imported — they read their settings (and the shared
+# Gemini client its GOOGLE_API_KEY) from the environment
 load_dotenv()
 
-from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, HTTPException, Request, Response, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
 
-from app import content_pipeline, director_agent, emotion_service, narrator_agent, story_engine
-from app.emotion_service import EmotionAccumulator
+from app import (
+    content_pipeline,
+    director_agent,
+    emotion_service,
+    gemini_client,
+    gemini_scheduler,
+    narrator_agent,
+    story_engine,
+)
+from app.asset_cache import MediaAsset
+from app.content_pipeline import SceneMedia
+from app.emotion_service import EmotionAccumulator, FrameDeduper, LatestFrame
+from app.gemini_scheduler import Priority, PriorityScope
 from app.models import (
     EmotionReading,
     EmotionSummary,
+    EmotionType,
     FrameInput,
     SceneAssets,
     SceneData,
@@ -29,6 +48,8 @@ from app.models import (
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
 # ---------------------------------------------------------------------------
 # Module-level globals
 # ---------------------------------------------------------------------------
@@ -37,8 +58,67 @@ _rest_state: StoryState = StoryState()
 # 4-tuple: (state, accumulator, frame_count, prefetch_task)
 # prefetch_task fires Veo generation for the *next* linear scene immediately after
 # the current scene starts, so the video is ready before the scene transition.
-sessions: dict[int, tuple[StoryState, EmotionAccumulator, int, "asyncio.Task[SceneAssets | None] | None"]] = {}
+sessions: dict[int, tuple[StoryState, EmotionAccumulator, int, "asyncio.Task[SceneMedia | None] | None"]] = {}
 _story_ready = asyncio.Event()
+# Cache namespace for assets generated through the REST API (single shared _rest_state)
+_REST_NAMESPACE = "rest"
+# How often a scene transition found its assets already produced by _prefetch_next;
+# renarrated: hits whose narration was stale (see _narration_emotion) and was redone
+_prefetch_stats: dict[str, int] = {"hits": 0, "misses": 0, "renarrated": 0}
+# How many of a decision point's branches to generate speculatively while the
+# preceding scene plays (0 disables).  The likeliest one also gets an early director call.
+_SPECULATIVE_BRANCHES = int(os.getenv("SPECULATIVE_BRANCHES", "1"))
+_speculation_stats: dict[str, int] = {"speculated": 0, "hits": 0, "misses": 0, "cancelled": 0}
+# Priority scope of each prefetch/speculation task, raised while a transition waits on it
+_background_scopes: "weakref.WeakKeyDictionary[asyncio.Task, PriorityScope]" = weakref.WeakKeyDictionary()
+# End-to-end deadline for one scene transition. The director and narrator each get
+# at most their own budget out of it; the content pipeline gets whatever is left.
+# A stage that runs out returns its fallback (emotion-mapped branch, seed
+# narration, missing media) instead of stalling the viewer.
+_TRANSITION_DEADLINE_SECONDS = float(os.getenv("TRANSITION_DEADLINE_SECONDS", "20"))
+_DIRECTOR_BUDGET_SECONDS = float(os.getenv("DIRECTOR_BUDGET_SECONDS", "4"))
+_NARRATOR_BUDGET_SECONDS = float(os.getenv("NARRATOR_BUDGET_SECONDS", "4"))
+# Kept back from waits on prefetch/speculation, so that if one overruns, generating
+# the scene afresh still has time to serve what is cached and render what is quick
+_MEDIA_MIN_BUDGET_SECONDS = float(os.getenv("MEDIA_MIN_BUDGET_SECONDS", "3"))
+_transition_stats: dict[str, int] = {
+    "transitions": 0,
+    "director_overruns": 0,
+    "narrator_overruns": 0,
+    "media_overruns": 0,
+    # Waits on prefetch/speculation that overran their share of the budget
+    "background_overruns": 0,
+}
+# "url": scene messages reference media served by /api/assets/{sha256} (default).
+# "inline": legacy base64 media embedded in the WebSocket JSON.
+_ASSET_DELIVERY = os.getenv("ASSET_DELIVERY", "url").lower()
+# WebSocket sub-protocol for raw-bytes frames (see _pack_binary); JSON-only otherwise
+_BINARY_SUBPROTOCOL = "directors-cut.binary.v1"
+# Progressive clients opting in ("stream_audio" on start) hear narration as raw PCM
+# chunks while TTS is still synthesising it; false always sends the finished clip
+_TTS_STREAMING: bool = os.getenv("TTS_STREAMING", "true").lower() == "true"
+# SceneMedia attributes sent to the client; "<kind>_url" / "<kind>_base64" on the wire
+_MEDIA_KINDS = ("image", "video", "audio")
+# Generate and pin every genre's opening at startup so "start" is served from memory
+_PREWARM_OPENING: bool = os.getenv("PREWARM_OPENING", "true").lower() == "true"
+_warmup_done = asyncio.Event()
+_warmup_status: dict[str, list[str]] = {"warmed": [], "failed": []}
+# Per-session pipeline: reader → (frame analysis) → analysis → transition worker, joined
+# by bounded queues.  Webcam frames wait in a latest-frame-wins slot, so a session
+# never has more than one frame call in flight plus one newest frame waiting.
+# When the analysis queue is full the oldest pending input is dropped.
+_ANALYSIS_QUEUE_SIZE = int(os.getenv("WS_ANALYSIS_QUEUE_SIZE", "8"))
+_TRANSITION_QUEUE_SIZE = 4
+_session_stats: dict[str, int] = {
+    "inputs_dropped": 0,
+    "frames_received": 0,
+    # superseded by a newer frame while a call for the session was in flight
+    "frames_coalesced": 0,
+    # discarded because the story restarted or the session ended before analysis
+    "frames_dropped": 0,
+    # scene advances abandoned mid-generation because the viewer restarted the story
+    "advances_cancelled": 0,
+}
 
 
 # ---------------------------------------------------------------------------
@@ -50,8 +130,39 @@ async def lifespan(app: FastAPI):
     story_path = Path(__file__).parent.parent.parent / "story.json"
     story_data = story_engine.load_story(str(story_path))
     logger.info(f"Loaded story with {len(story_data.get('scenes', {}))} scenes")
+    await content_pipeline.load_asset_store()
     _story_ready.set()
+    with gemini_scheduler.priority(Priority.PREFETCH):
+        warmup_task = asyncio.create_task(_warm_openings())
     yield
+    warmup_task.cancel()
+    await gemini_client.aclose()
+
+
+async def _warm_openings() -> None:
+    """Generate and pin the opening scene for every genre; sets _warmup_done when finished.
+
+    The opening has no narrator adaptation, so it is identical for every viewer of a genre.
+    """
+    try:
+        if not _PREWARM_OPENING:
+            return
+        opening_scene = story_engine.get_scene("opening", story_data)
+        decision = SceneDecision(next_scene_id="opening")
+
+        async def warm(genre: str) -> None:
+            media = await content_pipeline.generate_media(
+                decision, opening_scene, genre=genre, pin=True
+            )
+            ok = media.audio is not None and (media.image is not None or media.video is not None)
+            _warmup_status["warmed" if ok else "failed"].append(genre)
+
+        await asyncio.gather(*(warm(genre) for genre in content_pipeline.GENRES))
+        logger.info(f"Opening pre-warm finished: {_warmup_status}")
+    except Exception as e:
+        logger.error(f"Opening pre-warm failed: {e}")
+    finally:
+        _warmup_done.set()
 
 
 # ---------------------------------------------------------------------------
@@ -97,6 +208,102 @@ async def health() -> dict:
     return {"status": "ok"}
 
 
+@app.get("/ready")
+async def ready(response: Response) -> dict:
+    """503 until the opening pre-warm has finished, so traffic can wait for a warm cache."""
+    if not _warmup_done.is_set():
+        response.status_code = 503
+        return {"status": "warming", **_warmup_status}
+    return {"status": "ready", **_warmup_status}
+
+
+@app.get("/api/metrics")
+async def get_metrics() -> dict:
+    return {
+        "asset_cache": content_pipeline.cache_stats(),
+        "prefetch": _prefetch_stats,
+        "speculation": {
+            **_speculation_stats,
+            "hit_rate": _speculation_stats["hits"]
+            / max(1, _speculation_stats["hits"] + _speculation_stats["misses"]),
+        },
+        "session": _session_stats,
+        "transitions": {
+            **_transition_stats,
+            "deadline_seconds": _TRANSITION_DEADLINE_SECONDS,
+            "director_budget_seconds": _DIRECTOR_BUDGET_SECONDS,
+            "narrator_budget_seconds": _NARRATOR_BUDGET_SECONDS,
+            "media_min_budget_seconds": _MEDIA_MIN_BUDGET_SECONDS,
+        },
+        "emotion": emotion_service.stats(),
+        "gemini": gemini_scheduler.stats(),
+        "veo": content_pipeline.veo_stats(),
+    }
+
+
+def _parse_range(header: str, size: int) -> tuple[int, int] | None:
+    """Parse a single `bytes=start-end` Range header into an inclusive (start, end).
+
+    Returns None when the range cannot be satisfied; raises ValueError when the
+    header is malformed or multi-range, in which case the full body is served.
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        raise ValueError(f"Unsupported Range header: {header!r}")
+    first, _, last = spec.strip().partition("-")
+    if first == "":
+        # Suffix range: the final N bytes
+        length = int(last)
+        if length <= 0:
+            return None
+        start, end = max(0, size - length), size - 1
+    else:
+        start = int(first)
+        if last and int(last) < start:
+            raise ValueError(f"Range header ends before it starts: {header!r}")
+        end = min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        return None
+    return start, end
+
+
+@app.get("/api/assets/{sha256}")
+async def get_asset(sha256: str, request: Request) -> Response:
+    """Serve generated media by content hash — immutable, so browsers cache it forever."""
+    asset = await content_pipeline.get_asset(sha256)
+    if asset is None:
+        raise HTTPException(status_code=404, detail=f"Asset '{sha256}' not found")
+    etag = f'"{asset.sha256}"'
+    headers = {
+        "ETag": etag,
+        "Cache-Control": "public, max-age=31536000, immutable",
+        "Accept-Ranges": "bytes",
+    }
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    range_header = request.headers.get("range")
+    if range_header:
+        try:
+            byte_range = _parse_range(range_header, asset.size)
+        except ValueError:
+            range_header = None  # malformed — ignore it and serve the whole body
+    if range_header:
+        if byte_range is None:
+            headers["Content-Range"] = f"bytes */{asset.size}"
+            return Response(status_code=416, headers=headers)
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{asset.size}"
+        return Response(
+            # memoryview slice: no copy of the (possibly multi-MB) clip per range request
+            content=memoryview(asset.data)[start : end + 1],
+            status_code=206,
+            media_type=asset.mime_type,
+            headers=headers,
+        )
+    return Response(content=asset.data, media_type=asset.mime_type, headers=headers)
+
+
 @app.post("/api/emotion")
 async def post_emotion(body: FrameInput) -> EmotionReading:
     await _story_ready.wait()
@@ -112,7 +319,9 @@ async def post_director_decide(summary: EmotionSummary) -> SceneDecision:
 
 @app.post("/api/content/generate")
 async def post_content_generate(req: GenerateRequest) -> SceneAssets:
-    return await content_pipeline.generate_scene(req.decision, req.scene)
+    return await content_pipeline.generate_scene(
+        req.decision, req.scene, namespace=_REST_NAMESPACE
+    )
 
 
 @app.get("/api/story/scene/{scene_id}")
@@ -133,7 +342,7 @@ async def get_story_state() -> StoryState:
 async def post_story_reset() -> StoryState:
     global _rest_state
     _rest_state = StoryState()
-    content_pipeline.clear_cache()
+    content_pipeline.invalidate_namespace(_REST_NAMESPACE)
     return _rest_state
 
 
@@ -142,12 +351,268 @@ async def post_story_reset() -> StoryState:
 # ---------------------------------------------------------------------------
 
 
-async def _prefetch_next(scene: SceneData, genre: str) -> "SceneAssets | None":
+def _scene_payload(media: SceneMedia, inline: bool) -> dict:
+    """SceneAssets-shaped dict for a "scene" message.
+
+    Media is referenced by /api/assets URL, or embedded as base64 when `inline`.
+    """
+    if inline:
+        return media.to_assets().model_dump(mode="json")
+    bare = dataclasses.replace(media, image=None, video=None, audio=None)
+    payload = bare.to_assets().model_dump(mode="json")
+    for kind in _MEDIA_KINDS:
+        asset: MediaAsset | None = getattr(media, kind)
+        payload[f"{kind}_url"] = _asset_url(asset) if asset else None
+    return payload
+
+
+def _asset_url(asset: MediaAsset) -> str:
+    return f"/api/assets/{asset.sha256}"
+
+
+def _pack_binary(header: dict, payload: bytes) -> bytes:
+    """Binary frame: 4-byte big-endian header length, UTF-8 JSON header, raw payload."""
+    encoded = json.dumps(header).encode()
+    return len(encoded).to_bytes(4, "big") + encoded + payload
+
+
+def _unpack_binary(frame: bytes) -> tuple[dict, bytes]:
+    """Inverse of _pack_binary. Raises ValueError if the header is not a JSON object."""
+    header_len = int.from_bytes(frame[:4], "big")
+    header = json.loads(frame[4 : 4 + header_len])
+    if not isinstance(header, dict):
+        raise ValueError(f"binary frame header is a JSON {type(header).__name__}, not an object")
+    return header, frame[4 + header_len :]
+
+
+async def _push_asset(session: "_Session", asset: MediaAsset) -> None:
+    """Send `asset` as a raw binary "asset" frame, once per binary-protocol connection."""
+    sent_assets = session.sent_assets
+    url = _asset_url(asset)
+    if sent_assets is None or url in sent_assets:
+        return
+    await session.send_bytes(
+        _pack_binary({"type": "asset", "url": url, "mime": asset.mime_type}, asset.data)
+    )
+    sent_assets.add(url)
+
+
+async def _send_scene(session: "_Session", media: SceneMedia) -> None:
+    """Send a finished scene.
+
+    Progressive sessions get it as scene_start + scene_asset messages (see
+    _ProgressiveScene).  Otherwise one "scene" message: JSON-only sessions
+    (`sent_assets` is None) get URLs or inline base64.  Binary-protocol clients
+    get each media asset as a raw binary "asset" frame first (once per
+    connection — the set records what they already hold), then the scene JSON
+    referencing it by URL.
+    """
+    if session.progressive:
+        await _ProgressiveScene.for_media(session, media).send_finished(media)
+        return
+    for kind in _MEDIA_KINDS:
+        asset: MediaAsset | None = getattr(media, kind)
+        if asset is not None:
+            await _push_asset(session, asset)
+    inline = session.sent_assets is None and _ASSET_DELIVERY == "inline"
+    await session.send_json({"type": "scene", "assets": _scene_payload(media, inline)})
+
+
+@dataclasses.dataclass
+class _ProgressiveScene:
+    """Delivers one scene to a progressive client as its parts become available.
+
+    "scene_start" (narration text, chapter, mood) goes out as soon as the
+    narration is known; each asset then follows as a "scene_asset" message, and
+    a Veo clip arriving after the image was shown is sent as "scene_upgrade".
+    Assets that land before the start are held back until it is sent; late
+    ones for a scene the viewer has already moved past are dropped.
+
+    Streamed narration goes out as "audio_stream_start" (PCM format), then
+    "audio_chunk"s (raw binary frames, or base64 JSON), then "audio_stream_end";
+    the assembled clip is not sent again.
+    """
+
+    session: "_Session"
+    scene_id: str
+    mood: str
+    chapter: str
+    duration_seconds: int
+    seq: int | None = None  # session.scene_seq this scene was started as
+    held: list[tuple[str, MediaAsset]] = dataclasses.field(default_factory=list)
+    sent: set[str] = dataclasses.field(default_factory=set)
+    audio_chunks: int = 0  # PCM chunks streamed so far
+
+    @classmethod
+    def for_scene(
+        cls, session: "_Session", scene: SceneData, decision: SceneDecision
+    ) -> "_ProgressiveScene":
+        return cls(
+            session, scene.id, decision.mood_shift or "neutral", scene.chapter, scene.duration_seconds
+        )
+
+    @classmethod
+    def for_media(cls, session: "_Session", media: SceneMedia) -> "_ProgressiveScene":
+        return cls(session, media.scene_id, media.mood, media.chapter, media.duration_seconds)
+
+    async def start(self, narration_text: str) -> None:
+        self.session.scene_seq += 1
+        self.seq = self.session.scene_seq
+        await self.session.send_json({
+            "type": "scene_start",
+            "scene": {
+                "scene_id": self.scene_id,
+                "narration_text": narration_text,
+                "mood": self.mood,
+                "chapter": self.chapter,
+                "duration_seconds": self.duration_seconds,
+            },
+        })
+        held, self.held = self.held, []
+        for kind, asset in held:
+            await self.on_asset(kind, asset)
+
+    async def on_asset(self, kind: str, asset: MediaAsset) -> None:
+        """generate_media() on_asset hook; may fire after the transition has returned."""
+        if self.seq is None:
+            self.held.append((kind, asset))
+            return
+        if self.seq != self.session.scene_seq:
+            return
+        if kind == "audio" and self.audio_chunks:
+            return  # the viewer has already heard it streamed
+        upgrade = kind == "video" and "image" in self.sent
+        self.sent.add(kind)
+        try:
+            await _push_asset(self.session, asset)
+            if self.session.sent_assets is None and _ASSET_DELIVERY == "inline":
+                ref = {"url": None, "base64": asset.b64()}
+            else:
+                ref = {"url": _asset_url(asset), "base64": None}
+            await self.session.send_json({
+                "type": "scene_upgrade" if upgrade else "scene_asset",
+                "scene_id": self.scene_id,
+                "kind": kind,
+                "mime": asset.mime_type,
+                **ref,
+            })
+        except Exception as e:
+            # Late assets can land after the viewer disconnected
+            logger.debug(f"Dropped {kind} for scene '{self.scene_id}': {e}")
+
+    async def on_audio_chunk(self, pcm: bytes | None) -> None:
+        """generate_media() on_audio_chunk hook: forward streamed TTS PCM (None = end)."""
+        if self.seq is None or self.seq != self.session.scene_seq:
+            return
+        try:
+            if pcm is None:
+                if self.audio_chunks:
+                    await self.session.send_json({
+                        "type": "audio_stream_end",
+                        "scene_id": self.scene_id,
+                        "chunks": self.audio_chunks,
+                    })
+                return
+            if not self.audio_chunks:
+                await self.session.send_json({
+                    "type": "audio_stream_start",
+                    "scene_id": self.scene_id,
+                    "sample_rate": content_pipeline.TTS_SAMPLE_RATE,
+                    "channels": 1,
+                    "encoding": "pcm_s16le",
+                })
+            header = {"type": "audio_chunk", "scene_id": self.scene_id, "index": self.audio_chunks}
+            self.audio_chunks += 1
+            if self.session.sent_assets is not None:
+                await self.session.send_bytes(_pack_binary(header, pcm))
+            else:
+                await self.session.send_json({**header, "base64": base64.b64encode(pcm).decode()})
+        except Exception as e:
+            logger.debug(f"Dropped audio chunk for scene '{self.scene_id}': {e}")
+
+    async def send_finished(self, media: SceneMedia) -> None:
+        await self.start(media.narration_text)
+        # A finished scene with a clip needs no still image first
+        kinds = ("video", "audio") if media.video is not None else ("image", "audio")
+        for kind in kinds:
+            asset: MediaAsset | None = getattr(media, kind)
+            if asset is not None:
+                await self.on_asset(kind, asset)
+
+
+def _start_background(coro: Coroutine[object, object, T]) -> "asyncio.Task[T]":
+    """Run prefetch/speculation work as a task whose Gemini calls queue at PREFETCH priority."""
+    with gemini_scheduler.priority(Priority.PREFETCH) as scope:
+        task = asyncio.create_task(coro)
+    _background_scopes[task] = scope
+    return task
+
+
+async def _await_background(
+    task: "asyncio.Task[T | None]", budget: "_TransitionBudget"
+) -> "T | None":
+    """Await a background task on the critical path, raising its Gemini calls while we wait.
+
+    Gives up (None) with _MEDIA_MIN_BUDGET_SECONDS of the budget still left, for
+    the caller's fallback generation; the task itself keeps running so whatever
+    it generates still lands in the cache, back at its own priority.
+    """
+    scope = _background_scopes.get(task)
+    following = gemini_scheduler.follow(scope) if scope is not None else contextlib.nullcontext()
+    try:
+        with following:
+            return await asyncio.wait_for(
+                asyncio.shield(task), budget.remaining(reserve=_MEDIA_MIN_BUDGET_SECONDS)
+            )
+    except TimeoutError:
+        _transition_stats["background_overruns"] += 1
+        logger.warning("Background generation overran its share of the transition budget")
+        return None
+
+
+@dataclasses.dataclass
+class _TransitionBudget:
+    """End-to-end deadline of one scene transition, handed out stage by stage."""
+
+    deadline: float  # event-loop time
+
+    @classmethod
+    def start(cls) -> "_TransitionBudget":
+        return cls(asyncio.get_running_loop().time() + _TRANSITION_DEADLINE_SECONDS)
+
+    def remaining(self, cap: float | None = None, reserve: float = 0.0) -> float:
+        """Seconds left, less `reserve` (kept for later stages), at most `cap`."""
+        left = max(0.0, self.deadline - asyncio.get_running_loop().time() - reserve)
+        return left if cap is None else min(cap, left)
+
+    def media_timeout(self) -> float:
+        """What the content pipeline gets: the rest, but never under _MEDIA_MIN_BUDGET_SECONDS."""
+        return max(self.remaining(), _MEDIA_MIN_BUDGET_SECONDS)
+
+
+async def _within_budget(stage: str, work: Awaitable[T], seconds: float, fallback: T) -> T:
+    """Await `work` for at most `seconds`; on overrun count it and return `fallback`."""
+    try:
+        return await asyncio.wait_for(work, seconds)
+    except TimeoutError:
+        _transition_stats[f"{stage}_overruns"] += 1
+        logger.warning(f"{stage.capitalize()} overran its {seconds:.1f}s budget; using fallback")
+        return fallback
+
+
+async def _prefetch_next(
+    scene: SceneData,
+    accumulator: EmotionAccumulator,
+    state: StoryState,
+    namespace: str,
+) -> "SceneMedia | None":
     """Pre-generate the next *linear* scene's assets while the current one plays.
 
     Only fires for non-decision, non-ending next scenes.  At decision points we
-    don't know the branch yet, so we skip.  The result lands in the cache so the
-    transition handler finds it instantly.
+    don't know the branch yet, so we skip.  Runs exactly what the transition
+    would — narrator adaptation from the latest emotion summary, then the
+    pipeline with that narration — so the transition can consume the result
+    directly instead of generating a second, differently-keyed copy.
     """
     if scene.next is None:
         return None
@@ -157,24 +622,156 @@ async def _prefetch_next(scene: SceneData, genre: str) -> "SceneAssets | None":
         return None
     if next_node.is_decision_point:
         return None
-    dummy_decision = SceneDecision(next_scene_id=next_node.id)
+    decision = SceneDecision(next_scene_id=next_node.id)
+    next_state = story_engine.advance(state, next_node.id)
     try:
-        return await content_pipeline.generate_scene(dummy_decision, next_node, genre=genre)
+        return await _generate_with_narrator(decision, next_node, accumulator, next_state, namespace)
     except Exception as e:
         logger.warning(f"Prefetch failed for scene '{next_node.id}': {e}")
         return None
 
 
+def _narration_emotion(accumulator: EmotionAccumulator) -> EmotionType | None:
+    """The dominant emotion the narrator adapts to now; None without readings (seed narration)."""
+    return accumulator.get_summary().dominant_emotion if accumulator.history else None
+
+
+def _start_prefetch(session: "_Session", scene: SceneData) -> None:
+    session.prefetch_emotion = _narration_emotion(session.accumulator)
+    session.prefetch_task = _start_background(
+        _prefetch_next(scene, session.accumulator, session.state, session.cache_namespace)
+    )
+
+
+async def _consume_prefetch(
+    prefetch_task: "asyncio.Task[SceneMedia | None] | None",
+    scene_id: str,
+    budget: _TransitionBudget,
+) -> "SceneMedia | None":
+    """Return the prefetched assets if they were generated for `scene_id`.
+
+    Waits for a still-running prefetch rather than starting a duplicate generation.
+    """
+    if prefetch_task is None or prefetch_task.cancelled():
+        _prefetch_stats["misses"] += 1
+        return None
+    assets = await _await_background(prefetch_task, budget)
+    if assets is None or assets.scene_id != scene_id:
+        _prefetch_stats["misses"] += 1
+        return None
+    _prefetch_stats["hits"] += 1
+    return assets
+
+
+async def _speculate_branch(
+    branch_id: str,
+    ask_director: bool,
+    accumulator: EmotionAccumulator,
+    state: StoryState,
+    namespace: str,
+) -> "tuple[SceneDecision, SceneMedia] | None":
+    """Generate one candidate branch of the upcoming decision point ahead of time.
+
+    The most likely branch asks the director early with the current emotion
+    summary; alternates use the emotion-mapped decision the director itself
+    falls back to.
+    """
+    try:
+        if ask_director:
+            decision = await director_agent.decide(accumulator.get_summary(), state, story_data)
+        else:
+            decision = SceneDecision(next_scene_id=branch_id)
+        scene = story_engine.get_scene(decision.next_scene_id, story_data)
+        next_state = story_engine.advance(state, scene.id)
+        assets = await _generate_with_narrator(decision, scene, accumulator, next_state, namespace)
+        return decision, assets
+    except Exception as e:
+        logger.warning(f"Speculation failed for branch '{branch_id}': {e}")
+        return None
+
+
+def _start_speculation(
+    scene: SceneData,
+    accumulator: EmotionAccumulator,
+    state: StoryState,
+    namespace: str,
+) -> "dict[str, asyncio.Task[tuple[SceneDecision, SceneMedia] | None]]":
+    """While `scene` plays, start generating the likeliest branches of the decision point after it.
+
+    Returns one task per speculated branch, keyed by the emotion-mapped default
+    that task is meant to serve.  Empty when the next scene is not a decision point.
+    """
+    if _SPECULATIVE_BRANCHES <= 0 or scene.next is None:
+        return {}
+    try:
+        decision_scene = story_engine.get_scene(scene.next, story_data)
+    except ValueError:
+        return {}
+    if not decision_scene.is_decision_point:
+        return {}
+    ranked = director_agent.rank_branches(decision_scene, accumulator.get_summary())
+    speculation = {
+        branch_id: _start_background(
+            _speculate_branch(branch_id, rank == 0, accumulator, state, namespace)
+        )
+        for rank, branch_id in enumerate(ranked[:_SPECULATIVE_BRANCHES])
+    }
+    _speculation_stats["speculated"] += len(speculation)
+    return speculation
+
+
+def _cancel_speculation(
+    speculation: "dict[str, asyncio.Task[tuple[SceneDecision, SceneMedia] | None]]",
+) -> None:
+    """Cancel unused speculative branches. Assets they already finished stay cached (LRU-demoted)."""
+    for task in speculation.values():
+        if not task.done():
+            task.cancel()
+            _speculation_stats["cancelled"] += 1
+    speculation.clear()
+
+
+async def _consume_speculation(
+    speculation: "dict[str, asyncio.Task[tuple[SceneDecision, SceneMedia] | None]]",
+    decision_scene: SceneData,
+    accumulator: EmotionAccumulator,
+    budget: _TransitionBudget,
+) -> "tuple[SceneDecision, SceneMedia] | None":
+    """Use the speculative branch matching the viewer's *current* emotion-mapped default.
+
+    Every other speculative branch is cancelled.  Returns None on a miss, in which
+    case the caller runs the director as usual.
+    """
+    ranked = director_agent.rank_branches(decision_scene, accumulator.get_summary())
+    task = speculation.pop(ranked[0], None)
+    _cancel_speculation(speculation)
+    result = None
+    if task is not None and not task.cancelled():
+        result = await _await_background(task, budget)
+    _speculation_stats["hits" if result is not None else "misses"] += 1
+    return result
+
+
 async def _generate_with_narrator(
     decision: SceneDecision,
     scene: SceneData,
     accumulator: EmotionAccumulator,
     state: StoryState,
-) -> SceneAssets:
-    """Run Narrator Agent to personalise narration, then generate scene assets."""
+    namespace: str,
+    budget: _TransitionBudget | None = None,
+    progressive: "_ProgressiveScene | None" = None,
+) -> SceneMedia:
+    """Run Narrator Agent to personalise narration while the scene's assets generate.
+
+    Visuals start straight away; only TTS waits for the adapted narration.
+    Personalised assets are cached under the session's `namespace`. With a
+    `budget` (a live transition, not prefetch) both stages are time-boxed.
+    With `progressive`, the scene is delivered piece by piece as it generates.
+    """
     genre = state.genre or "mystery"
+    narration: Awaitable[str] | None = None
     if accumulator.history and scene.narration:
-        adapted = await narrator_agent.adapt_narration(
+        narration = narrator_agent.adapt_narration(
             seed=scene.narration,
             mood=decision.mood_shift,
             pacing=decision.pacing.value,
@@ -182,195 +779,401 @@ async def _generate_with_narrator(
             scenes_played=state.scenes_played,
             genre=genre,
         )
-        decision = decision.model_copy(update={"override_narration": adapted})
-    return await content_pipeline.generate_scene(decision, scene, genre=genre)
+        if budget is not None:
+            narration = _within_budget(
+                "narrator", narration, budget.remaining(_NARRATOR_BUDGET_SECONDS), scene.narration
+            )
+    on_asset = on_audio_chunk = None
+    if progressive is not None:
+        narration = _announce(progressive, narration, decision.override_narration or scene.narration)
+        on_asset = progressive.on_asset
+        if progressive.session.stream_audio:
+            on_audio_chunk = progressive.on_audio_chunk
+    media = await content_pipeline.generate_media(
+        decision,
+        scene,
+        genre=genre,
+        namespace=namespace,
+        timeout=budget.media_timeout() if budget is not None else None,
+        narration=narration,
+        on_asset=on_asset,
+        on_audio_chunk=on_audio_chunk,
+    )
+    if media.timed_out:
+        _transition_stats["media_overruns"] += 1
+    return media
 
 
-async def _send_opening_scene(
-    websocket: WebSocket,
-    state: StoryState,
-    accumulator: EmotionAccumulator,
-) -> tuple[StoryState, int, "asyncio.Task[SceneAssets | None] | None"]:
-    """Generate and send the opening scene.
+async def _announce(
+    progressive: "_ProgressiveScene", narration: Awaitable[str] | None, seed: str
+) -> str:
+    """Resolve the scene's narration and send scene_start with it as soon as it is known."""
+    text = await narration if narration is not None else seed
+    await progressive.start(text)
+    return text
 
-    Returns (state, frame_count=0, prefetch_task) where prefetch_task has
-    already started generating the next linear scene's assets.
-    """
-    genre = state.genre or "mystery"
+
+async def _send_opening_scene(session: "_Session") -> None:
+    """Generate and send the opening scene, then start prefetching the next linear scene."""
+    genre = session.state.genre or "mystery"
     opening_scene = story_engine.get_scene("opening", story_data)
     decision = SceneDecision(next_scene_id="opening")
-    assets = await content_pipeline.generate_scene(decision, opening_scene, genre=genre)
-    await websocket.send_text(
-        json.dumps({"type": "scene", "assets": assets.model_dump(mode="json")})
+    progressive = None
+    if session.progressive:
+        progressive = _ProgressiveScene.for_scene(session, opening_scene, decision)
+        await progressive.start(opening_scene.narration)
+    # Served from the pinned pre-warm; joins the in-flight warm-up if it is still running
+    assets = await content_pipeline.generate_media(
+        decision,
+        opening_scene,
+        genre=genre,
+        pin=True,
+        timeout=_TRANSITION_DEADLINE_SECONDS,
+        on_asset=progressive.on_asset if progressive is not None else None,
+        on_audio_chunk=(
+            progressive.on_audio_chunk
+            if progressive is not None and session.stream_audio
+            else None
+        ),
+    )
+    if assets.timed_out:
+        _transition_stats["media_overruns"] += 1
+    if progressive is None:
+        await _send_scene(session, assets)
+    session.frame_count = 0
+    _start_prefetch(session, opening_scene)
+
+
+@dataclasses.dataclass
+class _Session:
+    """Mutable state of one /ws/session connection, shared by its pipeline stages."""
+
+    websocket: WebSocket
+    # Asset URLs already delivered over this binary connection (None in JSON mode)
+    sent_assets: "set[str] | None"
+    # Owns this viewer's personalised assets; invalidated on start/reset/disconnect
+    cache_namespace: str
+    state: StoryState = dataclasses.field(default_factory=StoryState)
+    accumulator: EmotionAccumulator = dataclasses.field(default_factory=EmotionAccumulator)
+    frame_count: int = 0
+    prefetch_task: "asyncio.Task[SceneMedia | None] | None" = None
+    # Emotion the prefetch's narration was adapted to (None: no readings yet, seed narration)
+    prefetch_emotion: EmotionType | None = None
+    # Speculative branch tasks for the upcoming decision point, keyed by emotion-mapped default
+    speculation: "dict[str, asyncio.Task[tuple[SceneDecision, SceneMedia] | None]]" = (
+        dataclasses.field(default_factory=dict)
     )
-    prefetch_task = asyncio.create_task(_prefetch_next(opening_scene, genre))
-    return state, 0, prefetch_task
+    # Bumped by the reader on every start/reset so queued advances for the old story
+    # are skipped; live_epoch catches up once that restart's opening has been sent
+    epoch: int = 0
+    live_epoch: int = 0
+    advance_pending: bool = False
+    # The advance the transition worker is running; a start/reset cancels it
+    advance_task: "asyncio.Task[None] | None" = None
+    latest_frame: LatestFrame = dataclasses.field(default_factory=LatestFrame)
+    # Reuses the last reading for frames that barely changed (viewer sitting still)
+    frame_deduper: FrameDeduper = dataclasses.field(default_factory=FrameDeduper)
+    # Client asked for scene_start/scene_asset delivery instead of one "scene" message
+    progressive: bool = False
+    # Progressive client also asked for narration as streamed PCM (see _TTS_STREAMING)
+    stream_audio: bool = False
+    # Bumped per progressive scene started, so late assets for earlier scenes are dropped
+    scene_seq: int = 0
+    # Stages send concurrently; keep each WebSocket message whole
+    send_lock: asyncio.Lock = dataclasses.field(default_factory=asyncio.Lock)
+
+    async def send_json(self, message: dict) -> None:
+        async with self.send_lock:
+            await self.websocket.send_text(json.dumps(message))
+
+    async def send_bytes(self, data: bytes) -> None:
+        async with self.send_lock:
+            await self.websocket.send_bytes(data)
+
+    def publish(self) -> None:
+        sessions[id(self.websocket)] = (
+            self.state, self.accumulator, self.frame_count, self.prefetch_task
+        )
+
+    def cancel_advance(self) -> None:
+        if self.advance_task is not None:
+            self.advance_task.cancel()
+
+    def cancel_background(self) -> None:
+        if self.prefetch_task is not None:
+            self.prefetch_task.cancel()
+            self.prefetch_task = None
+        _cancel_speculation(self.speculation)
+
+
+def _put_dropping_oldest(queue: "asyncio.Queue[dict]", item: dict) -> None:
+    if queue.full():
+        queue.get_nowait()
+        _session_stats["inputs_dropped"] += 1
+    queue.put_nowait(item)
+
+
+def _drain(queue: "asyncio.Queue[dict]") -> None:
+    while not queue.empty():
+        queue.get_nowait()
+
+
+async def _read_messages(
+    session: _Session,
+    analysis_queue: "asyncio.Queue[dict]",
+    transition_queue: "asyncio.Queue[dict]",
+) -> None:
+    """Reader stage: parse client messages and route them without ever awaiting Gemini."""
+    while True:
+        message = await session.websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        try:
+            if message.get("bytes") is not None:
+                # Binary frame: JSON header + raw payload (e.g. webcam JPEG bytes)
+                msg, payload = _unpack_binary(message["bytes"])
+                msg["data"] = payload
+            else:
+                msg = json.loads(message.get("text") or "")
+                if not isinstance(msg, dict):
+                    raise ValueError(f"message is a JSON {type(msg).__name__}, not an object")
+        except (ValueError, UnicodeDecodeError) as e:
+            # ValueError covers json.JSONDecodeError
+            logger.warning(f"WS received malformed message, ignoring: {e}")
+            continue
+
+        msg_type = msg.get("type", "")
+        if msg_type in ("start", "reset"):
+            # Inputs still queued, and any advance underway, belong to the story being restarted
+            session.epoch += 1
+            session.cancel_advance()
+            _drain(analysis_queue)
+            if session.latest_frame.discard():
+                _session_stats["frames_dropped"] += 1
+            await transition_queue.put({**msg, "epoch": session.epoch})
+        elif msg_type == "emotion":
+            _put_dropping_oldest(analysis_queue, msg)
+        elif msg_type == "frame":
+            _session_stats["frames_received"] += 1
+            # base64 string over JSON, raw JPEG bytes over the binary protocol
+            if session.latest_frame.put(msg.get("data", "")):
+                _session_stats["frames_coalesced"] += 1
+
+
+async def _analyse_frames(session: _Session, analysis_queue: "asyncio.Queue[dict]") -> None:
+    """Frame stage: analyse the freshest waiting webcam frame, one call at a time."""
+    while True:
+        frame = await session.latest_frame.take()
+        epoch = session.epoch
+        reading = await session.frame_deduper.analyze(frame)
+        if epoch != session.epoch:
+            # The story restarted while this frame was being analysed
+            _session_stats["frames_dropped"] += 1
+            continue
+        _put_dropping_oldest(analysis_queue, {"type": "reading", "reading": reading})
+
+
+async def _analyse_inputs(
+    session: _Session,
+    analysis_queue: "asyncio.Queue[dict]",
+    transition_queue: "asyncio.Queue[dict]",
+) -> None:
+    """Analysis stage: echo emotion readings, accumulate them and request scene advances.
+
+    Keeps running while the transition worker generates, so feedback stays real-time.
+    """
+    while True:
+        msg = await analysis_queue.get()
+        if msg["type"] == "reading":
+            reading: EmotionReading = msg["reading"]
+        else:
+            # Pre-computed reading from Gemini Live API (React)
+            reading = EmotionReading(**msg["data"])
+        await session.send_json({"type": "emotion", "data": reading.model_dump(mode="json")})
+        session.accumulator.add_reading(reading)
+        session.frame_count += 1
+        session.publish()
+
+        # Check if it's time to advance
+        current_scene = story_engine.get_scene(session.state.current_scene_id, story_data)
+        frames_needed = max(1, current_scene.duration_seconds // 10)
+        if (
+            session.frame_count >= frames_needed
+            and current_scene.next is not None
+            and session.live_epoch == session.epoch
+            and not session.advance_pending
+        ):
+            session.advance_pending = True
+            await transition_queue.put({"type": "advance", "epoch": session.epoch})
+
+
+async def _restart_story(session: _Session, genre: str | None) -> None:
+    """Reset the session and re-send the opening ("start" and "reset")."""
+    session.cancel_background()
+    session.frame_deduper.reset()
+    session.state = StoryState(genre=genre)
+    session.accumulator = EmotionAccumulator()
+    session.frame_count = 0
+    session.advance_pending = False
+    content_pipeline.invalidate_namespace(session.cache_namespace)
+    await _send_opening_scene(session)
+    session.speculation = _start_speculation(
+        story_engine.get_scene(session.state.current_scene_id, story_data),
+        session.accumulator,
+        session.state,
+        session.cache_namespace,
+    )
+    session.publish()
+
+
+async def _advance_scene(session: _Session) -> None:
+    """Move to the next scene: director at decision points, then narrator + content pipeline."""
+    current_scene = story_engine.get_scene(session.state.current_scene_id, story_data)
+    if current_scene.next is None:
+        return
+    next_node = story_engine.get_scene(current_scene.next, story_data)
+    accumulator = session.accumulator
+    budget = _TransitionBudget.start()
+    _transition_stats["transitions"] += 1
+
+    # Decision point — use the matching speculative branch, else run the director
+    assets = None
+    if next_node.is_decision_point:
+        await session.send_json({"type": "deciding"})
+        speculated = await _consume_speculation(session.speculation, next_node, accumulator, budget)
+        if speculated is not None:
+            decision, assets = speculated
+        else:
+            summary = accumulator.get_summary()
+            # Same emotion-mapped branch decide() falls back to on failure
+            pre_selected = director_agent.rank_branches(next_node, summary)[0]
+            decision = await _within_budget(
+                "director",
+                director_agent.decide(summary, session.state, story_data),
+                budget.remaining(_DIRECTOR_BUDGET_SECONDS),
+                SceneDecision(next_scene_id=pre_selected),
+            )
+    else:
+        # Linear advance — no director call needed
+        decision = SceneDecision(next_scene_id=next_node.id)
+
+    # Advance state to the chosen scene
+    session.state = story_engine.advance(session.state, decision.next_scene_id)
+    new_scene = story_engine.get_scene(decision.next_scene_id, story_data)
+
+    # Narrator adapts narration, then content pipeline generates video/image + audio
+    if assets is None and not next_node.is_decision_point:
+        assets = await _consume_prefetch(session.prefetch_task, new_scene.id, budget)
+        current = _narration_emotion(accumulator)
+        if assets is not None and current is not None and current != session.prefetch_emotion:
+            # Readings since the prefetch started call for different narration: narrate
+            # again; the visuals come straight from the cache and TTS reruns only if the text changed
+            _prefetch_stats["renarrated"] += 1
+            assets = None
+    progressive = None
+    if assets is None:
+        if session.progressive:
+            progressive = _ProgressiveScene.for_scene(session, new_scene, decision)
+        assets = await _generate_with_narrator(
+            decision,
+            new_scene,
+            accumulator,
+            session.state,
+            session.cache_namespace,
+            budget,
+            progressive,
+        )
+    session.frame_count = 0
+    # Kick off prefetch for the next linear scene immediately
+    _start_prefetch(session, new_scene)
+    session.speculation = _start_speculation(
+        new_scene, accumulator, session.state, session.cache_namespace
+    )
+    session.publish()
+
+    if progressive is None:  # else already delivered as it generated
+        await _send_scene(session, assets)
+
+    # Ending detection: next is None and not a decision point
+    if new_scene.next is None and not new_scene.is_decision_point:
+        await session.send_json({
+            "type": "complete",
+            "ending": new_scene.id,
+            "scenes_played": session.state.scenes_played,
+        })
+
+
+async def _run_transitions(session: _Session, transition_queue: "asyncio.Queue[dict]") -> None:
+    """Transition worker: runs start/reset/advance one at a time, in arrival order."""
+    while True:
+        command = await transition_queue.get()
+        if command["type"] == "start":
+            session.progressive = bool(command.get("progressive", False))
+            session.stream_audio = (
+                _TTS_STREAMING and session.progressive and bool(command.get("stream_audio", False))
+            )
+            await _restart_story(session, command.get("genre", "mystery"))
+            session.live_epoch = command["epoch"]
+        elif command["type"] == "reset":
+            # Same as start but keep genre
+            await _restart_story(session, session.state.genre)
+            session.live_epoch = command["epoch"]
+        elif command["epoch"] == session.epoch:
+            # Its own task, so the reader can cancel it as soon as a start/reset arrives
+            session.advance_task = asyncio.create_task(_advance_scene(session))
+            try:
+                await session.advance_task
+            except asyncio.CancelledError:
+                if asyncio.current_task().cancelling():
+                    raise
+                _session_stats["advances_cancelled"] += 1
+                logger.info("Scene advance cancelled by a story restart")
+            finally:
+                session.advance_task = None
+                session.advance_pending = False
 
 
 @app.websocket("/ws/session")
 async def ws_session(websocket: WebSocket) -> None:
-    await websocket.accept()
+    # Clients offering the binary sub-protocol send frames and receive media as raw bytes
+    binary = _BINARY_SUBPROTOCOL in websocket.scope.get("subprotocols", [])
+    await websocket.accept(subprotocol=_BINARY_SUBPROTOCOL if binary else None)
     await _story_ready.wait()
 
-    # Initialise per-session state
-    state = StoryState()
-    accumulator = EmotionAccumulator()
-    frame_count = 0
-    prefetch_task: "asyncio.Task[SceneAssets | None] | None" = None
-    sessions[id(websocket)] = (state, accumulator, frame_count, prefetch_task)
+    session = _Session(
+        websocket=websocket,
+        sent_assets=set() if binary else None,
+        cache_namespace=content_pipeline.session_namespace(uuid.uuid4().hex),
+    )
+    session.publish()
+    analysis_queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=_ANALYSIS_QUEUE_SIZE)
+    transition_queue: "asyncio.Queue[dict]" = asyncio.Queue(maxsize=_TRANSITION_QUEUE_SIZE)
+    stages = [
+        asyncio.create_task(_read_messages(session, analysis_queue, transition_queue)),
+        asyncio.create_task(_analyse_frames(session, analysis_queue)),
+        asyncio.create_task(_analyse_inputs(session, analysis_queue, transition_queue)),
+        asyncio.create_task(_run_transitions(session, transition_queue)),
+    ]
 
     try:
-        async for raw in websocket.iter_text():
-            try:
-                msg = json.loads(raw)
-            except json.JSONDecodeError:
-                logger.warning("WS received non-JSON message, ignoring")
-                continue
-
-            msg_type = msg.get("type", "")
-
-            # ----------------------------------------------------------------
-            # "start" — reset session and re-send opening
-            # ----------------------------------------------------------------
-            if msg_type == "start":
-                genre = msg.get("genre", "mystery")
-                state = StoryState(genre=genre)
-                accumulator = EmotionAccumulator()
-                frame_count = 0
-                content_pipeline.clear_cache()
-                state, frame_count, prefetch_task = await _send_opening_scene(websocket, state, accumulator)
-                sessions[id(websocket)] = (state, accumulator, frame_count, prefetch_task)
-
-            # ----------------------------------------------------------------
-            # "reset" — same as start but keep genre
-            # ----------------------------------------------------------------
-            elif msg_type == "reset":
-                state = StoryState(genre=state.genre)
-                accumulator = EmotionAccumulator()
-                frame_count = 0
-                content_pipeline.clear_cache()
-                state, frame_count, prefetch_task = await _send_opening_scene(websocket, state, accumulator)
-                sessions[id(websocket)] = (state, accumulator, frame_count, prefetch_task)
-
-            # ----------------------------------------------------------------
-            # "emotion" — pre-computed reading from Gemini Live API (React)
-            # Treated identically to "frame" after analysis step
-            # ----------------------------------------------------------------
-            elif msg_type == "emotion":
-                reading = EmotionReading(**msg["data"])
-                # Echo back for UI display (same protocol as frame path)
-                await websocket.send_text(
-                    json.dumps({"type": "emotion", "data": reading.model_dump(mode="json")})
-                )
-                accumulator.add_reading(reading)
-                frame_count += 1
-                sessions[id(websocket)] = (state, accumulator, frame_count, prefetch_task)
-
-                current_scene = story_engine.get_scene(state.current_scene_id, story_data)
-                frames_needed = max(1, current_scene.duration_seconds // 10)
-
-                if frame_count >= frames_needed and current_scene.next is not None:
-                    next_node = story_engine.get_scene(current_scene.next, story_data)
-                    if next_node.is_decision_point:
-                        await websocket.send_text(json.dumps({"type": "deciding"}))
-                        decision = await director_agent.decide(
-                            accumulator.get_summary(), state, story_data
-                        )
-                    else:
-                        decision = SceneDecision(next_scene_id=next_node.id)
-
-                    state = story_engine.advance(state, decision.next_scene_id)
-                    new_scene = story_engine.get_scene(decision.next_scene_id, story_data)
-                    assets = await _generate_with_narrator(decision, new_scene, accumulator, state)
-                    frame_count = 0
-                    # Kick off prefetch for the next linear scene immediately
-                    prefetch_task = asyncio.create_task(
-                        _prefetch_next(new_scene, state.genre or "mystery")
-                    )
-                    sessions[id(websocket)] = (state, accumulator, frame_count, prefetch_task)
-
-                    await websocket.send_text(
-                        json.dumps({"type": "scene", "assets": assets.model_dump(mode="json")})
-                    )
-                    if new_scene.next is None and not new_scene.is_decision_point:
-                        await websocket.send_text(
-                            json.dumps({
-                                "type": "complete",
-                                "ending": new_scene.id,
-                                "scenes_played": state.scenes_played,
-                            })
-                        )
-
-            # ----------------------------------------------------------------
-            # "frame" — analyze emotion, maybe advance to next scene
-            # ----------------------------------------------------------------
-            elif msg_type == "frame":
-                frame_b64 = msg.get("data", "")
-
-                # Analyze emotion from frame
-                reading: EmotionReading = await emotion_service.analyze_frame(frame_b64)
-                await websocket.send_text(
-                    json.dumps({"type": "emotion", "data": reading.model_dump(mode="json")})
-                )
-                accumulator.add_reading(reading)
-                frame_count += 1
-                sessions[id(websocket)] = (state, accumulator, frame_count, prefetch_task)
-
-                # Check if it's time to advance
-                current_scene = story_engine.get_scene(state.current_scene_id, story_data)
-                frames_needed = max(1, current_scene.duration_seconds // 10)
-
-                if frame_count >= frames_needed and current_scene.next is not None:
-                    next_node = story_engine.get_scene(current_scene.next, story_data)
-
-                    # Decision point — run director to get real destination
-                    if next_node.is_decision_point:
-                        await websocket.send_text(json.dumps({"type": "deciding"}))
-                        decision = await director_agent.decide(
-                            accumulator.get_summary(), state, story_data
-                        )
-                    else:
-                        # Linear advance — no director call needed
-                        decision = SceneDecision(next_scene_id=next_node.id)
-
-                    # Advance state to the chosen scene
-                    state = story_engine.advance(state, decision.next_scene_id)
-                    new_scene = story_engine.get_scene(decision.next_scene_id, story_data)
-
-                    # Narrator adapts narration, then content pipeline generates video/image + audio
-                    assets = await _generate_with_narrator(decision, new_scene, accumulator, state)
-                    frame_count = 0
-                    # Kick off prefetch for the next linear scene immediately
-                    prefetch_task = asyncio.create_task(
-                        _prefetch_next(new_scene, state.genre or "mystery")
-                    )
-                    sessions[id(websocket)] = (state, accumulator, frame_count, prefetch_task)
-
-                    await websocket.send_text(
-                        json.dumps({"type": "scene", "assets": assets.model_dump(mode="json")})
-                    )
-
-                    # Ending detection: next is None and not a decision point
-                    if new_scene.next is None and not new_scene.is_decision_point:
-                        await websocket.send_text(
-                            json.dumps(
-                                {
-                                    "type": "complete",
-                                    "ending": new_scene.id,
-                                    "scenes_played": state.scenes_played,
-                                }
-                            )
-                        )
-
+        # Stages only return by raising: disconnect from the reader, or an error anywhere
+        done, _ = await asyncio.wait(stages, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            task.result()
     except WebSocketDisconnect:
         logger.info(f"WS session {id(websocket)} disconnected")
     except Exception as e:
         logger.error(f"WS session {id(websocket)} error: {e}", exc_info=True)
         try:
-            await websocket.send_text(
-                json.dumps({"type": "error", "message": "Internal server error"})
-            )
+            await session.send_json({"type": "error", "message": "Internal server error"})
         except Exception as send_err:
             logger.warning(f"WS session {id(websocket)} failed to send error: {send_err}")
     finally:
+        for task in stages:
+            task.cancel()
+        if session.latest_frame.discard():
+            _session_stats["frames_dropped"] += 1
+        session.cancel_background()
         sessions.pop(id(websocket), None)
+        content_pipeline.invalidate_namespace(session.cache_namespace)
+        await asyncio.wait(stages)
@@ -3,22 +3,31 @@ import os
 
 from llama_index.llms.google_genai import GoogleGenAI
 
+from app import gemini_client, gemini_scheduler
 from app.models import EmotionSummary
 
 logger = logging.getLogger(__name__)
 
+_MODEL = "gemini-2.5-flash"
+
 # Lazy singleton — created after load_dotenv() has run
 _llm: GoogleGenAI | None = None
+# Shared connection pool _llm was built on; rebuilt if the pool is reopened
+_llm_http: dict | None = None
 
 
 def _get_llm() -> GoogleGenAI:
-    global _llm
-    if _llm is None:
+    global _llm, _llm_http
+    http_options = gemini_client.http_options()
+    if _llm is None or _llm_http is not http_options:
         _llm = GoogleGenAI(
-            model="gemini-2.5-flash",
+            model=_MODEL,
             api_key=os.environ.get("GOOGLE_API_KEY", ""),
             temperature=0.8,
+            # A copy: GoogleGenAI adds its own headers to the dict it is given
+            http_options=dict(http_options),
         )
+        _llm_http = http_options
     return _llm
 
 
@@ -60,7 +69,7 @@ No quotes. No labels. No explanation. Just the narration."""
 
     try:
         llm = _get_llm()
-        response = await llm.acomplete(prompt)
+        response = await gemini_scheduler.run(_MODEL, lambda: llm.acomplete(prompt))
         adapted = response.text.strip().strip('"').strip("'")
         return adapted if adapted else seed
     except Exception as e:
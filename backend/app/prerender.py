@@ -0,0 +1,151 @@
+"""Offline pre-render of every reachable scene × genre × mood into the disk asset store.
+
+    python -m app.prerender --store-dir /data/assets [--genre horror] [--concurrency 4]
+
+Re-running resumes: variants whose assets are already persisted are skipped.
+Point the server's ASSET_STORE_DIR at the same directory to serve them at startup.
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+from collections import deque
+from dataclasses import dataclass
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+# Must run before app modules are imported — they read their settings (and the shared
+# Gemini client its GOOGLE_API_KEY) from the environment
+load_dotenv()
+
+from app import content_pipeline, gemini_scheduler, story_engine
+from app.models import SceneData, SceneDecision
+
+logger = logging.getLogger(__name__)
+
+_STORY_PATH = Path(__file__).parent.parent.parent / "story.json"
+# mood_shift values the director may pick for a branch (see director_agent._SYSTEM_PROMPT)
+_DIRECTOR_MOODS = ("tense", "warm", "mysterious")
+
+
+@dataclass(frozen=True)
+class PrerenderJob:
+    scene: SceneData
+    genre: str
+    mood: str | None
+
+    @property
+    def decision(self) -> SceneDecision:
+        return SceneDecision(next_scene_id=self.scene.id, mood_shift=self.mood)
+
+    def __str__(self) -> str:
+        return f"{self.genre}/{self.scene.id}/{self.mood or 'neutral'}"
+
+
+def reachable_scenes(story_data: dict, start: str = "opening") -> list[SceneData]:
+    """Breadth-first walk of the story graph via `next` and decision-point branches."""
+    seen = {start}
+    queue = deque([start])
+    scenes: list[SceneData] = []
+    while queue:
+        scene = story_engine.get_scene(queue.popleft(), story_data)
+        scenes.append(scene)
+        targets = list((scene.adaptation_rules or {}).values()) if scene.is_decision_point else []
+        if scene.next:
+            targets.append(scene.next)
+        for target in targets:
+            if target not in seen:
+                seen.add(target)
+                queue.append(target)
+    return scenes
+
+
+def plan_jobs(
+    story_data: dict,
+    genres: list[str],
+    moods: tuple[str, ...] = _DIRECTOR_MOODS,
+) -> list[PrerenderJob]:
+    """Every scene variant a viewer can be shown with seed narration.
+
+    Decision-point nodes are never rendered themselves. Linear scenes always play
+    with no mood shift; branch targets are rendered once per director mood too.
+    """
+    scenes = reachable_scenes(story_data)
+    branch_targets = {
+        target
+        for scene in scenes
+        if scene.is_decision_point
+        for target in (scene.adaptation_rules or {}).values()
+    }
+    jobs: list[PrerenderJob] = []
+    for genre in genres:
+        for scene in scenes:
+            if scene.is_decision_point:
+                continue
+            variants = (None, *moods) if scene.id in branch_targets else (None,)
+            jobs.extend(PrerenderJob(scene, genre, mood) for mood in variants)
+    return jobs
+
+
+async def prerender(jobs: list[PrerenderJob], concurrency: int = 4) -> dict[str, int]:
+    """Generate `jobs` with at most `concurrency` in flight. Returns outcome counts."""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    counts = {"rendered": 0, "skipped": 0, "failed": 0}
+
+    async def run(job: PrerenderJob) -> None:
+        if content_pipeline.is_persisted(job.decision, job.scene, job.genre):
+            counts["skipped"] += 1
+            return
+        async with semaphore:
+            media = await content_pipeline.generate_media(job.decision, job.scene, genre=job.genre)
+        if media.audio is None or (media.image is None and media.video is None):
+            counts["failed"] += 1
+            logger.warning(f"Incomplete render for {job}; re-run to retry")
+        else:
+            counts["rendered"] += 1
+            logger.info(f"Rendered {job}")
+
+    await asyncio.gather(*(run(job) for job in jobs))
+    return counts
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--store-dir", default=os.getenv("ASSET_STORE_DIR", ""),
+                        help="disk asset store directory (default: $ASSET_STORE_DIR)")
+    parser.add_argument("--story", default=str(_STORY_PATH), help="path to story.json")
+    parser.add_argument("--genre", action="append", choices=content_pipeline.GENRES,
+                        help="genre to render (repeatable; default: all)")
+    parser.add_argument("--concurrency", type=int, default=4, help="max scene variants in flight")
+    parser.add_argument("--dry-run", action="store_true", help="list the variants and exit")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s %(message)s")
+    jobs = plan_jobs(
+        story_engine.load_story(args.story),
+        args.genre or list(content_pipeline.GENRES),
+    )
+    if args.dry_run:
+        for job in jobs:
+            print(job)
+        return 0
+    if not args.store_dir:
+        parser.error("--store-dir or ASSET_STORE_DIR is required")
+
+    content_pipeline.use_asset_store(args.store_dir)
+
+    async def run() -> dict[str, int]:
+        await content_pipeline.load_asset_store()
+        # Yield to live viewers if this shares a process (or quota limits) with the server
+        with gemini_scheduler.priority(gemini_scheduler.Priority.PREFETCH):
+            return await prerender(jobs, concurrency=args.concurrency)
+
+    counts = asyncio.run(run())
+    logger.info(f"Pre-render finished: {counts} of {len(jobs)} variants")
+    return 1 if counts["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,262 @@
+import asyncio
+import logging
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Generic, TypeVar
+
+from app import gemini_scheduler
+from app.gemini_scheduler import Priority, PriorityScope
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+@dataclass
+class _Job(Generic[T]):
+    key: str
+    prompt: str
+    result: "asyncio.Future[T | None]"
+    queued_at: float
+    subscribers: int = 0
+    operation: Any = None       # set once submitted; polled until .done
+    started_at: float | None = None
+    deadline: float = 0.0       # queued_at + timeout: queueing counts against it too
+    expiry: asyncio.TimerHandle | None = None  # resolves the job if still queued at its deadline
+    next_poll: float = 0.0
+    interval: float = 0.0
+    # Prefetch priority, raised to that of the most urgent caller waiting on the clip
+    scope: PriorityScope = field(default_factory=lambda: PriorityScope(Priority.PREFETCH))
+
+
+class VeoJobManager(Generic[T]):
+    """Runs Veo operations in the background, independently of the requests waiting on them.
+
+    Jobs are keyed by the caller's prompt hash, so every request for the same
+    clip subscribes to one operation. At most `max_concurrent` operations are
+    live; the rest queue, most urgent subscriber first, then FIFO. A job's
+    Gemini calls run at the priority of its most urgent current subscriber,
+    and at prefetch priority once nobody is waiting. A single poll loop checks every live operation,
+    each on its own schedule backing off from `poll_initial` to `poll_max`.
+
+    A finished clip goes to `store` (the asset cache) whether or not anyone is
+    still subscribed, so an abandoned viewer's render is not wasted; whatever
+    `store` returns is what subscribers receive. A queued
+    job whose subscribers have all left is dropped before it is submitted.
+    `timeout` runs from when a job is queued, so a job stuck behind others
+    resolves to None (timed out) without ever being submitted.
+
+    `submit(prompt)` starts an operation and `poll(operation)` refreshes it;
+    operations are google-genai GenerateVideosOperation-shaped.
+    """
+
+    def __init__(
+        self,
+        submit: Callable[[str], Awaitable[Any]],
+        poll: Callable[[Any], Awaitable[Any]],
+        store: Callable[[str, bytes], Awaitable[T]],
+        max_concurrent: int = 2,
+        poll_initial: float = 2.0,
+        poll_max: float = 8.0,
+        backoff: float = 1.5,
+        timeout: float = 90.0,
+    ) -> None:
+        self._submit = submit
+        self._poll = poll
+        self._store = store
+        self._max_concurrent = max(1, max_concurrent)
+        self._poll_initial = poll_initial
+        self._poll_max = poll_max
+        self._backoff = backoff
+        self._timeout = timeout
+        self._jobs: dict[str, _Job[T]] = {}
+        self._queue: deque[_Job[T]] = deque()
+        self._live: dict[str, _Job[T]] = {}
+        self._wake = asyncio.Event()
+        self._poller: asyncio.Task | None = None
+        # Submissions and result stores; referenced here so they are not garbage-collected
+        self._tasks: set[asyncio.Task] = set()
+        self._counts = {
+            "submitted": 0,
+            "coalesced": 0,
+            "completed": 0,
+            "failed": 0,
+            "timed_out": 0,
+            "dropped": 0,
+            "polls": 0,
+        }
+        self._started = 0
+        self._queue_wait_seconds = 0.0
+        self._render_seconds = 0.0
+
+    async def result(self, key: str, prompt: str) -> T | None:
+        """Subscribe to the clip for `key`, queueing a job for `prompt` if none exists.
+
+        Returns the stored clip, or None if the job failed or timed out.
+        Cancelling the caller unsubscribes it; the job itself carries on.
+        """
+        job = self._subscribe(key, prompt)
+        try:
+            with gemini_scheduler.follow(job.scope):
+                return await asyncio.shield(job.result)
+        finally:
+            self._unsubscribe(job)
+
+    def stats(self) -> dict:
+        finished = self._counts["completed"] + self._counts["failed"] + self._counts["timed_out"]
+        return {
+            **self._counts,
+            "max_concurrent": self._max_concurrent,
+            "queued": len(self._queue),
+            "running": len(self._live),
+            "subscribers": sum(job.subscribers for job in self._jobs.values()),
+            "avg_queue_wait_seconds": self._queue_wait_seconds / self._started if self._started else 0.0,
+            "avg_render_seconds": self._render_seconds / finished if finished else 0.0,
+        }
+
+    def _subscribe(self, key: str, prompt: str) -> _Job[T]:
+        loop = asyncio.get_running_loop()
+        job = self._jobs.get(key)
+        if job is None:
+            job = _Job(key, prompt, loop.create_future(), queued_at=loop.time())
+            job.deadline = job.queued_at + self._timeout
+            job.expiry = loop.call_at(job.deadline, self._expire, job)
+            self._jobs[key] = job
+            self._queue.append(job)
+            self._fill()
+        else:
+            self._counts["coalesced"] += 1
+        job.subscribers += 1
+        return job
+
+    def _unsubscribe(self, job: _Job[T]) -> None:
+        job.subscribers -= 1
+        if job.subscribers == 0 and job in self._queue:
+            # Nothing spent on it yet, and nobody to show it to
+            self._queue.remove(job)
+            self._jobs.pop(job.key, None)
+            job.expiry.cancel()
+            job.result.cancel()
+            self._counts["dropped"] += 1
+
+    def _expire(self, job: _Job[T]) -> None:
+        if job in self._queue:
+            logger.error(f"Veo job {job.key} timed out after {self._timeout:.0f}s in the queue")
+            self._queue.remove(job)
+            self._finish(job, "timed_out")
+            self._resolve(job, None)
+
+    def _spawn(self, job: _Job[T], coro: Awaitable[None]) -> None:
+        # Jobs are shared, so they run under their own scope rather than inheriting one caller's
+        with gemini_scheduler.use_scope(job.scope):
+            task = asyncio.ensure_future(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _fill(self) -> None:
+        """Submit queued jobs while there is room under the cap."""
+        while self._queue and len(self._live) < self._max_concurrent:
+            job = min(self._queue, key=lambda queued: (queued.scope.level, queued.queued_at))
+            self._queue.remove(job)
+            job.expiry.cancel()
+            self._live[job.key] = job
+            self._spawn(job, self._start(job))
+
+    async def _start(self, job: _Job[T]) -> None:
+        loop = asyncio.get_running_loop()
+        job.started_at = loop.time()
+        self._started += 1
+        self._queue_wait_seconds += job.started_at - job.queued_at
+        try:
+            job.operation = await self._submit(job.prompt)
+        except Exception as e:
+            logger.error(f"Veo submission failed for job {job.key}: {e}")
+            self._finish(job, "failed")
+            self._resolve(job, None)
+            return
+        self._counts["submitted"] += 1
+        if job.operation.done:
+            self._collect(job)
+            return
+        job.interval = self._poll_initial
+        job.next_poll = min(loop.time() + job.interval, job.deadline)
+        self._wake.set()
+        if self._poller is None or self._poller.done():
+            self._poller = asyncio.create_task(self._poll_loop())
+
+    async def _poll_loop(self) -> None:
+        """The one loop polling every submitted operation when it is due."""
+        loop = asyncio.get_running_loop()
+        while True:
+            polling = [job for job in self._live.values() if job.operation is not None]
+            if not polling:
+                return
+            self._wake.clear()
+            delay = min(job.next_poll for job in polling) - loop.time()
+            if delay > 0:
+                # Woken early when a newly submitted job is due sooner
+                try:
+                    await asyncio.wait_for(self._wake.wait(), delay)
+                except TimeoutError:
+                    pass
+                continue
+            due = [job for job in polling if job.next_poll <= loop.time()]
+            await asyncio.gather(*(self._poll_job(job) for job in due))
+
+    async def _poll_job(self, job: _Job[T]) -> None:
+        loop = asyncio.get_running_loop()
+        try:
+            with gemini_scheduler.use_scope(job.scope):
+                job.operation = await self._poll(job.operation)
+            self._counts["polls"] += 1
+        except Exception as e:
+            # Transient: the operation is still running server-side, so retry on schedule
+            logger.warning(f"Veo poll failed for job {job.key}: {e}")
+        if job.operation.done:
+            self._collect(job)
+            return
+        now = loop.time()
+        if now >= job.deadline:
+            logger.error(f"Veo job {job.key} timed out after {self._timeout:.0f}s")
+            self._finish(job, "timed_out")
+            self._resolve(job, None)
+            return
+        job.interval = min(job.interval * self._backoff, self._poll_max)
+        job.next_poll = min(now + job.interval, job.deadline)
+
+    def _collect(self, job: _Job[T]) -> None:
+        try:
+            # operation.result (not .response) holds the GenerateVideosResponse
+            video_bytes: bytes = job.operation.result.generated_videos[0].video.video_bytes
+            if not video_bytes:
+                raise ValueError("Veo returned video with empty bytes")
+        except Exception as e:
+            logger.error(f"Veo job {job.key} failed: {getattr(job.operation, 'error', None) or e}")
+            self._finish(job, "failed")
+            self._resolve(job, None)
+            return
+        self._finish(job, "completed")
+        self._spawn(job, self._store_result(job, video_bytes))
+
+    async def _store_result(self, job: _Job[T], video_bytes: bytes) -> None:
+        stored = None
+        try:
+            stored = await self._store(job.key, video_bytes)
+        except Exception as e:
+            logger.error(f"Storing Veo clip for job {job.key} failed: {e}")
+        self._resolve(job, stored)
+
+    def _finish(self, job: _Job[T], outcome: str) -> None:
+        """Free the job's slot; its subscribers are answered by _resolve()."""
+        self._counts[outcome] += 1
+        if job.started_at is not None:
+            self._render_seconds += asyncio.get_running_loop().time() - job.started_at
+        self._live.pop(job.key, None)
+        self._fill()
+
+    def _resolve(self, job: _Job[T], result: T | None) -> None:
+        # Until now, later requests for the clip still join this job rather than start another
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        if not job.result.done():
+            job.result.set_result(result)
@@ -0,0 +1,160 @@
+import asyncio
+
+import pytest
+
+from app.asset_cache import AssetCache, SingleFlight
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def make_cache(max_bytes: int = 10, ttl_seconds: float | None = None, clock=None) -> AssetCache[str]:
+    kwargs = {"clock": clock} if clock is not None else {}
+    return AssetCache(max_bytes=max_bytes, sizeof=len, ttl_seconds=ttl_seconds, **kwargs)
+
+
+def test_get_set_counts_hits_and_misses():
+    cache = make_cache()
+    assert cache.get("a") is None
+    cache.set("a", "xxx")
+    assert cache.get("a") == "xxx"
+    stats = cache.stats()
+    assert stats["hits"] == 1
+    assert stats["misses"] == 1
+    assert stats["bytes"] == 3
+
+
+def test_evicts_least_recently_used_when_over_budget():
+    cache = make_cache(max_bytes=10)
+    cache.set("a", "aaaa")
+    cache.set("b", "bbbb")
+    cache.get("a")              # "a" is now most recently used
+    cache.set("c", "cccc")      # 12 bytes > 10 → evict "b"
+    assert "a" in cache
+    assert "b" not in cache
+    assert "c" in cache
+    assert cache.bytes_used == 8
+    assert cache.stats()["evictions"] == 1
+
+
+def test_rejects_entry_larger_than_budget():
+    cache = make_cache(max_bytes=4)
+    cache.set("a", "aa")
+    cache.set("huge", "x" * 5)
+    assert "huge" not in cache
+    assert "a" in cache
+    assert cache.stats()["rejected"] == 1
+
+
+def test_ttl_expires_entries():
+    clock = FakeClock()
+    cache = make_cache(ttl_seconds=30, clock=clock)
+    cache.set("a", "aa")
+    clock.now = 29
+    assert cache.get("a") == "aa"
+    clock.now = 31
+    assert cache.get("a") is None
+    assert cache.bytes_used == 0
+    assert cache.stats()["expirations"] == 1
+
+
+def test_overwrite_replaces_size():
+    cache = make_cache()
+    cache.set("a", "aaaaaa")
+    cache.set("a", "a")
+    assert cache.bytes_used == 1
+    assert len(cache) == 1
+
+
+def test_invalidate_namespace_keeps_other_entries():
+    cache = make_cache(max_bytes=100)
+    cache.set("opening", "shared-asset")
+    cache.set("s1-scene", "personal", namespace="session:1")
+    cache.set("s2-scene", "personal", namespace="session:2")
+    assert cache.invalidate_namespace("session:1") == 1
+    assert "opening" in cache
+    assert "s1-scene" not in cache
+    assert "s2-scene" in cache
+    assert cache.stats()["invalidations"] == 1
+
+
+async def test_single_flight_shares_one_call():
+    flight: SingleFlight[str] = SingleFlight()
+    calls = 0
+    release = asyncio.Event()
+
+    async def factory() -> str:
+        nonlocal calls
+        calls += 1
+        await release.wait()
+        return "asset"
+
+    waiters = [asyncio.create_task(flight.run("k", factory)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    assert await asyncio.gather(*waiters) == ["asset"] * 3
+    assert calls == 1
+    assert flight.stats()["coalesced"] == 2
+    assert len(flight) == 0
+
+
+async def test_single_flight_survives_one_waiter_cancelling():
+    flight: SingleFlight[str] = SingleFlight()
+    release = asyncio.Event()
+
+    async def factory() -> str:
+        await release.wait()
+        return "asset"
+
+    leaver = asyncio.create_task(flight.run("k", factory))
+    stayer = asyncio.create_task(flight.run("k", factory))
+    await asyncio.sleep(0)
+    leaver.cancel()
+    await asyncio.sleep(0)
+    release.set()
+    assert await stayer == "asset"
+    with pytest.raises(asyncio.CancelledError):
+        await leaver
+
+
+async def test_single_flight_cancels_task_when_last_waiter_leaves():
+    flight: SingleFlight[str] = SingleFlight()
+    started = asyncio.Event()
+    cancelled = asyncio.Event()
+
+    async def factory() -> str:
+        started.set()
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelled.set()
+            raise
+        return "never"
+
+    waiter = asyncio.create_task(flight.run("k", factory))
+    await started.wait()
+    waiter.cancel()
+    await asyncio.wait_for(cancelled.wait(), timeout=1)
+    assert len(flight) == 0
+    assert flight.stats()["abandoned"] == 1
+
+
+def test_pinned_entries_survive_eviction_and_ttl():
+    clock = FakeClock()
+    cache = make_cache(max_bytes=10, ttl_seconds=30, clock=clock)
+    cache.set("opening", "oooo")
+    assert cache.pin("opening")
+    cache.set("b", "bbbb")
+    cache.set("c", "cccc")      # over budget → evicts "b", never the pinned "opening"
+    assert "opening" in cache
+    assert "b" not in cache
+    clock.now = 31
+    assert cache.get("opening") == "oooo"
+    assert cache.get("c") is None
+    assert cache.stats()["pinned_bytes"] == 4
+    assert not cache.pin("missing")
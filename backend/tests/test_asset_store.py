@@ -0,0 +1,127 @@
+import json
+
+from app.asset_cache import MediaAsset
+from app.asset_store import DiskAssetStore
+
+
+def make_store(tmp_path, max_bytes: int = 100, mmap_min_bytes: int = 1024) -> DiskAssetStore:
+    store = DiskAssetStore(tmp_path, max_bytes=max_bytes, mmap_min_bytes=mmap_min_bytes)
+    store.scan()
+    return store
+
+
+def test_put_get_round_trip(tmp_path):
+    store = make_store(tmp_path)
+    asset = MediaAsset.from_bytes(b"image-bytes", "image/png")
+    store.put("image:k", asset)
+    got = store.get("image:k")
+    assert got == asset
+    assert store.get_by_sha(asset.sha256).data == b"image-bytes"
+    assert store.get("missing") is None
+    assert store.stats()["hits"] == 1
+    assert not list(tmp_path.rglob(".tmp-*"))
+
+
+def test_scan_indexes_assets_written_by_a_previous_process(tmp_path):
+    asset = MediaAsset.from_bytes(b"audio-bytes", "audio/wav")
+    make_store(tmp_path).put("audio:k", asset)
+
+    restarted = make_store(tmp_path)
+    assert "audio:k" in restarted
+    assert restarted.get("audio:k").data == b"audio-bytes"
+    assert restarted.bytes_used == asset.size
+
+
+def test_evicts_least_recently_used_and_deletes_blob(tmp_path):
+    store = make_store(tmp_path, max_bytes=10)
+    a = MediaAsset.from_bytes(b"aaaa", "image/png")
+    store.put("a", a)
+    store.put("b", MediaAsset.from_bytes(b"bbbb", "image/png"))
+    store.get("a")
+    store.put("c", MediaAsset.from_bytes(b"cccc", "image/png"))
+    assert "a" in store and "c" in store
+    assert "b" not in store
+    assert store.bytes_used == 8
+    assert store.stats()["evictions"] == 1
+    assert make_store(tmp_path, max_bytes=10).get("b") is None
+
+
+def test_identical_bytes_share_one_blob(tmp_path):
+    store = make_store(tmp_path)
+    asset = MediaAsset.from_bytes(b"same", "audio/wav")
+    store.put("k1", asset)
+    store.put("k2", asset)
+    assert store.bytes_used == 4
+    assert len(list((tmp_path / "blobs").rglob("*"))) == 2  # one shard dir + one blob
+
+
+def test_large_blobs_are_memory_mapped(tmp_path):
+    store = make_store(tmp_path, max_bytes=1 << 20, mmap_min_bytes=16)
+    video = MediaAsset.from_bytes(b"v" * 64, "video/mp4")
+    store.put("video:k", video)
+    got = store.get("video:k")
+    assert isinstance(got.data, memoryview)
+    assert bytes(got.data) == video.data
+    assert store.stats()["mmap_reads"] == 1
+
+
+def test_put_rewrites_a_blob_deleted_before_it_was_indexed(tmp_path):
+    store = make_store(tmp_path)
+    asset = MediaAsset.from_bytes(b"raced", "image/png")
+    write = store._atomic_write
+    evicted: list[bool] = []
+
+    def write_then_evict(path, data):
+        write(path, data)
+        if path.name == asset.sha256 and not evicted:
+            evicted.append(True)
+            path.unlink()  # another key's copy of the blob evicted concurrently
+
+    store._atomic_write = write_then_evict
+    store.put("k", asset)
+    assert store.get("k").data == b"raced"
+
+
+def test_memory_mapped_assets_take_no_heap(tmp_path):
+    store = make_store(tmp_path, max_bytes=1 << 20, mmap_min_bytes=16)
+    small = MediaAsset.from_bytes(b"s" * 8, "image/png")
+    store.put("small", small)
+    store.put("video", MediaAsset.from_bytes(b"v" * 64, "video/mp4"))
+    assert store.get("small").heap_size == 8
+    assert store.get("video").heap_size == 0
+
+
+def test_missing_blob_is_dropped_on_scan(tmp_path):
+    asset = MediaAsset.from_bytes(b"gone", "image/png")
+    make_store(tmp_path).put("k", asset)
+    (tmp_path / "blobs" / asset.sha256[:2] / asset.sha256).unlink()
+    assert make_store(tmp_path).get("k") is None
+
+
+def test_failed_read_tolerates_a_concurrent_eviction(tmp_path):
+    store = make_store(tmp_path, max_bytes=10)
+    store.put("a", MediaAsset.from_bytes(b"aaaa", "image/png"))
+    read = store._read
+
+    def evict_then_fail(sha256, mime_type, size):
+        store.put("b", MediaAsset.from_bytes(b"b" * 10, "image/png"))  # evicts "a" mid-read
+        return None
+
+    store._read = evict_then_fail
+    assert store.get("a") is None
+    store._read = read
+    assert "a" not in store
+    assert store.get("b").data == b"b" * 10
+    assert store.bytes_used == 10
+
+
+def test_key_file_without_a_key_is_dropped_on_scan(tmp_path):
+    make_store(tmp_path).put("k", MediaAsset.from_bytes(b"keyed", "image/png"))
+    key_file = next((tmp_path / "keys").glob("*.json"))
+    meta = json.loads(key_file.read_text())
+    del meta["key"]
+    key_file.write_text(json.dumps(meta))
+
+    restarted = make_store(tmp_path)
+    assert len(restarted) == 0
+    assert not key_file.exists()
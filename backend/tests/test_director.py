@@ -3,8 +3,9 @@ from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from app.director_agent import decide
+from app.director_agent import decide, rank_branches
 from app.models import EmotionSummary, EmotionType, SceneDecision, StoryState
+from app.story_engine import get_scene
 
 
 def make_summary(emotion: str = "engaged") -> EmotionSummary:
@@ -126,3 +127,11 @@ async def test_decide_uses_default_when_no_emotion_match(story_data):
         decision = await decide(make_summary("engaged"), state, custom_data)
     # "engaged" not in adaptation_rules → falls back to "default" key
     assert decision.next_scene_id == "default_scene"
+
+
+def test_rank_branches_puts_emotion_mapped_default_first(story_data):
+    decision_scene = get_scene("decision_1", story_data)
+    ranked = rank_branches(decision_scene, make_summary("confused"))
+    assert ranked[0] == decision_scene.adaptation_rules["confused"]
+    assert len(ranked) == len(set(ranked))
+    assert set(ranked) == set(decision_scene.adaptation_rules.values())
@@ -1,8 +1,23 @@
+import asyncio
+import base64
+import io
+import json
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
+from PIL import Image, ImageDraw
 
-from app.emotion_service import EmotionAccumulator, analyze_frame
+from app import emotion_service
+from app.emotion_service import (
+    EmotionAccumulator,
+    EmotionBatcher,
+    FrameDeduper,
+    LatestFrame,
+    analyze_frame,
+    frame_hash,
+    preprocess_frame,
+)
+from app.gemini_scheduler import GeminiScheduler
 from app.models import AttentionType, EmotionReading, EmotionType
 
 
@@ -78,3 +93,203 @@ def test_accumulator_should_trigger_min_count():
             attention=AttentionType.SCREEN, confidence=0.9
         ))
     assert acc.should_trigger() is False
+
+
+async def test_analyze_frame_accepts_raw_bytes(mock_gemini_emotion_response, fake_frame_base64):
+    frame_bytes = base64.b64decode(fake_frame_base64)
+    with patch("app.emotion_service.client") as mock_client:
+        mock_client.aio.models.generate_content = AsyncMock(return_value=mock_gemini_emotion_response)
+        reading = await analyze_frame(frame_bytes)
+    assert reading.primary_emotion == EmotionType.ENGAGED
+    image_part = mock_client.aio.models.generate_content.call_args.kwargs["contents"][0]
+    assert image_part.inline_data.data == frame_bytes
+
+
+async def test_latest_frame_keeps_only_the_newest_waiting_frame():
+    slot = LatestFrame()
+    assert slot.put("frame-1") is False
+    assert slot.put("frame-2") is True
+    assert await slot.take() == "frame-2"
+    waiter = asyncio.create_task(slot.take())
+    await asyncio.sleep(0)
+    assert not waiter.done()
+    slot.put("frame-3")
+    assert await waiter == "frame-3"
+    slot.put("frame-4")
+    assert slot.discard() is True
+    assert slot.discard() is False
+
+
+async def test_analyze_frame_is_limited_by_the_scheduler_lane(mock_gemini_emotion_response, fake_frame_base64):
+    release = asyncio.Event()
+    active = 0
+    peak = 0
+
+    async def slow_call(**kwargs):
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await release.wait()
+        active -= 1
+        return mock_gemini_emotion_response
+
+    with (
+        patch("app.gemini_scheduler._scheduler", GeminiScheduler({"gemini-2.5-flash": 2}, default_limit=8)),
+        patch("app.emotion_service.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=slow_call)
+        calls = [asyncio.create_task(analyze_frame(fake_frame_base64)) for _ in range(5)]
+        await asyncio.sleep(0.01)
+        assert peak == 2
+        release.set()
+        readings = await asyncio.gather(*calls)
+    assert peak == 2
+    assert all(r.primary_emotion == EmotionType.ENGAGED for r in readings)
+
+
+def make_jpeg(
+    box: tuple[int, int, int, int] = (40, 30, 90, 100),
+    shade: int = 200,
+    size: tuple[int, int] = (160, 120),
+) -> bytes:
+    img = Image.new("RGB", size, (30, 30, 30))
+    ImageDraw.Draw(img).ellipse(box, fill=(shade, shade, shade))
+    buf = io.BytesIO()
+    img.save(buf, format="JPEG", quality=85)
+    return buf.getvalue()
+
+
+def test_frame_hash_separates_changed_frames():
+    still = frame_hash(make_jpeg())
+    assert (still ^ frame_hash(make_jpeg(shade=205))).bit_count() <= 4
+    assert (still ^ frame_hash(make_jpeg(box=(90, 10, 150, 80)))).bit_count() > 4
+    assert frame_hash(b"not a jpeg") is None
+
+
+async def test_frame_deduper_reuses_reading_for_still_frames(mock_gemini_emotion_response):
+    deduper = FrameDeduper(max_distance=4)
+    with patch("app.emotion_service.client") as mock_client:
+        mock_client.aio.models.generate_content = AsyncMock(return_value=mock_gemini_emotion_response)
+        first = await deduper.analyze(make_jpeg())
+        again = await deduper.analyze(base64.b64encode(make_jpeg(shade=205)).decode())
+        moved = await deduper.analyze(make_jpeg(box=(90, 10, 150, 80)))
+    assert mock_client.aio.models.generate_content.call_count == 2
+    assert again.primary_emotion == first.primary_emotion
+    assert again.timestamp >= first.timestamp
+    assert moved.primary_emotion == EmotionType.ENGAGED
+
+
+async def test_frame_deduper_decodes_each_frame_once_and_counts_only_uploaded_frames(
+    mock_gemini_emotion_response,
+):
+    deduper = FrameDeduper(max_distance=4)
+    large = make_jpeg(box=(400, 200, 800, 600), size=(1280, 720))
+    decodes = 0
+    real_open = Image.open
+
+    def counting_open(*args, **kwargs):
+        nonlocal decodes
+        decodes += 1
+        return real_open(*args, **kwargs)
+
+    before = emotion_service.stats()
+    with (
+        patch("app.emotion_service.client") as mock_client,
+        patch("app.emotion_service.Image.open", side_effect=counting_open),
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(return_value=mock_gemini_emotion_response)
+        await deduper.analyze(large)
+        await deduper.analyze(large)
+    stats = emotion_service.stats()
+
+    assert decodes == 2
+    uploaded = mock_client.aio.models.generate_content.call_args.kwargs["contents"][0].inline_data.data
+    assert len(uploaded) < len(large)  # the hashed decode was also the one downscaled
+    assert stats["saved_by_dedupe"] - before["saved_by_dedupe"] == 1
+    uploads, before_uploads = stats["uploads"], before["uploads"]
+    # The duplicate was never sent, so only the first frame counts towards upload bytes
+    assert uploads["frames"] - before_uploads["frames"] == 1
+    assert uploads["resized"] - before_uploads["resized"] == 1
+    assert uploads["bytes_in"] - before_uploads["bytes_in"] == len(large)
+    assert uploads["bytes_out"] - before_uploads["bytes_out"] == len(uploaded)
+    assert uploads["resized_ms_avg"] > 0
+    assert "latency_saved_ms" not in stats
+
+
+async def test_frame_deduper_returns_fallback_for_malformed_frames():
+    deduper = FrameDeduper(max_distance=4)
+    with patch("app.emotion_service.client") as mock_client:
+        mock_client.aio.models.generate_content = AsyncMock()
+        bad_base64 = await deduper.analyze("abcde")
+        not_a_frame = await deduper.analyze(12345)
+    assert bad_base64.confidence == not_a_frame.confidence == 0.0
+    assert bad_base64.primary_emotion == EmotionType.NEUTRAL
+    mock_client.aio.models.generate_content.assert_not_called()
+
+
+async def test_frame_deduper_does_not_reuse_fallback_readings():
+    deduper = FrameDeduper(max_distance=4)
+    with patch("app.emotion_service.client") as mock_client:
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=Exception("API error"))
+        await deduper.analyze(make_jpeg())
+        await deduper.analyze(make_jpeg())
+    assert mock_client.aio.models.generate_content.call_count == 2
+
+
+def test_preprocess_frame_downscales_large_frames():
+    large = make_jpeg(box=(400, 200, 800, 600), size=(1280, 720))
+    small = preprocess_frame(large, max_side=320)
+    assert len(small) < len(large)
+    with Image.open(io.BytesIO(small)) as img:
+        assert max(img.size) == 320
+    tiny = make_jpeg()
+    assert preprocess_frame(tiny, max_side=320) is tiny
+    assert preprocess_frame(b"not a jpeg", max_side=320) == b"not a jpeg"
+
+
+async def test_analyze_frame_uploads_the_downscaled_frame(mock_gemini_emotion_response):
+    large = make_jpeg(box=(400, 200, 800, 600), size=(1280, 720))
+    with (
+        patch("app.emotion_service._FRAME_MAX_SIDE", 256),
+        patch("app.emotion_service.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(return_value=mock_gemini_emotion_response)
+        await analyze_frame(large)
+    sent = mock_client.aio.models.generate_content.call_args.kwargs["contents"][0].inline_data.data
+    with Image.open(io.BytesIO(sent)) as img:
+        assert max(img.size) == 256
+
+
+def mock_batch_response(readings: list[dict]) -> MagicMock:
+    mock_resp = MagicMock()
+    mock_resp.text = json.dumps(readings)
+    return mock_resp
+
+
+async def test_batcher_sends_one_request_and_routes_readings(
+    sample_emotion_json, sample_emotion_json_bored
+):
+    batcher = EmotionBatcher(window_seconds=0.01, max_size=8)
+    with patch("app.emotion_service.client") as mock_client:
+        mock_client.aio.models.generate_content = AsyncMock(
+            return_value=mock_batch_response([sample_emotion_json, sample_emotion_json_bored])
+        )
+        first, second = await asyncio.gather(batcher.submit(b"frame-a"), batcher.submit(b"frame-b"))
+    assert mock_client.aio.models.generate_content.call_count == 1
+    assert first.primary_emotion == EmotionType.ENGAGED
+    assert second.primary_emotion == EmotionType.BORED
+
+
+async def test_batcher_falls_back_to_single_calls_on_bad_batch(
+    sample_emotion_json, mock_gemini_emotion_response
+):
+    batcher = EmotionBatcher(window_seconds=60, max_size=2)  # flushes on size, not time
+    with patch("app.emotion_service.client") as mock_client:
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=[
+            mock_batch_response([sample_emotion_json]),  # one reading for two frames
+            mock_gemini_emotion_response,
+            mock_gemini_emotion_response,
+        ])
+        readings = await asyncio.gather(batcher.submit(b"frame-a"), batcher.submit(b"frame-b"))
+    assert mock_client.aio.models.generate_content.call_count == 3
+    assert all(r.primary_emotion == EmotionType.ENGAGED for r in readings)
@@ -0,0 +1,54 @@
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app import emotion_service, gemini_client, narrator_agent
+
+
+@pytest.fixture(autouse=True)
+async def fresh_pool():
+    await gemini_client.aclose()
+    yield
+    gemini_client.use_client(None)
+    await gemini_client.aclose()
+
+
+def test_client_is_created_once_and_shared():
+    first = gemini_client.get_client()
+    assert gemini_client.get_client() is first
+    assert gemini_client.client.aio is first.aio
+
+
+def test_http_options_share_one_pool():
+    options = gemini_client.http_options()
+    assert gemini_client.http_options() is options
+    assert options["httpx_async_client"] is gemini_client.http_options()["httpx_async_client"]
+
+
+async def test_stand_in_client_is_used_by_every_module(mock_gemini_emotion_response):
+    stand_in = MagicMock()
+    stand_in.aio.models.generate_content = AsyncMock(return_value=mock_gemini_emotion_response)
+    gemini_client.use_client(stand_in)
+
+    reading = await emotion_service._analyze_frame(b"jpeg")
+
+    assert reading.primary_emotion.value == "engaged"
+    stand_in.aio.models.generate_content.assert_awaited_once()
+
+
+async def test_aclose_reopens_pool_on_next_use():
+    options = gemini_client.http_options()
+    client = gemini_client.get_client()
+    await gemini_client.aclose()
+    assert options["httpx_async_client"].is_closed
+    assert gemini_client.http_options() is not options
+    assert gemini_client.get_client() is not client
+
+
+def test_narrator_llm_uses_shared_pool():
+    with patch("app.narrator_agent.GoogleGenAI") as mock_llm:
+        narrator_agent._get_llm()
+        narrator_agent._get_llm()
+    assert mock_llm.call_count == 1
+    passed = mock_llm.call_args.kwargs["http_options"]
+    assert passed["httpx_async_client"] is gemini_client.http_options()["httpx_async_client"]
@@ -0,0 +1,236 @@
+import asyncio
+
+import pytest
+
+from app.gemini_scheduler import GeminiScheduler, Priority, PriorityScope, follow, priority
+
+
+def make_scheduler(limit: int = 1, prefetch_share: float = 0.5) -> GeminiScheduler:
+    return GeminiScheduler({"m": limit}, default_limit=limit, prefetch_share=prefetch_share)
+
+
+class Gate:
+    """A call that records its start and blocks until released."""
+
+    def __init__(self, log: list[str], name: str) -> None:
+        self.log = log
+        self.name = name
+        self.started = asyncio.Event()
+        self.release = asyncio.Event()
+        self.attempts = 0
+
+    async def __call__(self) -> str:
+        self.attempts += 1
+        self.log.append(self.name)
+        self.started.set()
+        await self.release.wait()
+        return self.name
+
+
+async def run_at(scheduler: GeminiScheduler, level: Priority, call, preemptible: bool = True):
+    with priority(level):
+        return await scheduler.run("m", call, preemptible=preemptible)
+
+
+async def test_grants_queued_calls_most_urgent_first():
+    scheduler = make_scheduler(limit=1)
+    log: list[str] = []
+    first = Gate(log, "first")
+    running = asyncio.create_task(run_at(scheduler, Priority.CRITICAL, first))
+    await first.started.wait()
+
+    emotion = Gate(log, "emotion")
+    director = Gate(log, "director")
+    for gate in (emotion, director):
+        gate.release.set()
+    waiting = [
+        asyncio.create_task(run_at(scheduler, Priority.EMOTION, emotion)),
+        asyncio.create_task(run_at(scheduler, Priority.DIRECTOR, director)),
+    ]
+    await asyncio.sleep(0)
+    first.release.set()
+    await asyncio.gather(running, *waiting)
+    assert log == ["first", "director", "emotion"]
+    waits = scheduler.stats()["waits"]
+    assert waits["director"]["queued"] == 1
+    assert waits["emotion"]["queued"] == 1
+    assert waits["critical"]["queued"] == 0
+
+
+async def test_limits_concurrency_per_model():
+    scheduler = GeminiScheduler({"a": 2}, default_limit=1)
+    active = peak = 0
+
+    async def call() -> None:
+        nonlocal active, peak
+        active += 1
+        peak = max(peak, active)
+        await asyncio.sleep(0.01)
+        active -= 1
+
+    await asyncio.gather(*(scheduler.run("a", call) for _ in range(6)))
+    assert peak == 2
+    assert scheduler.stats()["models"]["a"]["active"] == 0
+
+
+async def test_prefetch_share_keeps_headroom_for_urgent_calls():
+    scheduler = make_scheduler(limit=4, prefetch_share=0.5)
+    log: list[str] = []
+    gates = [Gate(log, f"prefetch{i}") for i in range(3)]
+    tasks = [asyncio.create_task(run_at(scheduler, Priority.PREFETCH, g)) for g in gates]
+    await asyncio.wait_for(asyncio.gather(gates[0].started.wait(), gates[1].started.wait()), 1)
+    await asyncio.sleep(0.01)
+    assert log == ["prefetch0", "prefetch1"]   # third waits: prefetch may hold 2 of 4 slots
+
+    critical = Gate(log, "critical")
+    critical.release.set()
+    assert await run_at(scheduler, Priority.CRITICAL, critical) == "critical"
+    assert scheduler.stats()["preemptions"] == 0
+
+    for gate in gates:
+        gate.release.set()
+    await asyncio.gather(*tasks)
+    assert log[-1] == "prefetch2"
+
+
+async def test_emotion_limit_caps_frame_calls_without_blocking_other_work():
+    scheduler = GeminiScheduler({"m": 4}, default_limit=4, emotion_limit=2)
+    log: list[str] = []
+    gates = [Gate(log, f"emotion{i}") for i in range(3)]
+    tasks = [asyncio.create_task(run_at(scheduler, Priority.EMOTION, g)) for g in gates]
+    await asyncio.wait_for(asyncio.gather(gates[0].started.wait(), gates[1].started.wait()), 1)
+    await asyncio.sleep(0.01)
+    assert log == ["emotion0", "emotion1"]   # third waits: emotion may hold 2 of 4 slots
+
+    # Free slots stay open to other classes, even ones queued behind the capped frame
+    for level, name in ((Priority.DIRECTOR, "director"), (Priority.PREFETCH, "prefetch")):
+        gate = Gate(log, name)
+        gate.release.set()
+        assert await asyncio.wait_for(run_at(scheduler, level, gate), 1) == name
+    assert scheduler.stats()["models"]["m"]["emotion_limit"] == 2
+
+    gates[0].release.set()
+    await gates[2].started.wait()
+    for gate in gates:
+        gate.release.set()
+    await asyncio.gather(*tasks)
+    assert log[-1] == "emotion2"
+
+
+async def test_urgent_call_preempts_and_requeues_prefetch_work():
+    scheduler = make_scheduler(limit=1, prefetch_share=1.0)
+    log: list[str] = []
+    prefetch = Gate(log, "prefetch")
+    background = asyncio.create_task(run_at(scheduler, Priority.PREFETCH, prefetch))
+    await prefetch.started.wait()
+
+    critical = Gate(log, "critical")
+    critical.release.set()
+    assert await run_at(scheduler, Priority.CRITICAL, critical) == "critical"
+
+    prefetch.release.set()
+    assert await background == "prefetch"
+    assert prefetch.attempts == 2
+    assert log == ["prefetch", "critical", "prefetch"]
+    assert scheduler.stats()["preemptions"] == 1
+
+
+async def test_non_preemptible_prefetch_work_is_never_cancelled():
+    scheduler = make_scheduler(limit=1, prefetch_share=1.0)
+    log: list[str] = []
+    job = Gate(log, "job")
+    background = asyncio.create_task(run_at(scheduler, Priority.PREFETCH, job, preemptible=False))
+    await job.started.wait()
+
+    critical = Gate(log, "critical")
+    critical.release.set()
+    waiting = asyncio.create_task(run_at(scheduler, Priority.CRITICAL, critical))
+    await asyncio.sleep(0)
+    assert log == ["job"]
+
+    job.release.set()
+    await asyncio.gather(background, waiting)
+    assert job.attempts == 1
+    assert scheduler.stats()["preemptions"] == 0
+
+
+async def test_following_promotes_queued_background_work_while_waiting():
+    scheduler = make_scheduler(limit=1, prefetch_share=1.0)
+    log: list[str] = []
+    first = Gate(log, "first")
+    running = asyncio.create_task(run_at(scheduler, Priority.CRITICAL, first))
+    await first.started.wait()
+
+    with priority(Priority.PREFETCH) as scope:
+        prefetch = Gate(log, "prefetch")
+        prefetch.release.set()
+        background = asyncio.create_task(scheduler.run("m", prefetch))
+    emotion = Gate(log, "emotion")
+    emotion.release.set()
+    waiting = asyncio.create_task(run_at(scheduler, Priority.EMOTION, emotion))
+    await asyncio.sleep(0)
+
+    with scheduler.follow(scope):  # a viewer (CRITICAL by default) now waits on the prefetch
+        assert scope.level == Priority.CRITICAL
+        first.release.set()
+        await asyncio.gather(running, background, waiting)
+    assert scope.level == Priority.PREFETCH
+    assert log == ["first", "prefetch", "emotion"]
+
+
+async def test_following_one_scope_leaves_its_siblings_alone():
+    # One prefetch task generating two assets, each under its own scope
+    with priority(Priority.PREFETCH) as starter:
+        image = PriorityScope(Priority.PREFETCH, [starter])
+        audio = PriorityScope(Priority.PREFETCH, [starter])
+
+    with follow(image):  # a viewer waits on the image only
+        assert image.level == Priority.CRITICAL
+        assert audio.level == starter.level == Priority.PREFETCH
+
+
+async def test_call_priority_never_outranks_background_scope():
+    scheduler = make_scheduler(limit=1, prefetch_share=1.0)
+    log: list[str] = []
+    first = Gate(log, "first")
+    running = asyncio.create_task(run_at(scheduler, Priority.CRITICAL, first))
+    await first.started.wait()
+
+    speculative = Gate(log, "speculative-director")
+    speculative.release.set()
+    emotion = Gate(log, "emotion")
+    emotion.release.set()
+
+    async def speculative_director() -> str:
+        with priority(Priority.PREFETCH):
+            return await scheduler.run("m", speculative, priority=Priority.DIRECTOR)
+
+    tasks = [
+        asyncio.create_task(speculative_director()),
+        asyncio.create_task(run_at(scheduler, Priority.EMOTION, emotion)),
+    ]
+    await asyncio.sleep(0)
+    first.release.set()
+    await asyncio.gather(running, *tasks)
+    assert log == ["first", "emotion", "speculative-director"]
+
+
+async def test_cancelled_waiter_releases_nothing_it_did_not_hold():
+    scheduler = make_scheduler(limit=1)
+    log: list[str] = []
+    first = Gate(log, "first")
+    running = asyncio.create_task(run_at(scheduler, Priority.CRITICAL, first))
+    await first.started.wait()
+
+    waiter = asyncio.create_task(run_at(scheduler, Priority.CRITICAL, Gate(log, "never")))
+    await asyncio.sleep(0)
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    first.release.set()
+    await running
+    assert scheduler.stats()["models"]["m"] == {
+        "limit": 1, "prefetch_limit": 1, "emotion_limit": 1, "active": 0, "queued": 0,
+    }
+    assert log == ["first"]
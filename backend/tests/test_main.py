@@ -0,0 +1,95 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+import pytest
+
+from app import main
+from app.asset_cache import MediaAsset
+from app.content_pipeline import _cache
+from app.emotion_service import EmotionAccumulator
+from app.main import _Session
+from app.models import EmotionReading, EmotionType
+
+
+@pytest.fixture(autouse=True)
+def loaded_story(story_data, monkeypatch):
+    monkeypatch.setattr(main, "story_data", story_data)
+    _cache.clear()
+    yield
+    _cache.clear()
+
+
+def make_session() -> _Session:
+    websocket = MagicMock()
+    websocket.send_text = AsyncMock()
+    return _Session(websocket=websocket, sent_assets=None, cache_namespace="test-session")
+
+
+def sent_scenes(session: _Session) -> list[dict]:
+    messages = [json.loads(call.args[0]) for call in session.websocket.send_text.call_args_list]
+    return [message["assets"] for message in messages if message["type"] == "scene"]
+
+
+def media_response() -> MagicMock:
+    m = MagicMock()
+    m.candidates[0].content.parts[0].inline_data.data = b"\x00\x01" * 8
+    m.candidates[0].content.parts[0].inline_data.mime_type = "image/png"
+    return m
+
+
+async def test_transition_renarrates_a_prefetch_made_before_any_readings():
+    async def adapt_narration(seed, emotion, **kwargs):
+        return f"Told for a {emotion.dominant_emotion.value} viewer."
+
+    session = make_session()
+    session.accumulator = EmotionAccumulator()
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+        patch("app.narrator_agent.adapt_narration", side_effect=adapt_narration),
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(return_value=media_response())
+        await main._send_opening_scene(session)
+        assert await session.prefetch_task is not None  # generated with the seed narration
+
+        for _ in range(3):
+            session.accumulator.add_reading(EmotionReading(
+                primary_emotion=EmotionType.TENSE, intensity=8, attention="screen", confidence=0.9
+            ))
+        image_calls = mock_client.aio.models.generate_content.call_count
+        await main._advance_scene(session)
+
+    scene = sent_scenes(session)[-1]
+    assert scene["scene_id"] == "foyer"
+    assert scene["narration_text"] == "Told for a tense viewer."
+    # Only the narration's TTS was redone; the prefetched image came from the cache
+    assert mock_client.aio.models.generate_content.call_count == image_calls + 1
+    assert main._prefetch_stats["renarrated"] >= 1
+    session.cancel_background()
+    await asyncio.sleep(0)
+
+
+@pytest.mark.parametrize(
+    ("range_header", "status", "body", "content_range"),
+    [
+        (None, 200, b"0123456789", None),
+        ("bytes=2-5", 206, b"2345", "bytes 2-5/10"),
+        ("bytes=-3", 206, b"789", "bytes 7-9/10"),
+        ("bytes=8-", 206, b"89", "bytes 8-9/10"),
+        ("bytes=10-12", 416, b"", "bytes */10"),
+        ("bytes=5-3", 200, b"0123456789", None),  # malformed: the full body, not 416
+        ("bytes=0-1,4-5", 200, b"0123456789", None),
+    ],
+)
+async def test_asset_endpoint_serves_byte_ranges(range_header, status, body, content_range):
+    asset = MediaAsset.from_bytes(b"0123456789", "video/mp4")
+    headers = {"Range": range_header} if range_header else {}
+    transport = httpx.ASGITransport(app=main.app)
+    with patch("app.main.content_pipeline.get_asset", AsyncMock(return_value=asset)):
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.get(f"/api/assets/{asset.sha256}", headers=headers)
+    assert response.status_code == status
+    assert response.content == body
+    assert response.headers.get("content-range") == content_range
@@ -1,10 +1,27 @@
+import asyncio
+import base64
 from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
-from app.content_pipeline import _cache, generate_scene
+from app import content_pipeline
+from app.content_pipeline import (
+    _cache,
+    _pcm_to_wav,
+    generate_media,
+    generate_scene,
+    get_asset,
+    invalidate_namespace,
+)
+from app.asset_cache import MediaAsset
+from app.asset_store import DiskAssetStore
 from app.models import Pacing, SceneAssets, SceneData, SceneDecision
 
+IMAGE_BYTES = b"\x89PNG fake image bytes"
+AUDIO_PCM = b"\x00\x01" * 16
+IMAGE_B64 = base64.b64encode(IMAGE_BYTES).decode()
+AUDIO_B64 = base64.b64encode(_pcm_to_wav(AUDIO_PCM)).decode()
+
 
 @pytest.fixture(autouse=True)
 def clear_pipeline_cache():
@@ -13,6 +30,12 @@ def clear_pipeline_cache():
     _cache.clear()
 
 
+@pytest.fixture(autouse=True)
+def fresh_veo_jobs(monkeypatch):
+    # Each test runs on its own event loop, and Veo jobs belong to the loop that queued them
+    monkeypatch.setattr(content_pipeline, "_veo_jobs", content_pipeline._new_veo_jobs())
+
+
 def make_scene(scene_id: str = "test_scene") -> SceneData:
     return SceneData(
         id=scene_id,
@@ -31,13 +54,14 @@ def make_decision() -> SceneDecision:
 
 def mock_image_response() -> MagicMock:
     m = MagicMock()
-    m.candidates[0].content.parts[0].inline_data.data = "base64imagedata"
+    m.candidates[0].content.parts[0].inline_data.data = IMAGE_BYTES
+    m.candidates[0].content.parts[0].inline_data.mime_type = "image/png"
     return m
 
 
 def mock_audio_response() -> MagicMock:
     m = MagicMock()
-    m.candidates[0].content.parts[0].inline_data.data = "base64audiodata"
+    m.candidates[0].content.parts[0].inline_data.data = AUDIO_PCM
     return m
 
 
@@ -72,7 +96,7 @@ async def test_generate_scene_veo_returns_video():
     assert isinstance(assets, SceneAssets)
     assert assets.video_base64 is not None
     assert assets.image_base64 is None         # no static image when Veo succeeds
-    assert assets.audio_base64 == "base64audiodata"
+    assert assets.audio_base64 == AUDIO_B64
 
 
 async def test_generate_scene_veo_failure_falls_back_to_image():
@@ -91,8 +115,8 @@ async def test_generate_scene_veo_failure_falls_back_to_image():
         ])
         assets = await generate_scene(decision, scene)
     assert assets.video_base64 is None
-    assert assets.image_base64 == "base64imagedata"
-    assert assets.audio_base64 == "base64audiodata"
+    assert assets.image_base64 == IMAGE_B64
+    assert assets.audio_base64 == AUDIO_B64
 
 
 # ---------------------------------------------------------------------------
@@ -113,8 +137,8 @@ async def test_generate_scene_veo_disabled_returns_image():
         ])
         assets = await generate_scene(decision, scene)
     assert assets.video_base64 is None
-    assert assets.image_base64 == "base64imagedata"
-    assert assets.audio_base64 == "base64audiodata"
+    assert assets.image_base64 == IMAGE_B64
+    assert assets.audio_base64 == AUDIO_B64
 
 
 async def test_generate_scene_image_fallback_api_failure():
@@ -134,7 +158,7 @@ async def test_generate_scene_image_fallback_api_failure():
         mock_client.aio.models.generate_content = AsyncMock(side_effect=side_effect)
         assets = await generate_scene(decision, scene)
     assert assets.image_base64 is None
-    assert assets.audio_base64 == "base64audiodata"
+    assert assets.audio_base64 == AUDIO_B64
 
 
 async def test_generate_scene_tts_fallback():
@@ -152,7 +176,7 @@ async def test_generate_scene_tts_fallback():
     ):
         mock_client.aio.models.generate_content = AsyncMock(side_effect=side_effect)
         assets = await generate_scene(decision, scene)
-    assert assets.image_base64 == "base64imagedata"
+    assert assets.image_base64 == IMAGE_B64
     assert assets.audio_base64 is None
 
 
@@ -171,7 +195,27 @@ async def test_generate_scene_cache_hit():
         second = await generate_scene(decision, scene)
     # Only 2 API calls total (TTS + image fallback) for first call; second is cached
     assert mock_client.aio.models.generate_content.call_count == 2
-    assert first is second
+    assert first == second
+
+
+async def test_generate_scene_concurrent_calls_share_one_generation():
+    scene = make_scene()
+    decision = make_decision()
+
+    async def slow_response(model, **kwargs):
+        await asyncio.sleep(0.01)
+        return mock_audio_response() if "tts" in model else mock_image_response()
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=slow_response)
+        first, second = await asyncio.gather(
+            generate_scene(decision, scene), generate_scene(decision, scene)
+        )
+    assert mock_client.aio.models.generate_content.call_count == 2
+    assert first == second
 
 
 async def test_generate_scene_parallel():
@@ -189,3 +233,413 @@ async def test_generate_scene_parallel():
     # asyncio.gather fires TTS + Veo(no-op) in parallel; image fallback fires after
     assert assets.image_base64 is not None
     assert assets.audio_base64 is not None
+
+
+async def test_invalidate_namespace_keeps_shared_assets():
+    """Personalised narration is session-scoped; the seed-narration scene stays warm."""
+    scene = make_scene()
+    shared = make_decision()
+    personal = shared.model_copy(update={"override_narration": "Just for you."})
+
+    def side_effect(model, **kwargs):
+        return mock_audio_response() if "tts" in model else mock_image_response()
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=side_effect)
+        await generate_scene(shared, scene, namespace="session:a")
+        await generate_scene(personal, scene, namespace="session:a")
+        assert invalidate_namespace("session:a") == 1
+        await generate_scene(shared, scene, namespace="session:b")
+    # Shared image + seed TTS, then only the personalised TTS; session b is fully cached
+    assert mock_client.aio.models.generate_content.call_count == 3
+
+
+async def test_generate_scene_narration_change_only_regenerates_audio():
+    scene = make_scene()
+    decision = make_decision()
+    models: list[str] = []
+
+    def side_effect(model, **kwargs):
+        models.append(model)
+        return mock_audio_response() if "tts" in model else mock_image_response()
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=side_effect)
+        await generate_scene(decision, scene)
+        rewritten = decision.model_copy(update={"override_narration": "A new line."})
+        assets = await generate_scene(rewritten, scene)
+    assert assets.image_base64 == IMAGE_B64
+    assert assets.narration_text == "A new line."
+    assert sum("tts" in m for m in models) == 2
+    assert sum("tts" not in m for m in models) == 1
+
+
+async def test_generate_media_keeps_raw_bytes_addressable_by_hash():
+    scene = make_scene()
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=[
+            mock_audio_response(),
+            mock_image_response(),
+        ])
+        media = await generate_media(make_decision(), scene)
+    assert media.image.data == IMAGE_BYTES
+    assert media.image.mime_type == "image/png"
+    assert media.audio.mime_type == "audio/wav"
+    assert await get_asset(media.image.sha256) is media.image
+    _cache.clear()
+    assert await get_asset(media.image.sha256) is None
+
+
+async def test_disk_store_serves_shared_assets_after_memory_is_lost(tmp_path):
+    store = DiskAssetStore(tmp_path, max_bytes=1 << 20)
+    store.scan()
+    scene = make_scene()
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline._store", store),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=[
+            mock_audio_response(),
+            mock_image_response(),
+        ])
+        first = await generate_media(make_decision(), scene)
+        _cache.clear()  # simulate a restart
+        second = await generate_media(make_decision(), scene)
+        assert await get_asset(first.image.sha256) is not None
+    assert mock_client.aio.models.generate_content.call_count == 2
+    assert second.image.data == IMAGE_BYTES
+    assert second.audio.sha256 == first.audio.sha256
+    assert store.stats()["hits"] == 2
+
+
+def test_memory_mapped_assets_are_charged_a_nominal_cache_cost(tmp_path):
+    store = DiskAssetStore(tmp_path, max_bytes=1 << 20, mmap_min_bytes=16)
+    store.scan()
+    store.put("video", MediaAsset.from_bytes(b"v" * 64, "video/mp4"))
+    mapped = store.get("video")
+    assert mapped.heap_size == 0
+    assert content_pipeline._cache_cost(mapped) == content_pipeline._MAPPED_ASSET_COST
+    assert content_pipeline._cache_cost(MediaAsset.from_bytes(b"i" * 8, "image/png")) == 8
+
+
+async def test_veo_clip_is_stored_once(tmp_path):
+    store = DiskAssetStore(tmp_path, max_bytes=1 << 20)
+    store.scan()
+    op = mock_veo_operation(b"fakevideobytes")
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", True),
+        patch("app.content_pipeline._VEO_HEDGE_WINDOW_SECONDS", 0),
+        patch("app.content_pipeline._store", store),
+        patch.object(store, "put", wraps=store.put) as put,
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_videos = AsyncMock(return_value=op)
+        mock_client.aio.models.generate_content = AsyncMock(return_value=mock_audio_response())
+        media = await generate_media(make_decision(), make_scene())
+    video_puts = [call for call in put.call_args_list if call.args[1].mime_type == "video/mp4"]
+    assert len(video_puts) == 1
+    assert video_puts[0].args[1] is media.video
+
+
+async def test_generate_media_pin_keeps_assets_resident():
+    scene = make_scene()
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=[
+            mock_audio_response(),
+            mock_image_response(),
+        ])
+        media = await generate_media(make_decision(), scene, pin=True)
+    assert _cache.stats()["pinned_bytes"] == media.image.size + media.audio.size
+
+
+async def test_generate_media_timeout_returns_ready_assets_and_caches_late_ones():
+    scene = make_scene()
+
+    async def generate(model, **kwargs):
+        if "image" in model:
+            await asyncio.sleep(0.2)
+            return mock_image_response()
+        return mock_audio_response()
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=generate)
+        media = await generate_media(make_decision(), scene, timeout=0.05)
+        assert media.audio is not None
+        assert media.image is None
+        assert media.timed_out == ("image",)
+
+        await asyncio.sleep(0.3)   # the cut-off image generation finishes in the background
+        again = await generate_media(make_decision(), scene, timeout=0.05)
+    assert again.image.data == IMAGE_BYTES
+    assert again.timed_out == ()
+    assert mock_client.aio.models.generate_content.call_count == 2
+
+
+async def test_generate_media_starts_visuals_before_narration_is_ready():
+    scene = make_scene()
+    narration_ready = asyncio.Event()
+    models_called: list[str] = []
+
+    async def narrate() -> str:
+        await narration_ready.wait()
+        return "An adapted line."
+
+    async def generate(model, **kwargs):
+        models_called.append(model)
+        if "image" in model:
+            narration_ready.set()   # image generation is under way before TTS can begin
+            return mock_image_response()
+        return mock_audio_response()
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=generate)
+        media = await generate_media(
+            make_decision(), scene, namespace="session:a", narration=narrate()
+        )
+    assert models_called == ["gemini-2.5-flash-image", "gemini-2.5-pro-preview-tts"]
+    assert media.narration_text == "An adapted line."
+    assert media.image.data == IMAGE_BYTES
+    assert media.audio is not None
+
+
+async def test_generate_media_reports_assets_as_they_land_including_late_ones():
+    scene = make_scene()
+    reported: list[str] = []
+
+    async def on_asset(kind, asset):
+        reported.append(kind)
+
+    async def generate(model, **kwargs):
+        if "image" in model:
+            await asyncio.sleep(0.1)
+            return mock_image_response()
+        return mock_audio_response()
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(side_effect=generate)
+        media = await generate_media(make_decision(), scene, timeout=0.02, on_asset=on_asset)
+        assert reported == ["audio"]
+        assert media.timed_out == ("image",)
+        await asyncio.sleep(0.2)
+    assert reported == ["audio", "image"]
+
+
+def mock_audio_stream(*pieces: bytes):
+    async def stream():
+        for piece in pieces:
+            m = MagicMock()
+            m.candidates[0].content.parts = [MagicMock()]
+            m.candidates[0].content.parts[0].inline_data.data = piece
+            yield m
+
+    return AsyncMock(return_value=stream())
+
+
+async def test_generate_media_streams_tts_chunks_and_caches_the_clip():
+    scene = make_scene()
+    chunks: list[bytes | None] = []
+
+    async def on_audio_chunk(pcm):
+        chunks.append(pcm)
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(return_value=mock_image_response())
+        # Odd-sized pieces: chunks are re-cut on 16-bit sample boundaries
+        mock_client.aio.models.generate_content_stream = mock_audio_stream(b"\x00\x01\x02", b"\x03")
+        media = await generate_media(make_decision(), scene, on_audio_chunk=on_audio_chunk)
+
+        assert chunks == [b"\x00\x01", b"\x02\x03", None]
+        assert media.audio.data == _pcm_to_wav(b"\x00\x01\x02\x03")
+
+        chunks.clear()
+        replay = await generate_media(make_decision(), scene, on_audio_chunk=on_audio_chunk)
+        assert replay.audio.data == media.audio.data
+        assert chunks == []  # served from the cache, nothing to stream
+        mock_client.aio.models.generate_content_stream.assert_awaited_once()
+
+
+async def test_generate_media_failed_tts_stream_still_ends_the_stream():
+    chunks: list[bytes | None] = []
+
+    async def on_audio_chunk(pcm):
+        chunks.append(pcm)
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(return_value=mock_image_response())
+        mock_client.aio.models.generate_content_stream = AsyncMock(side_effect=Exception("quota"))
+        media = await generate_media(make_decision(), make_scene(), on_audio_chunk=on_audio_chunk)
+
+    assert media.audio is None
+    assert chunks == [None]
+
+
+async def test_streamed_tts_reaches_every_waiting_request_despite_a_failing_one():
+    first_sent = asyncio.Event()
+    joined = asyncio.Event()
+    heard: list[bytes | None] = []
+
+    async def broken_socket(pcm):
+        first_sent.set()
+        raise ConnectionError("viewer gone")
+
+    async def on_audio_chunk(pcm):
+        heard.append(pcm)
+
+    async def stream():
+        for piece in (b"\x00\x01", b"\x02\x03"):
+            m = MagicMock()
+            m.candidates[0].content.parts = [MagicMock()]
+            m.candidates[0].content.parts[0].inline_data.data = piece
+            yield m
+            await joined.wait()
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(return_value=mock_image_response())
+        mock_client.aio.models.generate_content_stream = AsyncMock(return_value=stream())
+        first = asyncio.create_task(generate_media(make_decision(), make_scene(), on_audio_chunk=broken_socket))
+        await first_sent.wait()
+        second = asyncio.create_task(generate_media(make_decision(), make_scene(), on_audio_chunk=on_audio_chunk))
+        await asyncio.sleep(0.01)
+        joined.set()
+        results = await asyncio.gather(first, second)
+
+    assert heard == [b"\x00\x01", b"\x02\x03", None]  # caught up on the chunk it missed
+    assert all(media.audio.data == _pcm_to_wav(b"\x00\x01\x02\x03") for media in results)
+    mock_client.aio.models.generate_content_stream.assert_awaited_once()
+
+
+async def test_hedged_veo_shows_image_first_and_upgrades_within_window():
+    reported: list[str] = []
+
+    async def on_asset(kind, asset):
+        reported.append(kind)
+
+    async def generate_videos(**kwargs):
+        await asyncio.sleep(0.05)
+        return mock_veo_operation(b"clip")
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", True),
+        patch("app.content_pipeline._VEO_HEDGE_WINDOW_SECONDS", 1.0),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_videos = AsyncMock(side_effect=generate_videos)
+        mock_client.aio.models.generate_content = AsyncMock(
+            side_effect=[mock_audio_response(), mock_image_response()]
+        )
+        media = await generate_media(make_decision(), make_scene(), on_asset=on_asset)
+
+    assert reported.index("image") < reported.index("video")
+    assert media.video.data == b"clip"
+    assert media.image is None  # the clip made it; no still needed in the result
+
+
+async def test_hedged_veo_keeps_image_when_clip_misses_window():
+    reported: list[str] = []
+
+    async def on_asset(kind, asset):
+        reported.append(kind)
+
+    async def generate_videos(**kwargs):
+        await asyncio.sleep(0.1)
+        return mock_veo_operation(b"clip")
+
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", True),
+        patch("app.content_pipeline._VEO_HEDGE_WINDOW_SECONDS", 0.02),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_videos = AsyncMock(side_effect=generate_videos)
+        mock_client.aio.models.generate_content = AsyncMock(
+            side_effect=[mock_audio_response(), mock_image_response()]
+        )
+        media = await generate_media(make_decision(), make_scene(), timeout=5, on_asset=on_asset)
+        assert media.video is None
+        assert media.image.data == IMAGE_BYTES
+        assert media.timed_out == ()
+        await asyncio.sleep(0.2)
+        # The clip still lands in the cache for the next viewer, without upgrading this one
+        again = await generate_media(make_decision(), make_scene())
+    assert sorted(reported) == ["audio", "image"]
+    assert again.video.data == b"clip"
+
+
+
+async def test_non_progressive_hedge_keeps_image_at_the_deadline_without_timing_out():
+    async def generate_videos(**kwargs):
+        await asyncio.sleep(1)
+        return mock_veo_operation(b"clip")
+
+    loop = asyncio.get_running_loop()
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", True),
+        patch("app.content_pipeline._VEO_HEDGE_WINDOW_SECONDS", 30),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_videos = AsyncMock(side_effect=generate_videos)
+        mock_client.aio.models.generate_content = AsyncMock(
+            side_effect=[mock_audio_response(), mock_image_response()]
+        )
+        started = loop.time()
+        media = await generate_media(make_decision(), make_scene(), timeout=0.1)
+    assert loop.time() - started < 0.5
+    assert media.video is None
+    assert media.image.data == IMAGE_BYTES
+    assert media.timed_out == ()  # the image was ready; a clip it cannot upgrade to is no overrun
+
+
+async def test_hedged_clip_wait_is_dropped_when_the_image_wait_fails():
+    async def on_asset(kind, asset):
+        if kind == "image":
+            raise RuntimeError("socket closed")
+
+    async def generate_videos(**kwargs):
+        await asyncio.sleep(1)
+        return mock_veo_operation(b"clip")
+
+    abandoned = content_pipeline._inflight.abandoned
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", True),
+        patch("app.content_pipeline._VEO_HEDGE_WINDOW_SECONDS", 30),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_videos = AsyncMock(side_effect=generate_videos)
+        mock_client.aio.models.generate_content = AsyncMock(
+            side_effect=[mock_audio_response(), mock_image_response()]
+        )
+        with pytest.raises(RuntimeError):
+            await generate_media(make_decision(), make_scene(), on_asset=on_asset)
+        await asyncio.sleep(0)
+    # Its only waiter cancelled, the clip's cache fill is abandoned rather than left orphaned
+    assert content_pipeline._inflight.abandoned == abandoned + 1
@@ -0,0 +1,61 @@
+from pathlib import Path
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+
+from app import story_engine
+from app.asset_store import DiskAssetStore
+from app.content_pipeline import _cache
+from app.prerender import plan_jobs, prerender, reachable_scenes
+
+STORY = story_engine.load_story(str(Path(__file__).parent.parent.parent / "story.json"))
+
+
+@pytest.fixture(autouse=True)
+def clear_pipeline_cache():
+    _cache.clear()
+    yield
+    _cache.clear()
+
+
+def mock_response(data: bytes) -> MagicMock:
+    m = MagicMock()
+    m.candidates[0].content.parts[0].inline_data.data = data
+    m.candidates[0].content.parts[0].inline_data.mime_type = "image/png"
+    return m
+
+
+def test_reachable_scenes_cover_the_story_graph():
+    ids = [scene.id for scene in reachable_scenes(STORY)]
+    assert ids[0] == "opening"
+    assert set(ids) == set(STORY["scenes"])
+
+
+def test_plan_jobs_renders_moods_only_for_branch_targets():
+    jobs = plan_jobs(STORY, ["mystery"])
+    assert not any(job.scene.is_decision_point for job in jobs)
+    assert {job.mood for job in jobs if job.scene.id == "foyer"} == {None}
+    assert {job.mood for job in jobs if job.scene.id == "figure_appears"} == {
+        None, "tense", "warm", "mysterious",
+    }
+    assert len(plan_jobs(STORY, ["mystery", "horror"])) == 2 * len(jobs)
+
+
+async def test_prerender_resumes_from_the_disk_store(tmp_path):
+    store = DiskAssetStore(tmp_path, max_bytes=1 << 20)
+    store.scan()
+    jobs = [job for job in plan_jobs(STORY, ["mystery"]) if job.scene.id in ("opening", "foyer")]
+    with (
+        patch("app.content_pipeline._VEO_ENABLED", False),
+        patch("app.content_pipeline._store", store),
+        patch("app.content_pipeline.client") as mock_client,
+    ):
+        mock_client.aio.models.generate_content = AsyncMock(
+            side_effect=lambda **kw: mock_response(kw["contents"].encode())
+        )
+        first = await prerender(jobs, concurrency=2)
+        _cache.clear()
+        second = await prerender(jobs, concurrency=2)
+    assert first == {"rendered": 2, "skipped": 0, "failed": 0}
+    assert second == {"rendered": 0, "skipped": 2, "failed": 0}
+    assert mock_client.aio.models.generate_content.call_count == 4
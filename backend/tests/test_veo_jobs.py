@@ -0,0 +1,175 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from app import gemini_scheduler
+from app.gemini_scheduler import Priority, priority
+from app.veo_jobs import VeoJobManager
+
+
+def operation(done: bool, video_bytes: bytes = b"clip") -> MagicMock:
+    op = MagicMock()
+    op.done = done
+    op.result.generated_videos[0].video.video_bytes = video_bytes
+    return op
+
+
+class FakeVeo:
+    """Operations finish after `polls` polls; records submissions, poll times and stores."""
+
+    def __init__(self, polls: int = 1) -> None:
+        self.polls_needed = polls
+        self.submitted: list[str] = []
+        self.submit_levels: list[Priority] = []
+        self.poll_times: list[float] = []
+        self.stored: dict[str, bytes] = {}
+        self.release = asyncio.Event()
+        self.release.set()
+
+    async def submit(self, prompt: str) -> MagicMock:
+        self.submitted.append(prompt)
+        self.submit_levels.append(gemini_scheduler.current_scope().level)
+        await self.release.wait()
+        op = operation(done=self.polls_needed == 0, video_bytes=prompt.encode())
+        op.remaining = self.polls_needed
+        return op
+
+    async def poll(self, op: MagicMock) -> MagicMock:
+        self.poll_times.append(asyncio.get_running_loop().time())
+        op.remaining -= 1
+        op.done = op.remaining <= 0
+        return op
+
+    async def store(self, key: str, video_bytes: bytes) -> bytes:
+        self.stored[key] = video_bytes
+        return video_bytes
+
+    def manager(self, **kwargs) -> VeoJobManager:
+        kwargs.setdefault("poll_initial", 0.01)
+        kwargs.setdefault("poll_max", 0.04)
+        kwargs.setdefault("backoff", 2.0)
+        return VeoJobManager(self.submit, self.poll, self.store, **kwargs)
+
+
+async def test_subscribers_share_one_operation_and_result_is_stored():
+    veo = FakeVeo(polls=2)
+    jobs = veo.manager()
+
+    results = await asyncio.gather(*(jobs.result("k", "a cat") for _ in range(3)))
+    await asyncio.sleep(0)
+
+    assert results == [b"a cat"] * 3
+    assert veo.submitted == ["a cat"]
+    assert veo.stored == {"k": b"a cat"}
+    stats = jobs.stats()
+    assert stats["coalesced"] == 2
+    assert stats["completed"] == 1
+    assert stats["running"] == 0
+
+
+async def test_caps_concurrent_jobs_and_queues_the_rest():
+    veo = FakeVeo(polls=1)
+    veo.release.clear()
+    jobs = veo.manager(max_concurrent=1)
+
+    first = asyncio.create_task(jobs.result("a", "a"))
+    second = asyncio.create_task(jobs.result("b", "b"))
+    await asyncio.sleep(0.01)
+    assert veo.submitted == ["a"]
+    assert jobs.stats()["queued"] == 1
+
+    veo.release.set()
+    assert await asyncio.gather(first, second) == [b"a", b"b"]
+    assert veo.submitted == ["a", "b"]
+
+
+async def test_running_job_outlives_its_subscriber():
+    veo = FakeVeo(polls=2)
+    jobs = veo.manager()
+
+    waiter = asyncio.create_task(jobs.result("k", "abandoned"))
+    await asyncio.sleep(0.005)
+    waiter.cancel()
+    await asyncio.sleep(0.1)
+
+    assert veo.stored == {"k": b"abandoned"}  # the render is not wasted
+    assert jobs.stats()["subscribers"] == 0
+
+
+async def test_queued_job_is_dropped_when_its_subscribers_leave():
+    veo = FakeVeo(polls=1)
+    veo.release.clear()
+    jobs = veo.manager(max_concurrent=1)
+
+    running = asyncio.create_task(jobs.result("a", "a"))
+    queued = asyncio.create_task(jobs.result("b", "b"))
+    await asyncio.sleep(0.01)
+    queued.cancel()
+    await asyncio.sleep(0.01)
+    veo.release.set()
+    await running
+
+    assert veo.submitted == ["a"]
+    assert jobs.stats()["dropped"] == 1
+
+
+async def test_jobs_run_at_their_most_urgent_subscribers_priority():
+    veo = FakeVeo(polls=1)
+    veo.release.clear()
+    jobs = veo.manager(max_concurrent=1)
+
+    with priority(Priority.PREFETCH):
+        running = asyncio.create_task(jobs.result("a", "a"))
+        prefetch = asyncio.create_task(jobs.result("b", "b"))
+    await asyncio.sleep(0.01)
+    viewer = asyncio.create_task(jobs.result("c", "c"))  # CRITICAL by default
+    await asyncio.sleep(0.01)
+    veo.release.set()
+    await asyncio.gather(running, prefetch, viewer)
+
+    assert veo.submitted == ["a", "c", "b"]  # the viewer's job jumps the queue
+    assert veo.submit_levels == [Priority.PREFETCH, Priority.CRITICAL, Priority.PREFETCH]
+
+
+async def test_one_poll_loop_backs_off_per_job():
+    veo = FakeVeo(polls=4)
+    jobs = veo.manager()
+
+    started = asyncio.get_running_loop().time()
+    assert await jobs.result("k", "slow") == b"slow"
+
+    gaps = [b - a for a, b in zip([started, *veo.poll_times], veo.poll_times)]
+    expected = [0.01, 0.02, 0.04, 0.04]  # doubles, capped at poll_max
+    assert all(gap >= want * 0.9 for gap, want in zip(gaps, expected))
+    assert jobs.stats()["polls"] == 4
+
+
+async def test_job_times_out_and_failures_resolve_to_none():
+    veo = FakeVeo(polls=1000)
+    jobs = veo.manager(timeout=0.05)
+    assert await jobs.result("slow", "slow") is None
+
+    async def failing_submit(prompt: str):
+        raise RuntimeError("quota")
+
+    failing = VeoJobManager(failing_submit, veo.poll, veo.store)
+    assert await failing.result("k", "p") is None
+    assert jobs.stats()["timed_out"] == 1
+    assert failing.stats()["failed"] == 1
+    assert veo.stored == {}
+
+
+async def test_timeout_counts_time_spent_queued():
+    veo = FakeVeo(polls=1)
+    veo.release.clear()
+    jobs = veo.manager(max_concurrent=1, timeout=0.05)
+
+    running = asyncio.create_task(jobs.result("a", "a"))
+    queued = asyncio.create_task(jobs.result("b", "b"))
+    assert await queued is None  # never got a slot before its deadline
+    assert veo.submitted == ["a"]
+    assert jobs.stats()["queued"] == 0
+
+    veo.release.set()
+    await running
+    assert veo.submitted == ["a"]
+    assert jobs.stats()["timed_out"] == 1
@@ -1,9 +1,10 @@
 import { useCallback, useEffect, useRef, useState } from 'react'
 import { useCamera } from './hooks/useCamera'
 import { useGeminiLive } from './hooks/useGeminiLive'
-import { useBackendWS } from './hooks/useBackendWS'
+import { resolveBackendUrl, useBackendWS } from './hooks/useBackendWS'
+import { usePcmStream } from './hooks/usePcmStream'
 import { StoryMap } from './StoryMap'
-import type { AppState, BackendMessage, EmotionReading, SceneAssets } from './types'
+import type { AppState, BackendMessage, EmotionReading, MediaKind, SceneAssets } from './types'
 
 // Vite injects VITE_* vars at build time; undefined in dev without .env.local
 const GEMINI_API_KEY = (import.meta.env.VITE_GEMINI_API_KEY as string) ?? ''
@@ -35,6 +36,18 @@ const ENDINGS: Record<string, string> = {
   ending_supernatural: 'You Never Left',
 }
 
+// Prefer the content-addressed URL; fall back to inline base64 (ASSET_DELIVERY=inline)
+function mediaSrc(url: string | null | undefined, base64: string | null | undefined, mime: string): string | null {
+  if (url) return resolveBackendUrl(url)
+  if (base64) return `data:${mime};base64,${base64}`
+  return null
+}
+
+// Fill one media slot of a progressively delivered scene
+function withMedia(scene: SceneAssets, kind: MediaKind, url: string | null, base64: string | null): SceneAssets {
+  return { ...scene, [`${kind}_url`]: url, [`${kind}_base64`]: base64 }
+}
+
 export default function App() {
   const [appState, setAppState] = useState<AppState>('idle')
   const [assets, setAssets] = useState<SceneAssets | null>(null)
@@ -58,6 +71,13 @@ export default function App() {
   // Ending held here until audio finishes; fallback timer fires if audio is blocked
   const pendingEndingRef = useRef<{ ending: string; scenes_played: string[] } | null>(null)
   const endTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null)
+  // Latest scene as assembled from progressive messages; media landing during the
+  // cross-fade is merged here so the scene shown after it is complete
+  const sceneRef = useRef<SceneAssets | null>(null)
+
+  const videoSrc = mediaSrc(assets?.video_url, assets?.video_base64, 'video/mp4')
+  const imageSrc = mediaSrc(assets?.image_url, assets?.image_base64, 'image/png')
+  const audioSrc = mediaSrc(assets?.audio_url, assets?.audio_base64, 'audio/wav')
 
   // Trigger end screen — called from audio onEnded or fallback timer
   const triggerEnded = useCallback(() => {
@@ -70,6 +90,9 @@ export default function App() {
     setAppState('ended')
   }, [])
 
+  // Narration streamed as PCM while TTS synthesises it; ends like the <audio> element would
+  const pcmStream = usePcmStream(triggerEnded)
+
   // ── Gemini Live API callback (called on each emotion reading from Gemini) ──
   const handleEmotion = useCallback((reading: EmotionReading) => {
     setEmotion(reading)
@@ -77,18 +100,49 @@ export default function App() {
     sendEmotionRef.current(reading)
   }, [])
 
+  // Cross-fade to a new scene (complete, or just its text with media to follow)
+  const showScene = useCallback((scene: SceneAssets) => {
+    sceneRef.current = scene
+    pcmStream.stop()  // the previous scene's narration, if still streaming
+    setImgVisible(false)
+    setTimeout(() => {
+      setAssets(sceneRef.current)
+      setScenesPlayed((p) => [...p, scene.scene_id])
+      setImgVisible(true)
+      // Only transition to playing if the film has been explicitly started
+      if (startedRef.current && appStateRef.current !== 'ended') setAppState('playing')
+    }, 400)
+  }, [pcmStream.stop])
+
   // ── Backend WebSocket message handler ──
   const handleWSMessage = useCallback((msg: BackendMessage) => {
     switch (msg.type) {
       case 'scene':
-        setImgVisible(false)
-        setTimeout(() => {
-          setAssets(msg.assets)
-          setScenesPlayed((p) => [...p, msg.assets.scene_id])
-          setImgVisible(true)
-          // Only transition to playing if the film has been explicitly started
-          if (startedRef.current && appStateRef.current !== 'ended') setAppState('playing')
-        }, 400)
+        showScene(msg.assets)
+        break
+      case 'scene_start':
+        showScene({ ...msg.scene, image_base64: null, audio_base64: null })
+        break
+      case 'scene_asset':
+      case 'scene_upgrade': {
+        const scene = sceneRef.current
+        if (!scene || scene.scene_id !== msg.scene_id) break  // late asset for a past scene
+        const updated = withMedia(scene, msg.kind, msg.url, msg.base64)
+        sceneRef.current = updated
+        // Before the cross-fade finishes, showScene picks the update up from sceneRef
+        setAssets((a) => (a && a.scene_id === msg.scene_id ? updated : a))
+        break
+      }
+      case 'audio_stream_start':
+        if (sceneRef.current?.scene_id === msg.scene_id) {
+          pcmStream.begin(msg.scene_id, msg.sample_rate, msg.channels)
+        }
+        break
+      case 'audio_chunk':
+        pcmStream.push(msg.scene_id, msg.pcm)
+        break
+      case 'audio_stream_end':
+        pcmStream.end(msg.scene_id)
         break
       case 'emotion':
         setEmotion(msg.data)
@@ -108,12 +162,12 @@ export default function App() {
         console.error('Backend error:', msg.message)
         break
     }
-  }, [])
+  }, [showScene, pcmStream.begin, pcmStream.push, pcmStream.end])
 
   const { videoRef, canvasRef, startCamera, stopCamera, captureFrame } = useCamera()
   const { connect: liveConnect, disconnect: liveDisconnect, sendFrame: liveSendFrame, connected: liveConnected } =
     useGeminiLive(handleEmotion)
-  const { connect: wsConnect, disconnect: wsDisconnect, send: wsSend, sendEmotion, connected: wsConnected } =
+  const { connect: wsConnect, disconnect: wsDisconnect, send: wsSend, sendEmotion, sendFrame: wsSendFrame, connected: wsConnected } =
     useBackendWS(handleWSMessage)
 
   // Keep sendEmotionRef current
@@ -170,7 +224,7 @@ export default function App() {
           liveSendFrame(frame)
         } else {
           // Fallback: send raw frame to backend for server-side analysis
-          wsSend({ type: 'frame', data: frame })
+          wsSendFrame(frame)
         }
       } else if (!liveConnectedRef.current) {
         // No camera + no Gemini Live: send synthetic neutral reading so the story still advances
@@ -184,13 +238,14 @@ export default function App() {
     }, FRAME_INTERVAL_MS)
 
     startedRef.current = true
-    wsSend({ type: 'start', genre: selectedGenre })
+    wsSend({ type: 'start', genre: selectedGenre, progressive: true, stream_audio: true })
     setAppState('playing')
-  }, [startCamera, liveConnect, captureFrame, liveSendFrame, wsSend, selectedGenre])
+  }, [startCamera, liveConnect, captureFrame, liveSendFrame, wsSend, wsSendFrame, selectedGenre])
 
   const handleStart = useCallback(() => {
+    pcmStream.unlock()  // inside the click, so browsers allow streamed narration to play
     runCalibration(startFilm)
-  }, [runCalibration, startFilm])
+  }, [pcmStream.unlock, runCalibration, startFilm])
 
   const handleReset = useCallback(() => {
     if (frameTimerRef.current) { clearInterval(frameTimerRef.current); frameTimerRef.current = null }
@@ -201,6 +256,8 @@ export default function App() {
     stopCamera()
     setAppState('idle')
     setAssets(null)
+    sceneRef.current = null
+    pcmStream.stop()
     setEmotion(null)
     setEmotionHistory([])
     setScenesPlayed([])
@@ -208,7 +265,7 @@ export default function App() {
     setImgVisible(false)
     setAudioBlocked(false)
     wsSend({ type: 'reset' })
-  }, [liveDisconnect, stopCamera, wsSend])
+  }, [liveDisconnect, stopCamera, wsSend, pcmStream.stop])
 
   return (
     <div className="app">
@@ -252,24 +309,24 @@ export default function App() {
             </div>
           )}
 
-          {assets?.video_base64 ? (
+          {assets && videoSrc ? (
             // Veo video: muted so autoplay is allowed; TTS narration audio plays separately
             <video
               key={assets.scene_id}
               className={`scene-img ${imgVisible ? 'visible' : ''}`}
-              src={`data:video/mp4;base64,${assets.video_base64}`}
+              src={videoSrc}
               autoPlay
               muted
               playsInline
               loop
               style={{ '--scene-dur': `${assets.duration_seconds ?? 20}s` } as React.CSSProperties}
             />
-          ) : assets?.image_base64 ? (
+          ) : assets && imageSrc ? (
             // Static image fallback (Veo disabled or timed out)
             <img
               key={assets.scene_id}
               className={`scene-img ${imgVisible ? 'visible' : ''}`}
-              src={`data:image/png;base64,${assets.image_base64}`}
+              src={imageSrc}
               alt="Scene"
               style={{ '--scene-dur': `${assets.duration_seconds ?? 20}s` } as React.CSSProperties}
             />
@@ -451,14 +508,14 @@ export default function App() {
       {/* Hidden canvas for frame capture */}
       <canvas ref={canvasRef} style={{ display: 'none' }} width={320} height={240} />
       {/* Audio player — autoPlay blocked in some browsers; fall back to a tap-to-play button */}
-      {assets?.audio_base64 && (
+      {assets && audioSrc && (
         <audio
           key={assets.scene_id}
           ref={(el) => {
             audioRef.current = el
             if (el) el.play().catch(() => setAudioBlocked(true))
           }}
-          src={`data:audio/wav;base64,${assets.audio_base64}`}
+          src={audioSrc}
           onEnded={triggerEnded}
           style={{ display: 'none' }}
         />
@@ -1,8 +1,39 @@
 import { useCallback, useRef, useState } from 'react'
-import type { BackendMessage, EmotionReading } from '../types'
+import type { BackendMessage, EmotionReading, SceneAssets } from '../types'
 
 const WS_PATH = '/ws/session'
 const RECONNECT_DELAY_MS = 2500
+// Offered on connect; if the backend accepts it, frames and media travel as raw bytes
+const BINARY_SUBPROTOCOL = 'directors-cut.binary.v1'
+
+/** Binary frame: 4-byte big-endian header length, UTF-8 JSON header, raw payload. */
+function packBinary(header: Record<string, unknown>, payload: Uint8Array): Uint8Array {
+  const encoded = new TextEncoder().encode(JSON.stringify(header))
+  const out = new Uint8Array(4 + encoded.length + payload.length)
+  new DataView(out.buffer).setUint32(0, encoded.length)
+  out.set(encoded, 4)
+  out.set(payload, 4 + encoded.length)
+  return out
+}
+
+function unpackBinary(buf: ArrayBuffer): { header: Record<string, string>; payload: Uint8Array } {
+  const headerLen = new DataView(buf).getUint32(0)
+  const header = JSON.parse(new TextDecoder().decode(new Uint8Array(buf, 4, headerLen)))
+  return { header, payload: new Uint8Array(buf, 4 + headerLen) }
+}
+
+function base64ToBytes(base64: string): Uint8Array {
+  const bin = atob(base64)
+  const bytes = new Uint8Array(bin.length)
+  for (let i = 0; i < bin.length; i++) bytes[i] = bin.charCodeAt(i)
+  return bytes
+}
+
+/** Resolve a backend path (e.g. a scene asset URL) against the backend origin. */
+export function resolveBackendUrl(path: string): string {
+  const backendUrl = import.meta.env.VITE_BACKEND_URL as string | undefined
+  return backendUrl ? new URL(path, backendUrl).toString() : path
+}
 
 function buildWsUrl(): string {
   const backendUrl = import.meta.env.VITE_BACKEND_URL as string | undefined
@@ -20,17 +51,56 @@ export function useBackendWS(onMessage: (msg: BackendMessage) => void) {
   const wsRef = useRef<WebSocket | null>(null)
   const [connected, setConnected] = useState(false)
   const reconnectTimerRef = useRef<ReturnType<typeof setTimeout> | null>(null)
+  // Asset URL → object URL for media received as binary frames on this connection
+  const blobUrlsRef = useRef(new Map<string, string>())
+
+  const revokeBlobUrls = useCallback(() => {
+    blobUrlsRef.current.forEach((url) => URL.revokeObjectURL(url))
+    blobUrlsRef.current.clear()
+  }, [])
+
+  /** Point scene media at locally held blobs when the backend already streamed them to us */
+  const withLocalMedia = useCallback((assets: SceneAssets): SceneAssets => {
+    const local = (url: string | null | undefined) => (url && blobUrlsRef.current.get(url)) || url
+    return {
+      ...assets,
+      image_url: local(assets.image_url),
+      video_url: local(assets.video_url),
+      audio_url: local(assets.audio_url),
+    }
+  }, [])
 
   const connect = useCallback(() => {
     if (wsRef.current?.readyState === WebSocket.CONNECTING) return
 
-    const ws = new WebSocket(buildWsUrl())
+    const ws = new WebSocket(buildWsUrl(), [BINARY_SUBPROTOCOL])
+    ws.binaryType = 'arraybuffer'
 
     ws.onopen = () => setConnected(true)
     ws.onmessage = (evt) => {
       try {
+        if (evt.data instanceof ArrayBuffer) {
+          const { header, payload } = unpackBinary(evt.data)
+          // Content-addressed: a URL already held (e.g. resent after reconnect) is the same bytes
+          if (header.type === 'asset' && !blobUrlsRef.current.has(header.url)) {
+            const blob = new Blob([payload], { type: header.mime })
+            blobUrlsRef.current.set(header.url, URL.createObjectURL(blob))
+          } else if (header.type === 'audio_chunk') {
+            onMessage({ type: 'audio_chunk', scene_id: header.scene_id, index: Number(header.index), pcm: payload })
+          }
+          return
+        }
         const msg = JSON.parse(evt.data) as BackendMessage
-        onMessage(msg)
+        if (msg.type === 'scene') {
+          onMessage({ ...msg, assets: withLocalMedia(msg.assets) })
+        } else if (msg.type === 'audio_chunk') {
+          const { base64, ...chunk } = msg as typeof msg & { base64: string }
+          onMessage({ ...chunk, pcm: base64ToBytes(base64) })
+        } else if (msg.type === 'scene_asset' || msg.type === 'scene_upgrade') {
+          onMessage({ ...msg, url: (msg.url && blobUrlsRef.current.get(msg.url)) || msg.url })
+        } else {
+          onMessage(msg)
+        }
       } catch {
         console.warn('Unparseable WS message')
       }
@@ -42,13 +112,14 @@ export function useBackendWS(onMessage: (msg: BackendMessage) => void) {
     }
 
     wsRef.current = ws
-  }, [onMessage])
+  }, [onMessage, withLocalMedia])
 
   const disconnect = useCallback(() => {
     if (reconnectTimerRef.current) clearTimeout(reconnectTimerRef.current)
     wsRef.current?.close()
     wsRef.current = null
-  }, [])
+    revokeBlobUrls()
+  }, [revokeBlobUrls])
 
   const send = useCallback((payload: Record<string, unknown>) => {
     if (wsRef.current?.readyState === WebSocket.OPEN) {
@@ -64,7 +135,15 @@ export function useBackendWS(onMessage: (msg: BackendMessage) => void) {
 
   /** Send a raw webcam frame (backend-side emotion detection path) */
   const sendFrame = useCallback(
-    (base64: string) => send({ type: 'frame', data: base64 }),
+    (base64: string) => {
+      const ws = wsRef.current
+      if (ws?.readyState === WebSocket.OPEN && ws.protocol === BINARY_SUBPROTOCOL) {
+        // Raw JPEG bytes — no base64 inflation on the wire or decode on the server
+        ws.send(packBinary({ type: 'frame', mime: 'image/jpeg' }, base64ToBytes(base64)))
+      } else {
+        send({ type: 'frame', data: base64 })
+      }
+    },
     [send],
   )
 
@@ -0,0 +1,87 @@
+import { useCallback, useRef } from 'react'
+
+// Scheduling lead for the first chunk (and after an underrun), absorbing jitter between chunks
+const START_LEAD_SECONDS = 0.15
+
+interface PcmStream {
+  sceneId: string
+  sampleRate: number
+  channels: number
+  nextTime: number  // AudioContext time the next chunk starts at
+  playing: Set<AudioBufferSourceNode>
+  ended: boolean
+}
+
+/** Plays narration streamed as raw s16le PCM chunks, gaplessly, through Web Audio. */
+export function usePcmStream(onEnded: () => void) {
+  const ctxRef = useRef<AudioContext | null>(null)
+  const streamRef = useRef<PcmStream | null>(null)
+
+  /** Create/resume the AudioContext — call from a user gesture so playback is allowed */
+  const unlock = useCallback(() => {
+    if (!ctxRef.current) ctxRef.current = new AudioContext()
+    void ctxRef.current.resume()
+  }, [])
+
+  const stop = useCallback(() => {
+    const stream = streamRef.current
+    streamRef.current = null
+    stream?.playing.forEach((source) => {
+      source.onended = null
+      source.stop()
+    })
+  }, [])
+
+  const begin = useCallback((sceneId: string, sampleRate: number, channels: number) => {
+    stop()
+    if (!ctxRef.current) ctxRef.current = new AudioContext()
+    streamRef.current = { sceneId, sampleRate, channels, nextTime: 0, playing: new Set(), ended: false }
+  }, [stop])
+
+  const finishIfDone = useCallback((stream: PcmStream) => {
+    if (stream.ended && stream.playing.size === 0 && streamRef.current === stream) {
+      streamRef.current = null
+      onEnded()
+    }
+  }, [onEnded])
+
+  const push = useCallback((sceneId: string, pcm: Uint8Array) => {
+    const stream = streamRef.current
+    const ctx = ctxRef.current
+    if (!stream || !ctx || stream.sceneId !== sceneId) return
+    const frames = Math.floor(pcm.byteLength / 2 / stream.channels)
+    if (frames === 0) return
+
+    const view = new DataView(pcm.buffer, pcm.byteOffset, pcm.byteLength)
+    const buffer = ctx.createBuffer(stream.channels, frames, stream.sampleRate)
+    for (let ch = 0; ch < stream.channels; ch++) {
+      const samples = buffer.getChannelData(ch)
+      for (let i = 0; i < frames; i++) {
+        samples[i] = view.getInt16((i * stream.channels + ch) * 2, true) / 32768
+      }
+    }
+
+    const source = ctx.createBufferSource()
+    source.buffer = buffer
+    source.connect(ctx.destination)
+    // Back to back with the previous chunk, unless playback has already caught up with the stream
+    const startAt = Math.max(stream.nextTime, ctx.currentTime + START_LEAD_SECONDS)
+    source.start(startAt)
+    stream.nextTime = startAt + buffer.duration
+    stream.playing.add(source)
+    source.onended = () => {
+      stream.playing.delete(source)
+      finishIfDone(stream)
+    }
+  }, [finishIfDone])
+
+  /** The stream is complete: onEnded fires once its last chunk has played */
+  const end = useCallback((sceneId: string) => {
+    const stream = streamRef.current
+    if (!stream || stream.sceneId !== sceneId) return
+    stream.ended = true
+    finishIfDone(stream)
+  }, [finishIfDone])
+
+  return { unlock, begin, push, end, stop }
+}
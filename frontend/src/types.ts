@@ -33,17 +33,56 @@ export interface SceneAssets {
   video_base64?: string | null
   image_base64: string | null
   audio_base64: string | null
+  // Content-addressed media URLs (default delivery); base64 fields are null when set
+  video_url?: string | null
+  image_url?: string | null
+  audio_url?: string | null
   narration_text: string
   mood: string
   chapter: string
   duration_seconds: number
 }
 
+export type MediaKind = 'image' | 'video' | 'audio'
+
+// Progressive delivery ("start" with progressive: true): text first, media as it lands
+export interface SceneStart {
+  scene_id: string
+  narration_text: string
+  mood: string
+  chapter: string
+  duration_seconds: number
+}
+
+export interface SceneAssetMessage {
+  scene_id: string
+  kind: MediaKind
+  mime: string
+  // One of the two is set, as for SceneAssets
+  url: string | null
+  base64: string | null
+}
+
+// Streamed narration ("start" with stream_audio: true): raw PCM while TTS is still synthesising
+export interface AudioStreamStart {
+  scene_id: string
+  sample_rate: number
+  channels: number
+  encoding: 'pcm_s16le'
+}
+
 export type AppState = 'idle' | 'calibrating' | 'playing' | 'deciding' | 'ended'
 
 // Messages received from backend WebSocket
 export type BackendMessage =
   | { type: 'scene'; assets: SceneAssets }
+  | { type: 'scene_start'; scene: SceneStart }
+  // scene_upgrade: a Veo clip that replaces the image already on screen
+  | ({ type: 'scene_asset' | 'scene_upgrade' } & SceneAssetMessage)
+  | ({ type: 'audio_stream_start' } & AudioStreamStart)
+  // pcm decoded by useBackendWS from a raw binary frame, or base64 over JSON
+  | { type: 'audio_chunk'; scene_id: string; index: number; pcm: Uint8Array }
+  | { type: 'audio_stream_end'; scene_id: string; chunks: number }
   | { type: 'emotion'; data: EmotionReading }
   | { type: 'deciding' }
   | { type: 'complete'; ending: string; scenes_played: string[] }